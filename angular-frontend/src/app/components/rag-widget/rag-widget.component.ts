@@ -238,11 +238,13 @@ setRoleFromToken() {
       this.scrapeStatus = {
         title: 'Bulk Scraping Started!',
         message: `Discovered ${response.discovered_urls_count} URLs.`,
-        details: `Estimated time: ${response.estimated_time}`,
+        details: `Job ${response.job_id} queued`,
       };
       this.bulkScrapeUrl = '';
 
-      setTimeout(() => this.refreshStats(), 10000);
+      if (response.job_id) {
+        this.watchJob(response.job_id);
+      }
     } catch (error: any) {
       this.scrapeStatus = {
         title: 'Bulk Scraping Failed',
@@ -254,6 +256,27 @@ setRoleFromToken() {
     this.isBulkScraping = false;
   }
 
+  async watchJob(jobId: string) {
+    try {
+      const job = await this.http
+        .get<any>(`${this.apiUrl}/scraper/jobs/${jobId}`)
+        .toPromise();
+      const urls = job.url_counts;
+      const eta = job.eta_seconds != null ? `, about ${Math.ceil(job.eta_seconds)}s left` : '';
+      this.scrapeStatus = {
+        ...this.scrapeStatus,
+        details: `Job ${job.status}: ${urls.done + urls.failed}/${urls.total} pages${eta}`,
+      };
+      if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+        this.refreshStats();
+        return;
+      }
+    } catch (error) {
+      console.error('Failed to load bulk scrape job status.');
+    }
+    setTimeout(() => this.watchJob(jobId), 5000);
+  }
+
   async refreshStats() {
     try {
       const stats = await this.http
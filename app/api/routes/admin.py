@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import asyncio
 import os
 import json
@@ -9,6 +9,12 @@ from datetime import datetime
 from app.services.chroma_service import chroma_service
 from app.services.scraper_service import scraper_service
 from app.services.ai_service import ai_service
+from app.services.embedding_cache import embedding_cache
+from app.services.answer_cache import answer_cache
+from app.services.reembed_service import reembed_service
+from app.services.snapshot_service import snapshot_service
+from app.services.browser_pool import browser_pool
+from app.services.job_worker import job_worker
 
 router = APIRouter()
 
@@ -18,6 +24,15 @@ class SystemConfig(BaseModel):
     max_crawl_depth: int = 3
     enable_ai_fallback: bool = True
 
+class RestoreRequest(BaseModel):
+    snapshot: str
+    replace: bool = True
+
+class ReembedRequest(BaseModel):
+    target_provider: Optional[str] = None
+    source_collection: Optional[str] = None
+    drop_source: bool = False
+
 @router.get("/system-status")
 async def get_system_status():
     """Get comprehensive system status"""
@@ -87,32 +102,49 @@ async def get_system_logs(limit: int = 100):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/backup")
-async def create_backup():
-    """Create system backup"""
+async def create_backup(dtype: str = "float32"):
+    """Snapshot every stored vector, document and metadata record to ./backups"""
     try:
-        backup_data = {
-            'timestamp': datetime.now().isoformat(),
-            'chroma_stats': await chroma_service.get_collection_stats(),
-            'system_config': {
-                'version': '1.0.0',
-                'services': ['scraper', 'rag', 'chroma']
-            }
-        }
-        
-        backup_filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        backup_path = os.path.join("./backups", backup_filename)
-        
-        os.makedirs("./backups", exist_ok=True)
-        
-        with open(backup_path, 'w') as f:
-            json.dump(backup_data, f, indent=2)
-        
+        snapshot = await snapshot_service.export_snapshot(dtype)
         return {
             'status': 'success',
-            'backup_file': backup_filename,
-            'backup_path': backup_path
+            'backup_file': snapshot['snapshot'],
+            'backup_path': snapshot['path'],
+            'snapshot': snapshot
         }
-        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/backups")
+async def list_backups():
+    try:
+        return {'snapshots': await asyncio.to_thread(snapshot_service.list_snapshots)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/restore")
+async def restore_backup(request: RestoreRequest):
+    """Bulk-load a snapshot into the vector store without re-embedding anything.
+
+    Refused with 409 while a re-embedding or bulk scrape job is writing chunks.
+    """
+    try:
+        reembed_status = reembed_service.status()['status']
+        running_jobs = await job_worker.running_jobs()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if reembed_status in ("running", "swapping"):
+        raise HTTPException(status_code=409, detail="A re-embedding job is running; pause or cancel it before restoring")
+    if running_jobs:
+        raise HTTPException(status_code=409,
+                            detail=f"Scrape jobs are running ({', '.join(running_jobs)}); wait for or cancel them before restoring")
+    try:
+        result = await asyncio.to_thread(snapshot_service.restore_snapshot, request.snapshot, request.replace)
+        return {'status': 'success', **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -136,10 +168,60 @@ async def get_system_metrics():
                 'scraper_active': True,
                 'rag_active': True,
                 'ai_services_active': True
-            }
+            },
+            'embedding_cache': embedding_cache.stats(),
+            'answer_cache': answer_cache.stats(),
+            'search_batching': chroma_service.batching_stats(),
+            'browser_pool': browser_pool.stats()
         }
         
         return metrics
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reembed")
+async def start_reembed(request: ReembedRequest):
+    """Start re-embedding stored chunks into the target provider's namespace"""
+    try:
+        return await reembed_service.start(request.target_provider, request.source_collection, request.drop_source)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/reembed")
+async def get_reembed_status():
+    """Progress, throughput and ETA of the current or last re-embedding job"""
+    try:
+        return reembed_service.status()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reembed/pause")
+async def pause_reembed():
+    try:
+        return await reembed_service.pause()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reembed/resume")
+async def resume_reembed():
+    try:
+        return await reembed_service.resume()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.delete("/reembed")
+async def cancel_reembed():
+    """Stop the job and drop its shadow collection"""
+    try:
+        return await reembed_service.cancel()
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,58 +1,247 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Literal, Optional, Tuple
+from datetime import datetime
+import asyncio
 import json
+import time
+from app.core.config import settings
 from app.services.chroma_service import chroma_service
 from app.services.ai_service import ai_service
+from app.services.answer_cache import answer_cache
 
 router = APIRouter()
 
+SearchMode = Literal["vector", "lexical", "hybrid"]
+RerankMode = Literal["none", "mmr", "lexical", "mmr_lexical"]
+
+class SearchFilters(BaseModel):
+    source: Optional[str] = None
+    format: Optional[str] = None
+    domain: Optional[str] = None
+    url_prefix: Optional[str] = None
+    timestamp_from: Optional[datetime] = None
+    timestamp_to: Optional[datetime] = None
+
 class QueryRequest(BaseModel):
     query: str
     max_results: int = 5
     include_context: bool = True
+    mode: SearchMode = "vector"
+    filters: Optional[SearchFilters] = None
+    rerank: RerankMode = "none"
+    fetch_k: Optional[int] = None
+    use_cache: bool = True
+
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    max_results: int = 5
+    include_context: bool = True
+    mode: SearchMode = "vector"
+    filters: Optional[SearchFilters] = None
+    rerank: RerankMode = "none"
+    fetch_k: Optional[int] = None
+    use_cache: bool = True
+    concurrency: Optional[int] = None
 
 class DocumentUpload(BaseModel):
     content: str
     metadata: Dict[str, Any] = {}
 
+async def lookup_cached_answer(endpoint: str, query: str, params: Dict[str, Any]) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple]]:
+    """Look up a semantically similar cached answer.
+
+    Returns (cached_response, ticket); pass the ticket to store_cached_answer on a miss,
+    and ``ticket_embedding(ticket)`` to retrieval so the query is not embedded twice.
+    """
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None, None
+    started = time.perf_counter()
+    provider, model, query_embeddings = await ai_service.embed_texts([query])
+    scope = answer_cache.scope_key(endpoint, provider, model, params)
+    generation = chroma_service.generation
+    cached = answer_cache.lookup(scope, query_embeddings[0], generation)
+    if cached is not None:
+        cached['query'] = query
+        cached['cache_hit'] = True
+        cached['timings'] = {'cache_lookup_ms': round((time.perf_counter() - started) * 1000, 2)}
+    return cached, (scope, query_embeddings[0], generation, (provider, model, query_embeddings[0]))
+
+def ticket_embedding(ticket: Optional[Tuple]) -> Optional[Tuple[str, str, List[float]]]:
+    """The (provider, model, vector) a cache lookup computed, for retrieval to reuse"""
+    return ticket[3] if ticket else None
+
+def store_cached_answer(ticket: Optional[Tuple], response: Dict[str, Any]):
+    """Cache a fresh answer unless the knowledge base changed while it was generated"""
+    if ticket and ticket[2] == chroma_service.generation:
+        answer_cache.store(ticket[0], ticket[1], ticket[2], response)
+
 @router.post("/query")
 async def query_rag(request: QueryRequest):
     """Query the RAG system"""
     try:
-        search_results = await chroma_service.search_documents(
+        ticket = None
+        if request.use_cache:
+            cached, ticket = await lookup_cached_answer(
+                'rag_query', request.query, request.dict(exclude={'query', 'use_cache'})
+            )
+            if cached is not None:
+                return cached
+
+        search_results, timings = await chroma_service.search_with_timings(
             request.query, 
-            request.max_results
+            request.max_results,
+            request.mode,
+            request.filters.dict(exclude_none=True) if request.filters else None,
+            request.rerank,
+            request.fetch_k,
+            ticket_embedding(ticket)
         )
-        
-        if not search_results:
-            return {
-                'query': request.query,
-                'answer': 'No relevant documents found in the knowledge base.',
-                'sources': [],
-                'context_used': []
-            }
-        
-        context = [result['content'] for result in search_results]
-        answer = await ai_service.generate_response(request.query, context)
-        sources = []
-        for result in search_results:
-            sources.append({
-                'url': result['metadata'].get('url', ''),
-                'distance': result['distance'],
-                'content_preview': result['content'][:200] + '...' if len(result['content']) > 200 else result['content']
-            })
-        
-        return {
-            'query': request.query,
-            'answer': answer,
-            'sources': sources,
-            'context_used': context if request.include_context else []
-        }
+        response = await answer_from_results(
+            request.query, search_results, timings, request.mode, request.include_context
+        )
+        store_cached_answer(ticket, response)
+        return response
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+async def answer_from_results(query: str, search_results: List[Dict[str, Any]], timings: Dict[str, float],
+                              mode: str, include_context: bool) -> Dict[str, Any]:
+    """Generate the answer for retrieved chunks and build the /query response body"""
+    if not search_results:
+        return {
+            'query': query,
+            'answer': 'No relevant documents found in the knowledge base.',
+            'sources': [],
+            'context_used': [],
+            'mode': mode,
+            'timings': timings,
+            'cache_hit': False
+        }
+
+    context = [result['content'] for result in search_results]
+    usage = {}
+    answer = await ai_service.generate_response(
+        query, context, [result['relevance_score'] for result in search_results], usage
+    )
+    sources = []
+    for result in search_results:
+        sources.append({
+            'url': result['metadata'].get('url', ''),
+            'distance': result['distance'],
+            'content_preview': result['content'][:200] + '...' if len(result['content']) > 200 else result['content']
+        })
+
+    return {
+        'query': query,
+        'answer': answer,
+        'sources': sources,
+        'context_used': context if include_context else [],
+        'mode': mode,
+        'timings': timings,
+        'generation': usage,
+        'cache_hit': False
+    }
+
+@router.post("/query-batch")
+async def query_rag_batch(request: BatchQueryRequest):
+    """Answer many queries in one request, streamed as JSON lines.
+
+    All queries are embedded in one provider call and retrieved with one
+    multi-vector store query; answers are generated concurrently, at most
+    ``concurrency`` (capped by QUERY_BATCH_CONCURRENCY) at a time. Each line is
+    a /query response plus its ``index`` in the request, written as soon as
+    that answer is ready, so lines arrive out of order. The last line is a
+    ``{"done": true, ...}`` summary.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="queries must not be empty")
+    if len(request.queries) > settings.QUERY_BATCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.QUERY_BATCH_MAX_QUERIES} queries per batch"
+        )
+    concurrency = max(1, min(request.concurrency or settings.QUERY_BATCH_CONCURRENCY, settings.QUERY_BATCH_CONCURRENCY))
+    filters = request.filters.dict(exclude_none=True) if request.filters else None
+
+    async def result_lines():
+        started = time.perf_counter()
+        queries = request.queries
+        cache_hits = errors = 0
+        tasks = []
+        try:
+            # one embedding call serves both the answer cache lookup and retrieval
+            tickets = [None] * len(queries)
+            embedded = None
+            pending = list(range(len(queries)))
+            if request.use_cache and settings.ANSWER_CACHE_ENABLED:
+                distinct = list(dict.fromkeys(queries))
+                provider, model, embeddings = await ai_service.embed_texts(distinct)
+                by_query = dict(zip(distinct, embeddings))
+                scope = answer_cache.scope_key(
+                    'rag_query', provider, model, request.dict(exclude={'queries', 'use_cache', 'concurrency'})
+                )
+                generation = chroma_service.generation
+                pending = []
+                for index, query in enumerate(queries):
+                    cached = answer_cache.lookup(scope, by_query[query], generation)
+                    if cached is None:
+                        tickets[index] = (scope, by_query[query], generation, None)
+                        pending.append(index)
+                        continue
+                    cache_hits += 1
+                    cached.update(index=index, query=query, cache_hit=True)
+                    yield json.dumps(cached, default=str) + "\n"
+                embedded = (provider, model, [by_query[queries[index]] for index in pending])
+
+            searched = await chroma_service.search_batch(
+                [queries[index] for index in pending], request.max_results, request.mode,
+                filters, request.rerank, request.fetch_k, embedded
+            )
+
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def answer(index: int, search_results, timings):
+                async with semaphore:
+                    try:
+                        response = await answer_from_results(
+                            queries[index], search_results, timings, request.mode, request.include_context
+                        )
+                    except Exception as e:
+                        return {'index': index, 'query': queries[index], 'error': str(e)}
+                store_cached_answer(tickets[index], response)
+                return dict(response, index=index)
+
+            tasks = [
+                asyncio.create_task(answer(index, search_results, timings))
+                for index, (search_results, timings) in zip(pending, searched)
+            ]
+            for finished in asyncio.as_completed(tasks):
+                response = await finished
+                errors += 'error' in response
+                yield json.dumps(response, default=str) + "\n"
+
+        except Exception as e:
+            print(f"Batch query error: {e}")
+            errors += 1
+            yield json.dumps({'error': str(e)}) + "\n"
+        finally:
+            # a client that disconnects mid-stream should not keep generating
+            for task in tasks:
+                task.cancel()
+
+        yield json.dumps({
+            'done': True,
+            'queries': len(queries),
+            'cache_hits': cache_hits,
+            'errors': errors,
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2)
+        }) + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
 @router.post("/add-document")
 async def add_document(request: DocumentUpload):
     """Add a document to the RAG system"""
@@ -69,7 +258,8 @@ async def add_document(request: DocumentUpload):
         
         return {
             'status': 'success',
-            'document_id': doc_ids[0],
+            'document_id': doc_ids[0] if doc_ids else None,
+            'chunk_count': len(doc_ids),
             'message': 'Document added successfully'
         }
         
@@ -104,7 +294,8 @@ async def upload_file(file: UploadFile = File(...)):
         return {
             'status': 'success',
             'filename': file.filename,
-            'document_id': doc_ids[0],
+            'document_id': doc_ids[0] if doc_ids else None,
+            'chunk_count': len(doc_ids),
             'content_length': len(text_content)
         }
         
@@ -114,11 +305,26 @@ async def upload_file(file: UploadFile = File(...)):
 @router.get("/search")
 async def search_documents(
     query: str,
-    max_results: int = 10
+    max_results: int = 10,
+    mode: SearchMode = "vector",
+    source: Optional[str] = None,
+    format: Optional[str] = None,
+    domain: Optional[str] = None,
+    url_prefix: Optional[str] = None,
+    timestamp_from: Optional[datetime] = None,
+    timestamp_to: Optional[datetime] = None
 ):
     """Search documents without generating AI response"""
     try:
-        search_results = await chroma_service.search_documents(query, max_results)
+        filters = SearchFilters(
+            source=source,
+            format=format,
+            domain=domain,
+            url_prefix=url_prefix,
+            timestamp_from=timestamp_from,
+            timestamp_to=timestamp_to
+        ).dict(exclude_none=True)
+        search_results, timings = await chroma_service.search_with_timings(query, max_results, mode, filters)
         
         formatted_results = []
         for result in search_results:
@@ -132,7 +338,9 @@ async def search_documents(
         return {
             'query': query,
             'results_count': len(formatted_results),
-            'results': formatted_results
+            'results': formatted_results,
+            'mode': mode,
+            'timings': timings
         }
         
     except Exception as e:
@@ -147,6 +355,55 @@ async def get_rag_stats():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.delete("/documents")
+async def delete_documents(
+    url: Optional[str] = None,
+    url_prefix: Optional[str] = None,
+    source: Optional[str] = None,
+    filename: Optional[str] = None
+):
+    """Delete all chunks for a URL, URL prefix, source and/or uploaded file name (criteria are combined)"""
+    try:
+        if filename:
+            if url:
+                raise ValueError("Use either url or filename")
+            # uploads are stored under file://<filename>
+            url = f"file://{filename}"
+        result = await chroma_service.delete_documents(url=url, url_prefix=url_prefix, source=source)
+        return {'status': 'success', **result}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.put("/documents")
+async def replace_document(request: DocumentUpload):
+    """Replace the stored content of one URL, embedding only the chunks that changed"""
+    try:
+        url = request.metadata.get('url', '')
+        if not url:
+            raise ValueError("metadata.url is required to replace a document")
+        result = await chroma_service.ingest_documents([{
+            'content': request.content,
+            'url': url,
+            'title': request.metadata.get('title', ''),
+            'format': request.metadata.get('format', 'text'),
+            'timestamp': request.metadata.get('timestamp', ''),
+            'source': request.metadata.get('source', 'manual_upload')
+        }])
+        return {
+            'status': 'success',
+            'url': url,
+            'chunk_count': len(result['ids']),
+            'upserted': result['upserted'],
+            'unchanged': result['unchanged'],
+            'stale_removed': result['stale_removed']
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @router.delete("/clear")
 async def clear_rag_system():
     """Clear all documents from RAG system"""
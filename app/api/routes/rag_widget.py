@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException, BackgroundTasks, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, HttpUrl
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
+import json
+import time
 from datetime import datetime
 import mimetypes
 from io import BytesIO, StringIO
@@ -14,15 +17,31 @@ from bs4 import BeautifulSoup
 from app.services.scraper_service import scraper_service
 from app.services.chroma_service import chroma_service
 from app.services.ai_service import ai_service
+from app.api.routes.rag import (SearchMode, SearchFilters, RerankMode, lookup_cached_answer, store_cached_answer,
+                                ticket_embedding)
+from app.core.config import settings
+from app.services.job_worker import job_worker
 
 router = APIRouter()
 
+WIDGET_SCRAPE_PARAMS = {
+    'extract_text': True,
+    'extract_links': False,
+    'extract_images': False,
+    'extract_tables': True,
+    'scroll_page': True
+}
 
 
 class WidgetQueryRequest(BaseModel):
     query: str
     max_results: int = 15  
     include_sources: bool = True
+    mode: SearchMode = "vector"
+    filters: Optional[SearchFilters] = None
+    rerank: RerankMode = "mmr"
+    final_k: int = settings.RERANK_FINAL_K
+    use_cache: bool = True
 
 class WidgetScrapeRequest(BaseModel):
     url: HttpUrl
@@ -33,68 +52,165 @@ class BulkScrapeRequest(BaseModel):
     max_depth: int = 10    
     max_urls: int = 300    
     auto_store: bool = True
-
-def chunk_text(text: str, chunk_size: int = 1500, overlap: int = 200) -> List[str]:
-    chunks = []
-    start = 0
-    text_len = len(text)
-    while start < text_len:
-        end = min(start + chunk_size, text_len)
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
-    return chunks
+    single_pass: bool = False  # fetch each page once for both link discovery and extraction
+
+
+async def retrieve_widget_context(request: WidgetQueryRequest, embedded: Optional[Tuple[str, str, List[float]]] = None):
+    """Run retrieval for a widget query and return (context, scores, sources, timings).
+
+    ``embedded`` is the query vector when the answer cache lookup already computed it.
+    """
+    # max_results candidates are scored without their content; only final_k chunks are fetched
+    final_k = request.final_k if request.rerank != "none" else request.max_results
+    search_results, timings = await chroma_service.search_with_timings(
+        request.query,
+        final_k,
+        request.mode,
+        request.filters.dict(exclude_none=True) if request.filters else None,
+        request.rerank,
+        request.max_results,
+        embedded
+    )
+
+    filtered_results = [r for r in search_results if r['relevance_score'] > 0.7]
+    if not filtered_results:
+        filtered_results = search_results[:3] 
+
+    context = [r['content'] for r in filtered_results]
+    scores = [r['relevance_score'] for r in filtered_results]
+
+    sources = []
+    if request.include_sources:
+        for result in filtered_results:
+            sources.append({
+                'url': result['metadata'].get('url', ''),
+                'title': result['metadata'].get('title', 'Untitled'),
+                'relevance_score': result['relevance_score'],
+                'content_preview': (result['content'][:200] + '...') if len(result['content']) > 200 else result['content']
+            })
+
+    return context, scores, sources, timings
 
 
 @router.post("/widget/query")
 async def widget_query(request: WidgetQueryRequest):
     try:
         print(f"Widget query received: {request.query}")
-        search_results = await chroma_service.search_documents(request.query, request.max_results)
-
-        filtered_results = [r for r in search_results if r['relevance_score'] > 0.7]
-        if not filtered_results:
-            filtered_results = search_results[:3] 
-
-        context = [r['content'] for r in filtered_results]
+        ticket = None
+        if request.use_cache:
+            cached, ticket = await lookup_cached_answer(
+                'widget_query', request.query, request.dict(exclude={'query', 'use_cache'})
+            )
+            if cached is not None:
+                cached['timestamp'] = datetime.now().isoformat()
+                return cached
 
-        answer = await ai_service.generate_response(request.query, context)
+        context, scores, sources, timings = await retrieve_widget_context(request, ticket_embedding(ticket))
 
-        sources = []
-        if request.include_sources:
-            for result in filtered_results:
-                sources.append({
-                    'url': result['metadata'].get('url', ''),
-                    'title': result['metadata'].get('title', 'Untitled'),
-                    'relevance_score': result['relevance_score'],
-                    'content_preview': (result['content'][:200] + '...') if len(result['content']) > 200 else result['content']
-                })
+        usage = {}
+        answer = await ai_service.generate_response(request.query, context, scores, usage)
 
-        return {
+        response = {
             'query': request.query,
             'answer': answer,
             'sources': sources,
             'has_sources': len(sources) > 0,
+            'mode': request.mode,
+            'timings': timings,
+            'generation': usage,
+            'cache_hit': False,
             'timestamp': datetime.now().isoformat()
         }
+        store_cached_answer(ticket, response)
+        return response
 
     except Exception as e:
         print(f"Widget query error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/widget/query/stream")
+async def widget_query_stream(request: WidgetQueryRequest):
+    """Server-Sent Events variant of /widget/query.
+
+    Emits a ``sources`` event as soon as retrieval finishes, then ``token``
+    events with markdown-stripped answer text as the model generates it, and
+    finally ``done`` with the full answer and timings (or ``error``).
+    """
+    print(f"Widget stream query received: {request.query}")
+
+    async def event_stream():
+        started = time.perf_counter()
+        try:
+            ticket = None
+            if request.use_cache:
+                cached, ticket = await lookup_cached_answer(
+                    'widget_query', request.query, request.dict(exclude={'query', 'use_cache'})
+                )
+                if cached is not None:
+                    yield sse_event('sources', {
+                        'sources': cached['sources'],
+                        'has_sources': cached['has_sources'],
+                        'mode': cached['mode'],
+                        'cache_hit': True
+                    })
+                    yield sse_event('token', {'text': cached['answer']})
+                    cached['timestamp'] = datetime.now().isoformat()
+                    yield sse_event('done', cached)
+                    return
+
+            context, scores, sources, timings = await retrieve_widget_context(request, ticket_embedding(ticket))
+            yield sse_event('sources', {
+                'sources': sources,
+                'has_sources': len(sources) > 0,
+                'mode': request.mode,
+                'cache_hit': False
+            })
+
+            generation_started = time.perf_counter()
+            first_token_ms = None
+            parts = []
+            usage = {}
+            async for text in ai_service.stream_response(request.query, context, scores, usage):
+                if first_token_ms is None:
+                    first_token_ms = round((time.perf_counter() - started) * 1000, 2)
+                parts.append(text)
+                yield sse_event('token', {'text': text})
+
+            timings['first_token_ms'] = first_token_ms
+            timings['generation_ms'] = round((time.perf_counter() - generation_started) * 1000, 2)
+            response = {
+                'query': request.query,
+                'answer': "".join(parts),
+                'sources': sources,
+                'has_sources': len(sources) > 0,
+                'mode': request.mode,
+                'timings': timings,
+                'generation': usage,
+                'cache_hit': False,
+                'timestamp': datetime.now().isoformat()
+            }
+            store_cached_answer(ticket, response)
+            yield sse_event('done', response)
+
+        except Exception as e:
+            print(f"Widget stream query error: {e}")
+            yield sse_event('error', {'detail': str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @router.post("/widget/scrape")
 async def widget_scrape(request: WidgetScrapeRequest, background_tasks: BackgroundTasks):
     try:
         print(f"Widget scrape request: {request.url}")
 
-        scrape_params = {
-            'extract_text': True,
-            'extract_links': False,
-            'extract_images': False,
-            'extract_tables': True,
-            'scroll_page': True
-        }
-
-        result = await scraper_service.scrape_url(str(request.url), scrape_params)
+        result = await scraper_service.scrape_url(str(request.url), dict(WIDGET_SCRAPE_PARAMS))
 
         if result['status'] == 'success':
             if request.store_in_knowledge:
@@ -125,9 +241,29 @@ async def widget_scrape(request: WidgetScrapeRequest, background_tasks: Backgrou
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/widget/bulk-scrape")
-async def widget_bulk_scrape(request: BulkScrapeRequest, background_tasks: BackgroundTasks):
+async def widget_bulk_scrape(request: BulkScrapeRequest):
     try:
         print(f"Widget bulk scrape request: {request.base_url}")
+        job_params = {
+            'scrape_params': dict(WIDGET_SCRAPE_PARAMS),
+            'document_fields': {'format': 'text', 'source': 'widget_bulk_scrape'},
+            'store': request.auto_store,
+            'render_fallback': not request.single_pass
+        }
+        label = f"widget-bulk-scrape {request.base_url}"
+        if request.single_pass:
+            job = await job_worker.submit('crawl', label, [(str(request.base_url), 0)], **job_params,
+                                          max_depth=request.max_depth, max_urls=request.max_urls)
+            return {
+                'status': job['status'],
+                'mode': 'single_pass',
+                'job_id': job['job_id'],
+                'status_url': f"/api/scraper/jobs/{job['job_id']}",
+                'base_url': str(request.base_url),
+                'max_urls': request.max_urls,
+                'auto_store': request.auto_store
+            }
+
         discovered_urls = await scraper_service.discover_urls(
             str(request.base_url),
             request.max_depth,
@@ -141,15 +277,16 @@ async def widget_bulk_scrape(request: BulkScrapeRequest, background_tasks: Backg
                 'base_url': str(request.base_url)
             }
 
-        background_tasks.add_task(bulk_scrape_widget_task, discovered_urls, request.auto_store)
+        job = await job_worker.submit('urls', label, [(url, 1) for url in discovered_urls], **job_params)
 
         return {
-            'status': 'started',
+            'status': job['status'],
+            'job_id': job['job_id'],
+            'status_url': f"/api/scraper/jobs/{job['job_id']}",
             'base_url': str(request.base_url),
             'discovered_urls_count': len(discovered_urls),
             'urls_preview': discovered_urls[:5],
-            'auto_store': request.auto_store,
-            'estimated_time': f"{len(discovered_urls) * 2} seconds"
+            'auto_store': request.auto_store
         }
 
     except Exception as e:
@@ -208,19 +345,17 @@ async def widget_upload_file(file: UploadFile = File(...), store_in_knowledge: b
         }
 
         if store_in_knowledge:
-            chunks = chunk_text(text)
-            documents_to_store = []
-            for i, chunk in enumerate(chunks):
-                documents_to_store.append({
-                    "content": chunk,
-                    "url": f"file://{filename}#chunk{i}",
-                    "title": filename,
-                    "format": format_type,
-                    "timestamp": datetime.now().isoformat(),
-                    "source": "widget_upload"
-                })
-            await chroma_service.add_documents(documents_to_store)
+            # add_documents chunks the file along its structure
+            doc_ids = await chroma_service.add_documents([{
+                "content": text,
+                "url": f"file://{filename}",
+                "title": filename,
+                "format": format_type,
+                "timestamp": datetime.now().isoformat(),
+                "source": "widget_upload"
+            }])
             response["stored_in_knowledge"] = True
+            response["chunk_count"] = len(doc_ids)
 
         return response
 
@@ -261,55 +396,3 @@ async def store_document_task(document: Dict[str, Any]):
         print(f"Stored document in knowledge base: {document.get('url', '')}")
     except Exception as e:
         print(f"Error storing document: {e}")
-
-async def bulk_scrape_widget_task(urls: List[str], auto_store: bool):
-    scraped_count = 0
-    stored_count = 0
-    batch_size = 3
-
-    for i in range(0, len(urls), batch_size):
-        batch = urls[i:i + batch_size]
-
-        scrape_params = {
-            'extract_text': True,
-            'extract_links': False,
-            'extract_images': False,
-            'extract_tables': True,
-            'scroll_page': True
-        }
-
-        tasks = [scraper_service.scrape_url(url, scrape_params) for url in batch]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        documents_to_store = []
-
-        for url, result in zip(batch, results):
-            if isinstance(result, Exception):
-                print(f"Error scraping {url}: {str(result)}")
-                continue
-
-            if result.get('status') == 'success':
-                scraped_count += 1
-
-                if auto_store:
-                    document = {
-                        'content': result['content'].get('text', ''),
-                        'url': url,
-                        'title': result['content'].get('title', ''),
-                        'format': 'text',
-                        'timestamp': datetime.now().isoformat(),
-                        'source': 'widget_bulk_scrape'
-                    }
-                    documents_to_store.append(document)
-
-        if documents_to_store:
-            try:
-                await chroma_service.add_documents(documents_to_store)
-                stored_count += len(documents_to_store)
-                print(f"Stored {len(documents_to_store)} documents from batch")
-            except Exception as e:
-                print(f"Error storing batch documents: {e}")
-
-        await asyncio.sleep(2) 
-
-    print(f"Bulk scrape completed: {scraped_count} scraped, {stored_count} stored")
@@ -1,10 +1,11 @@
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Query
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, HttpUrl
 from typing import List, Dict, Any, Optional
 import asyncio
 from datetime import datetime
 from app.services.scraper_service import scraper_service
 from app.services.chroma_service import chroma_service
+from app.services.job_worker import job_worker
 
 router = APIRouter()
 
@@ -25,6 +26,12 @@ class BulkScrapeRequest(BaseModel):
     scrape_params: Dict[str, Any] = {}
     output_format: str = "json"
     store_in_rag: bool = True
+    single_pass: bool = False  # fetch each page once for both link discovery and extraction
+
+class JobDocumentsRequest(BaseModel):
+    # returned to the worker by claim_job and never listed by GET /jobs
+    lease_token: str
+    documents: List[Dict[str, Any]]
 
 @router.post("/scrape")
 async def scrape_single_url(request: ScrapeRequest):
@@ -62,67 +69,110 @@ async def scrape_single_url(request: ScrapeRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/bulk-scrape")
-async def bulk_scrape(request: BulkScrapeRequest, background_tasks: BackgroundTasks):
-    """Discover and scrape multiple URLs from a base URL"""
+async def bulk_scrape(request: BulkScrapeRequest):
+    """Discover and scrape multiple URLs from a base URL as a queued job"""
     try:
-        discovered_urls = await scraper_service.discover_urls(
+        job_params = {
+            'scrape_params': dict(request.scrape_params, output_format=request.output_format),
+            'document_fields': {'format': request.output_format},
+            'store': request.store_in_rag,
+            'render_fallback': not request.single_pass
+        }
+        label = f"bulk-scrape {request.base_url}"
+        if request.single_pass:
+            job = await job_worker.submit('crawl', label, [(str(request.base_url), 0)], **job_params,
+                                          max_depth=request.max_depth, max_urls=request.max_urls)
+            return {
+                'status': job['status'],
+                'mode': 'single_pass',
+                'job_id': job['job_id'],
+                'status_url': f"/api/scraper/jobs/{job['job_id']}",
+                'base_url': str(request.base_url),
+                'max_urls': request.max_urls
+            }
+
+        crawl = await scraper_service.crawl(
             str(request.base_url), 
-            request.max_depth
+            request.max_depth,
+            request.max_urls
         )
+        discovered_urls = crawl['urls']
     
         urls_to_scrape = discovered_urls[:request.max_urls]
-        background_tasks.add_task(
-            bulk_scrape_task,
-            urls_to_scrape,
-            request.scrape_params,
-            request.output_format,
-            request.store_in_rag
-        )
+        job = await job_worker.submit('urls', label, [(url, 1) for url in urls_to_scrape], **job_params)
         
         return {
-            'status': 'started',
+            'status': job['status'],
+            'job_id': job['job_id'],
+            'status_url': f"/api/scraper/jobs/{job['job_id']}",
             'discovered_urls_count': len(discovered_urls),
             'urls_to_scrape_count': len(urls_to_scrape),
-            'urls_preview': urls_to_scrape[:10]
+            'urls_preview': urls_to_scrape[:10],
+            'crawl_stats': crawl['stats']
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-async def bulk_scrape_task(urls: List[str], scrape_params: Dict[str, Any], output_format: str, store_in_rag: bool):
-    """Background task for bulk scraping"""
-    scraped_documents = []
-    scrape_params['output_format'] = output_format
-    
-    batch_size = 5
-    for i in range(0, len(urls), batch_size):
-        batch = urls[i:i + batch_size]
-        tasks = [scraper_service.scrape_url(url, scrape_params) for url in batch]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for url, result in zip(batch, results):
-            if isinstance(result, Exception):
-                print(f"Error scraping {url}: {str(result)}")
-                continue
-                
-            if result['status'] == 'success':
-                document = {
-                    'url': url,
-                    'content': result['content'].get('text', ''),
-                    'format': output_format,
-                    'timestamp': datetime.now().isoformat(),
-                    'metadata': result['content']
-                }
-                scraped_documents.append(document)
-        
-        await asyncio.sleep(2)
-    
-    if store_in_rag and scraped_documents:
-        try:
-            await chroma_service.add_documents(scraped_documents)
-            print(f"Added {len(scraped_documents)} documents to RAG system")
-        except Exception as e:
-            print(f"Error storing documents in RAG: {str(e)}")
+@router.get("/jobs")
+async def list_jobs(limit: int = Query(50, ge=1, le=500)):
+    """Recent bulk scrape jobs, newest first"""
+    try:
+        return {'jobs': await job_worker.list(limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status, URL progress, rate, ETA and per-stage statistics of a bulk scrape job"""
+    try:
+        job = await job_worker.status(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@router.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; pages already stored stay stored"""
+    try:
+        job = await job_worker.cancel(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if job['status'] != 'cancelled':
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already {job['status']}")
+    return job
+
+@router.post("/jobs/{job_id}/documents")
+async def store_job_documents(job_id: str, request: JobDocumentsRequest):
+    """Store documents extracted by a separate worker process for a job it holds the lease on.
+
+    The worker proves its lease with the token it got when claiming the job.
+    Only the API process writes to the vector store, so its answer cache and
+    search indexes see every page a worker ingests.
+    """
+    try:
+        job = await job_worker.status(job_id)
+        holds = job is not None and await job_worker.holds_lease(job_id, request.lease_token)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if not holds:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is not running under this lease")
+    try:
+        result = await chroma_service.ingest_documents(request.documents)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        'chunks': len(result['ids']),
+        'chunks_unchanged': result['unchanged'],
+        'chunks_stored': result['upserted'],
+        'stale_removed': result['stale_removed']
+    }
 
 @router.get("/discover-urls")
 async def discover_urls(
@@ -132,14 +182,16 @@ async def discover_urls(
 ):
     """Discover URLs from a base URL"""
     try:
-        discovered_urls = await scraper_service.discover_urls(str(base_url), max_depth)
+        crawl = await scraper_service.crawl(str(base_url), max_depth, max_urls)
+        discovered_urls = crawl['urls']
         limited_urls = discovered_urls[:max_urls]
         
         return {
             'base_url': str(base_url),
             'total_discovered': len(discovered_urls),
             'returned_count': len(limited_urls),
-            'urls': limited_urls
+            'urls': limited_urls,
+            'crawl_stats': crawl['stats']
         }
         
     except Exception as e:
@@ -11,6 +11,76 @@ class Settings(BaseSettings):
     CHROMA_PERSIST_DIRECTORY: str = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
     UPLOAD_DIRECTORY: str = os.getenv("UPLOAD_DIRECTORY", "./uploads")
     OUTPUT_DIRECTORY: str = os.getenv("OUTPUT_DIRECTORY", "./outputs")
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "auto")
+    LOCAL_EMBEDDING_DIM: int = int(os.getenv("LOCAL_EMBEDDING_DIM", "384"))
+    EMBEDDING_CACHE_PATH: str = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.db")
+    EMBEDDING_CACHE_MAX_BYTES: int = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+    AI_THREAD_POOL_SIZE: int = int(os.getenv("AI_THREAD_POOL_SIZE", "8"))
+    EMBEDDING_MAX_CONCURRENCY: int = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))
+    OPENROUTER_EMBED_BATCH_SIZE: int = int(os.getenv("OPENROUTER_EMBED_BATCH_SIZE", "64"))
+    OPENROUTER_EMBED_BATCH_CHARS: int = int(os.getenv("OPENROUTER_EMBED_BATCH_CHARS", "120000"))
+    OLLAMA_EMBED_BATCH_SIZE: int = int(os.getenv("OLLAMA_EMBED_BATCH_SIZE", "32"))
+    OLLAMA_EMBED_BATCH_CHARS: int = int(os.getenv("OLLAMA_EMBED_BATCH_CHARS", "60000"))
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "20"))
+    RRF_K: int = int(os.getenv("RRF_K", "60"))
+    RERANK_FINAL_K: int = int(os.getenv("RERANK_FINAL_K", "3"))
+    MMR_LAMBDA: float = float(os.getenv("MMR_LAMBDA", "0.5"))
+    ANSWER_CACHE_ENABLED: bool = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+    ANSWER_CACHE_THRESHOLD: float = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))
+    ANSWER_CACHE_MAX_ENTRIES: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "2000"))
+    ANSWER_CACHE_MAX_BYTES: int = int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    RERANK_LEXICAL_WEIGHT: float = float(os.getenv("RERANK_LEXICAL_WEIGHT", "0.3"))
+    OLLAMA_PROMPT_TOKEN_BUDGET: int = int(os.getenv("OLLAMA_PROMPT_TOKEN_BUDGET", "1500"))
+    OPENROUTER_PROMPT_TOKEN_BUDGET: int = int(os.getenv("OPENROUTER_PROMPT_TOKEN_BUDGET", "6000"))
+    CHUNK_TARGET_TOKENS: int = int(os.getenv("CHUNK_TARGET_TOKENS", "300"))
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", "450"))
+    CHUNK_OVERLAP_TOKENS: int = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+    INGEST_BATCH_CHUNKS: int = int(os.getenv("INGEST_BATCH_CHUNKS", "128"))
+    REEMBED_BATCH_SIZE: int = int(os.getenv("REEMBED_BATCH_SIZE", "64"))
+    REEMBED_MAX_CHUNKS_PER_SEC: float = float(os.getenv("REEMBED_MAX_CHUNKS_PER_SEC", "50"))
+    REEMBED_MAX_RETRIES: int = int(os.getenv("REEMBED_MAX_RETRIES", "5"))
+    REEMBED_CHECKPOINT_PATH: str = os.getenv("REEMBED_CHECKPOINT_PATH", "./embedding_cache/reembed_job.json")
+    BACKUP_DIRECTORY: str = os.getenv("BACKUP_DIRECTORY", "./backups")
+    SNAPSHOT_PAGE_SIZE: int = int(os.getenv("SNAPSHOT_PAGE_SIZE", "1000"))
+    SEARCH_BATCH_WINDOW_MS: float = float(os.getenv("SEARCH_BATCH_WINDOW_MS", "5"))
+    SEARCH_BATCH_MAX: int = int(os.getenv("SEARCH_BATCH_MAX", "64"))
+    QUERY_BATCH_MAX_QUERIES: int = int(os.getenv("QUERY_BATCH_MAX_QUERIES", "256"))
+    QUERY_BATCH_CONCURRENCY: int = int(os.getenv("QUERY_BATCH_CONCURRENCY", "4"))
+    VECTOR_BACKEND: str = os.getenv("VECTOR_BACKEND", "chroma")  # chroma or numpy
+    VECTOR_STORE_DIRECTORY: str = os.getenv("VECTOR_STORE_DIRECTORY", "./vector_store")
+    VECTOR_STORE_INDEX: str = os.getenv("VECTOR_STORE_INDEX", "exact")  # exact or ivf (numpy backend)
+    VECTOR_STORE_NPROBE: int = int(os.getenv("VECTOR_STORE_NPROBE", "16"))
+    VECTOR_TIER: str = os.getenv("VECTOR_TIER", "none")  # none, int8 or float16
+    VECTOR_TIER_DIRECTORY: str = os.getenv("VECTOR_TIER_DIRECTORY", "./vector_tier")
+    VECTOR_TIER_OVERSAMPLE: int = int(os.getenv("VECTOR_TIER_OVERSAMPLE", "4"))
+    CRAWL_CONCURRENCY: int = int(os.getenv("CRAWL_CONCURRENCY", "8"))
+    CRAWL_PER_HOST: int = int(os.getenv("CRAWL_PER_HOST", "4"))
+    CRAWL_HOST_DELAY: float = float(os.getenv("CRAWL_HOST_DELAY", "0.1"))  # seconds between requests per host slot
+    CRAWL_TIMEOUT: float = float(os.getenv("CRAWL_TIMEOUT", "15"))
+    PIPELINE_QUEUE_SIZE: int = int(os.getenv("PIPELINE_QUEUE_SIZE", "64"))
+    PIPELINE_EXTRACT_WORKERS: int = int(os.getenv("PIPELINE_EXTRACT_WORKERS", "2"))
+    PIPELINE_CHUNK_WORKERS: int = int(os.getenv("PIPELINE_CHUNK_WORKERS", "1"))
+    PIPELINE_EMBED_WORKERS: int = int(os.getenv("PIPELINE_EMBED_WORKERS", "2"))
+    PIPELINE_STORE_WORKERS: int = int(os.getenv("PIPELINE_STORE_WORKERS", "1"))
+    PIPELINE_EMBED_BATCH: int = int(os.getenv("PIPELINE_EMBED_BATCH", "64"))
+    PIPELINE_STORE_BATCH: int = int(os.getenv("PIPELINE_STORE_BATCH", "256"))
+    PIPELINE_BATCH_LINGER_MS: float = float(os.getenv("PIPELINE_BATCH_LINGER_MS", "50"))
+    JOB_QUEUE_BACKEND: str = os.getenv("JOB_QUEUE_BACKEND", "sqlite")  # sqlite or redis (uses REDIS_URL)
+    JOB_QUEUE_PATH: str = os.getenv("JOB_QUEUE_PATH", "./jobs/jobs.db")
+    JOB_QUEUE_REDIS_PREFIX: str = os.getenv("JOB_QUEUE_REDIS_PREFIX", "ragbot")
+    JOB_API_WORKER_SLOTS: int = int(os.getenv("JOB_API_WORKER_SLOTS", "1"))  # 0 when separate workers run the jobs
+    JOB_LEASE_SECONDS: float = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+    JOB_POLL_SECONDS: float = float(os.getenv("JOB_POLL_SECONDS", "2"))
+    JOB_URL_BATCH: int = int(os.getenv("JOB_URL_BATCH", "50"))
+    JOB_URL_MAX_ATTEMPTS: int = int(os.getenv("JOB_URL_MAX_ATTEMPTS", "3"))
+    JOB_API_URL: str = os.getenv("JOB_API_URL", "http://localhost:8000")  # where separate workers store documents
+    JOB_API_DOCUMENT_BATCH: int = int(os.getenv("JOB_API_DOCUMENT_BATCH", "16"))
+    JOB_API_TIMEOUT: float = float(os.getenv("JOB_API_TIMEOUT", "300"))
+    BROWSER_POOL_SIZE: int = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+    BROWSER_MAX_PAGES: int = int(os.getenv("BROWSER_MAX_PAGES", "50"))  # pages per browser before it is replaced
+    BROWSER_CHECKOUT_TIMEOUT: float = float(os.getenv("BROWSER_CHECKOUT_TIMEOUT", "60"))
+    BROWSER_IDLE_SECONDS: float = float(os.getenv("BROWSER_IDLE_SECONDS", "300"))
+    BROWSER_PAGE_TIMEOUT: float = float(os.getenv("BROWSER_PAGE_TIMEOUT", "30"))
     
     class Config:
         env_file = ".env"
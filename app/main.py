@@ -6,6 +6,9 @@ from app.core.config import settings
 from app.api.routes import scraper, rag, admin, support, rag_widget
 from app.services.chroma_service import chroma_service
 from app.services.ai_service import ai_service
+from app.services.reembed_service import reembed_service
+from app.services.job_worker import job_worker
+from app.services.browser_pool import browser_pool
 from app.api.routes.auth import router as auth_router
 from app.core.database import init_db
 from fastapi.staticfiles import StaticFiles
@@ -33,10 +36,11 @@ async def startup_services():
 
     try:
         await chroma_service.initialize()
-        print("ChromaDB initialized successfully")
+        print("Vector store initialized successfully")
+        await reembed_service.resume_if_interrupted()
     except Exception as e:
-        print(f"ChromaDB initialization failed: {e}")
-        print("Continuing without ChromaDB...")
+        print(f"Vector store initialization failed: {e}")
+        print("Continuing without a vector store...")
 
     print("\nTesting AI Services:")
     print("-" * 30)
@@ -59,6 +63,11 @@ async def startup_services():
     except Exception as e:
         print(f"Text generation service test failed: {e}")
 
+    try:
+        job_worker.start(settings.JOB_API_WORKER_SLOTS)
+    except Exception as e:
+        print(f"Job worker failed to start: {e}")
+
     print("\n" + "=" * 50)
     print("Enterprise RAG Bot started successfully!")
     print("Widget available at: http://localhost:4200")
@@ -66,6 +75,12 @@ async def startup_services():
     print("=" * 50)
 
 
+@app.on_event("shutdown")
+async def stop_job_worker():
+    await job_worker.stop()
+    await browser_pool.close()
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:4200", "http://127.0.0.1:4200"],
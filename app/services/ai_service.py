@@ -1,9 +1,17 @@
-from typing import List
+from typing import List, Tuple, Dict, Any, Optional, AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import inspect
 import os
-import re
 import openai
 import voyageai
 import ollama
+from app.core.config import settings
+from app.services.embedding_cache import embedding_cache
+from app.services.local_embedder import HashingEmbedder
+from app.services.markdown_stream import MarkdownStreamStripper, markdown_passes
+from app.services.context_packer import PackedContext, pack_context, estimate_tokens
 
 
 class AIService:
@@ -11,14 +19,19 @@ class AIService:
         self.openrouter_client = None
         self.voyage_client = None
         self.ollama_client = None
+        self.local_embedder = HashingEmbedder(settings.LOCAL_EMBEDDING_DIM)
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.AI_THREAD_POOL_SIZE,
+            thread_name_prefix="ai-provider"
+        )
         self.setup_clients()
 
     def setup_clients(self):
-        """Setup AI service clients with error handling"""
+        """Setup async, connection-pooled AI service clients with error handling"""
         try:
             openrouter_key = os.getenv("OPENROUTER_API_KEY")
             if openrouter_key:
-                self.openrouter_client = openai.OpenAI(
+                self.openrouter_client = openai.AsyncOpenAI(
                     base_url="https://openrouter.ai/api/v1",
                     api_key=openrouter_key,
                 )
@@ -29,76 +42,189 @@ class AIService:
         try:
             voyage_key = os.getenv("VOYAGE_API_KEY")
             if voyage_key:
-                self.voyage_client = voyageai.Client(api_key=voyage_key)
+                # Older voyageai releases only ship a blocking client; those calls go through the thread pool
+                voyage_client_cls = getattr(voyageai, "AsyncClient", None) or voyageai.Client
+                self.voyage_client = voyage_client_cls(api_key=voyage_key)
                 print(" Voyage client initialized")
         except Exception as e:
             print(f" Voyage setup failed: {e}")
 
         try:
             ollama_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-            self.ollama_client = ollama.Client(host=ollama_url)
-            self.ollama_client.list()
+            ollama.Client(host=ollama_url).list()
+            self.ollama_client = ollama.AsyncClient(host=ollama_url)
             print(" Ollama client initialized")
         except Exception as e:
             print(f" Ollama setup failed: {e}")
 
+    async def _run_blocking(self, fn, *args, **kwargs):
+        """Run a blocking provider call on the bounded AI thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+
     def strip_markdown(self, text: str) -> str:
         """Remove markdown formatting like **bold**, *italic*, headings, etc."""
         if not text:
             return ""
-        
-        text = re.sub(r"\*\*(.*?)\*\*", r"\1", text)
-        text = re.sub(r"\*(.*?)\*", r"\1", text)
-        text = re.sub(r"^#+\s*", "", text, flags=re.MULTILINE)
-        text = re.sub(r"^[\-\*\+]\s*", "", text, flags=re.MULTILINE)
+
+        text, _ = markdown_passes(text)
         return text.strip()
 
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings with fallback mechanism"""
-        if self.voyage_client:
-            try:
-                result = self.voyage_client.embed(texts, model="voyage-large-2")
-                print(f" Generated embeddings using Voyage for {len(texts)} texts")
-                return result.embeddings
-            except Exception as e:
-                print(f"Voyage embedding failed: {str(e)}")
+    def _embedding_providers(self, include_all: bool = False):
+        """Configured remote embedding providers in fallback order as (name, model, embed_fn)
 
+        EMBEDDING_PROVIDER=auto tries every configured provider; naming a single
+        provider restricts the chain to it (``include_all`` lifts that restriction).
+        The local embedder is always the last resort.
+        """
+        providers = []
+        if self.voyage_client:
+            providers.append(("voyage", "voyage-large-2", self._embed_with_voyage))
         if self.openrouter_client:
-            try:
-                embeddings = []
-                for text in texts:
-                    response = self.openrouter_client.embeddings.create(
-                        input=text,
-                        model="text-embedding-ada-002"
-                    )
-                    embeddings.append(response.data[0].embedding)
-                print(f" Generated embeddings using OpenRouter for {len(texts)} texts")
-                return embeddings
-            except Exception as e:
-                print(f" OpenRouter embedding failed: {str(e)}")
-
+            providers.append(("openrouter", "text-embedding-ada-002", self._embed_with_openrouter))
         if self.ollama_client:
+            providers.append(("ollama", "nomic-embed-text:latest", self._embed_with_ollama))
+        if settings.EMBEDDING_PROVIDER != "auto" and not include_all:
+            providers = [p for p in providers if p[0] == settings.EMBEDDING_PROVIDER]
+        return providers
+
+    def embedding_model_for(self, provider: str) -> str:
+        """Model used by a configured embedding provider; raises ValueError when it is unavailable"""
+        if provider == self.local_embedder.provider:
+            return self.local_embedder.model
+        for name, model, _ in self._embedding_providers(include_all=True):
+            if name == provider:
+                return model
+        raise ValueError(f"Embedding provider '{provider}' is not configured")
+
+    async def _embed_with_voyage(self, texts: List[str], model: str) -> List[List[float]]:
+        if inspect.iscoroutinefunction(self.voyage_client.embed):
+            result = await self.voyage_client.embed(texts, model=model)
+        else:
+            result = await self._run_blocking(self.voyage_client.embed, texts, model=model)
+        return result.embeddings
+
+    @staticmethod
+    def _make_batches(texts: List[str], max_count: int, max_chars: int) -> List[Tuple[int, int]]:
+        """Split texts into contiguous (start, end) ranges bounded by count and total characters"""
+        batches, start, chars = [], 0, 0
+        for i, text in enumerate(texts):
+            if i > start and (i - start >= max_count or chars + len(text) > max_chars):
+                batches.append((start, i))
+                start, chars = i, 0
+            chars += len(text)
+        if start < len(texts):
+            batches.append((start, len(texts)))
+        return batches
+
+    async def _embed_in_batches(self, texts: List[str], max_count: int, max_chars: int, embed_batch) -> List[List[float]]:
+        """Embed batches concurrently under a bounded in-flight limit, preserving input order"""
+        semaphore = asyncio.Semaphore(max(1, settings.EMBEDDING_MAX_CONCURRENCY))
+        embeddings: List[List[float]] = [None] * len(texts)
+
+        async def run(start: int, end: int):
+            async with semaphore:
+                batch_embeddings = await embed_batch(texts[start:end])
+            if len(batch_embeddings) != end - start:
+                raise ValueError(f"expected {end - start} embeddings, got {len(batch_embeddings)}")
+            embeddings[start:end] = batch_embeddings
+
+        await asyncio.gather(*(run(start, end) for start, end in self._make_batches(texts, max_count, max_chars)))
+        return embeddings
+
+    async def _embed_with_openrouter(self, texts: List[str], model: str) -> List[List[float]]:
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            response = await self.openrouter_client.embeddings.create(
+                input=batch,
+                model=model
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+        return await self._embed_in_batches(
+            texts, settings.OPENROUTER_EMBED_BATCH_SIZE, settings.OPENROUTER_EMBED_BATCH_CHARS, embed_batch
+        )
+
+    async def _embed_with_ollama(self, texts: List[str], model: str) -> List[List[float]]:
+        async def embed_batch(batch: List[str]) -> List[List[float]]:
+            if hasattr(self.ollama_client, 'embed'):
+                response = await self.ollama_client.embed(model=model, input=batch)
+                return response['embeddings']
+            responses = await asyncio.gather(*(
+                self.ollama_client.embeddings(model=model, prompt=text) for text in batch
+            ))
+            return [response['embedding'] for response in responses]
+
+        return await self._embed_in_batches(
+            texts, settings.OLLAMA_EMBED_BATCH_SIZE, settings.OLLAMA_EMBED_BATCH_CHARS, embed_batch
+        )
+
+    async def _embed_cached(self, provider: str, model: str, embed_fn, texts: List[str]) -> List[List[float]]:
+        """Serve cached vectors and send only the distinct cache misses to the provider"""
+        embeddings = await self._run_blocking(embedding_cache.get_many, provider, model, texts)
+
+        pending = {}
+        for i, (text, embedding) in enumerate(zip(texts, embeddings)):
+            if embedding is None:
+                pending.setdefault(embedding_cache.make_key(provider, model, text), []).append(i)
+
+        if pending:
+            miss_texts = [texts[positions[0]] for positions in pending.values()]
+            fresh = await embed_fn(miss_texts, model)
+            if len(fresh) != len(miss_texts):
+                raise ValueError(f"expected {len(miss_texts)} embeddings, got {len(fresh)}")
+            await self._run_blocking(embedding_cache.put_many, provider, model, miss_texts, fresh)
+            for positions, embedding in zip(pending.values(), fresh):
+                for i in positions:
+                    embeddings[i] = embedding
+
+        return embeddings
+
+    def active_embedding_model(self) -> Tuple[str, str]:
+        """(provider, model) expected to answer the next embedding call"""
+        providers = self._embedding_providers()
+        if providers:
+            return providers[0][0], providers[0][1]
+        return self.local_embedder.provider, self.local_embedder.model
+
+    def embedding_chain(self) -> List[Tuple[str, str]]:
+        """(provider, model) pairs in the order embed_texts tries them, ending with the local embedder"""
+        chain = [(name, model) for name, model, _ in self._embedding_providers()]
+        return chain + [(self.local_embedder.provider, self.local_embedder.model)]
+
+    async def embed_texts(self, texts: List[str]) -> Tuple[str, str, List[List[float]]]:
+        """Generate embeddings and report which (provider, model) produced them"""
+        for provider, model, embed_fn in self._embedding_providers():
             try:
-                embeddings = []
-                for text in texts:
-                    response = self.ollama_client.embeddings(
-                        model="nomic-embed-text:latest",
-                        prompt=text
-                    )
-                    embeddings.append(response['embedding'])
-                print(f"Generated embeddings using Ollama for {len(texts)} texts")
-                return embeddings
+                embeddings = await self._embed_cached(provider, model, embed_fn, texts)
+                print(f" Generated embeddings using {provider} for {len(texts)} texts")
+                return provider, model, embeddings
             except Exception as e:
-                print(f"Ollama embedding failed: {str(e)}")
+                print(f" {provider} embedding failed: {str(e)}")
+
+        if settings.EMBEDDING_PROVIDER != self.local_embedder.provider:
+            print("All remote embedding services failed, using local hashing embedder")
+        embeddings = await self._run_blocking(self.local_embedder.embed, texts)
+        return self.local_embedder.provider, self.local_embedder.model, embeddings
 
-        print("All embedding services failed, using dummy embeddings")
-        return [[0.0] * 384 for _ in texts]
+    async def embed_texts_with(self, provider: str, texts: List[str]) -> Tuple[str, str, List[List[float]]]:
+        """Embed with exactly one provider, without falling back; errors propagate to the caller"""
+        if provider == self.local_embedder.provider:
+            embeddings = await self._run_blocking(self.local_embedder.embed, texts)
+            return provider, self.local_embedder.model, embeddings
+        for name, model, embed_fn in self._embedding_providers(include_all=True):
+            if name == provider:
+                return provider, model, await self._embed_cached(provider, model, embed_fn, texts)
+        raise ValueError(f"Embedding provider '{provider}' is not configured")
 
-    async def generate_response(self, query: str, context: List[str]) -> str:
-        """Generate response with fallback mechanism"""
-        context_text = "\n\n".join(context[:3])
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings with cache lookup and fallback mechanism"""
+        _, _, embeddings = await self.embed_texts(texts)
+        return embeddings
 
-        prompt = f"""Based on the following context from scraped web data, provide a clear and accurate answer to the user's question.
+    SYSTEM_PROMPT = "You are a helpful AI assistant that answers questions based on provided web scraped context. Be accurate and cite information from the context when possible."
+
+    def _build_prompt(self, query: str, context_text: str) -> str:
+        return f"""Based on the following context from scraped web data, provide a clear and accurate answer to the user's question.
 
 Context:
 {context_text}
@@ -115,37 +241,141 @@ Instructions:
 
 Answer:"""
 
+    def _fallback_answer(self, query: str, context_text: str) -> str:
+        return f"I found relevant information about '{query}' in the scraped content, but I'm unable to generate a detailed response at the moment due to AI service unavailability. Here's what I found in the context:\n\n{self.strip_markdown(context_text[:500])}..."
+
+    def _pack(self, query: str, context: List[str], scores: Optional[List[float]],
+              budget: int) -> Tuple[PackedContext, Dict[str, Any]]:
+        """Pack as much relevant context as fits in ``budget`` prompt tokens next to the prompt itself"""
+        overhead = estimate_tokens(self.SYSTEM_PROMPT) + estimate_tokens(self._build_prompt(query, ""))
+        packed = pack_context(context, max(budget - overhead, 0), scores)
+        usage = packed.stats()
+        usage['prompt_budget'] = budget
+        usage['prompt_tokens'] = overhead + packed.tokens
+        return packed, usage
+
+    def _pack_prompt(self, query: str, context: List[str], scores: Optional[List[float]],
+                     budget: int) -> Tuple[str, Dict[str, Any]]:
+        """Build the prompt with as much relevant context as fits in ``budget`` prompt tokens"""
+        packed, usage = self._pack(query, context, scores, budget)
+        return self._build_prompt(query, packed.text), usage
+
+    def _packed_fallback(self, query: str, context: List[str], scores: Optional[List[float]],
+                         usage: Dict[str, Any]) -> str:
+        """The no-provider answer, quoting the best chunks as packed for the prompt"""
+        packed, packing = self._pack(query, context, scores, settings.OPENROUTER_PROMPT_TOKEN_BUDGET)
+        usage.clear()
+        usage.update(packing, provider="none")
+        return self._fallback_answer(query, packed.text)
+
+    def _generation_providers(self):
+        providers = []
         if self.ollama_client:
+            providers.append(("ollama", "Ollama DeepSeek-V2", settings.OLLAMA_PROMPT_TOKEN_BUDGET))
+        if self.openrouter_client:
+            providers.append(("openrouter", "OpenRouter DeepSeek", settings.OPENROUTER_PROMPT_TOKEN_BUDGET))
+        return providers
+
+    async def generate_response(self, query: str, context: List[str], scores: Optional[List[float]] = None,
+                                usage: Optional[Dict[str, Any]] = None) -> str:
+        """Generate response with fallback mechanism.
+
+        Context chunks are packed into the provider's prompt token budget by
+        relevance (``scores``, or list order). When ``usage`` is given it is
+        filled with the provider used and prompt token counts.
+        """
+        usage = usage if usage is not None else {}
+
+        for provider, name, budget in self._generation_providers():
+            prompt, packing = self._pack_prompt(query, context, scores, budget)
+            usage.clear()
+            usage.update(packing, provider=provider)
             try:
-                response = self.ollama_client.chat(
-                    model="deepseek-v2:latest",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful AI assistant that answers questions based on provided web scraped context. Be accurate and cite information from the context when possible."},
-                        {"role": "user", "content": prompt}
-                    ]
-                )
-                print(" Generated response using Ollama DeepSeek-V2")
-                return self.strip_markdown(response['message']['content'])
+                messages = [
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ]
+                if provider == "ollama":
+                    response = await self.ollama_client.chat(model="deepseek-v2:latest", messages=messages)
+                    answer = response['message']['content']
+                    usage['provider_prompt_tokens'] = response.get('prompt_eval_count')
+                else:
+                    response = await self.openrouter_client.chat.completions.create(
+                        model="deepseek/deepseek-chat",
+                        messages=messages,
+                        max_tokens=1000,
+                        temperature=0.7
+                    )
+                    answer = response.choices[0].message.content
+                    usage['provider_prompt_tokens'] = response.usage.prompt_tokens if response.usage else None
+                print(f" Generated response using {name} ({usage['prompt_tokens']} prompt tokens)")
+                return self.strip_markdown(answer)
             except Exception as e:
-                print(f" Ollama generation failed: {str(e)}")
+                print(f" {name} generation failed: {str(e)}")
 
-        if self.openrouter_client:
+        return self._packed_fallback(query, context, scores, usage)
+
+    async def _stream_ollama(self, prompt: str) -> AsyncIterator[str]:
+        stream = await self.ollama_client.chat(
+            model="deepseek-v2:latest",
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            stream=True
+        )
+        async for part in stream:
+            yield part.get('message', {}).get('content', '')
+
+    async def _stream_openrouter(self, prompt: str) -> AsyncIterator[str]:
+        stream = await self.openrouter_client.chat.completions.create(
+            model="deepseek/deepseek-chat",
+            messages=[
+                {"role": "system", "content": self.SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            max_tokens=1000,
+            temperature=0.7,
+            stream=True
+        )
+        async for chunk in stream:
+            if chunk.choices:
+                yield chunk.choices[0].delta.content or ''
+
+    async def stream_response(self, query: str, context: List[str], scores: Optional[List[float]] = None,
+                              usage: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """Stream the answer as plain-text deltas, markdown stripped incrementally.
+
+        Providers are tried in the same order as ``generate_response``; a
+        provider that fails before producing any text falls through to the
+        next one, while a failure mid-answer ends the stream.
+        """
+        usage = usage if usage is not None else {}
+        stream_fns = {"ollama": self._stream_ollama, "openrouter": self._stream_openrouter}
+
+        for provider, name, budget in self._generation_providers():
+            prompt, packing = self._pack_prompt(query, context, scores, budget)
+            usage.clear()
+            usage.update(packing, provider=provider)
+            stripper = MarkdownStreamStripper()
+            produced = False
             try:
-                response = self.openrouter_client.chat.completions.create(
-                    model="deepseek/deepseek-chat",
-                    messages=[
-                        {"role": "system", "content": "You are a helpful AI assistant that answers questions based on provided web scraped context. Be accurate and cite information from the context when possible."},
-                        {"role": "user", "content": prompt}
-                    ],
-                    max_tokens=1000,
-                    temperature=0.7
-                )
-                print("Generated response using OpenRouter DeepSeek")
-                return self.strip_markdown(response.choices[0].message.content)
+                async for delta in stream_fns[provider](prompt):
+                    text = stripper.feed(delta)
+                    if text:
+                        produced = True
+                        yield text
+                tail = stripper.flush()
+                if tail:
+                    yield tail
+                print(f" Streamed response using {name} ({usage['prompt_tokens']} prompt tokens)")
+                return
             except Exception as e:
-                print(f" OpenRouter generation failed: {str(e)}")
+                print(f" {name} streaming failed: {str(e)}")
+                if produced:
+                    return
 
-        return f"I found relevant information about '{query}' in the scraped content, but I'm unable to generate a detailed response at the moment due to AI service unavailability. Here's what I found in the context:\n\n{self.strip_markdown(context_text[:500])}..."
+        yield self._packed_fallback(query, context, scores, usage)
 
     async def summarize_content(self, content: str, max_length: int = 500) -> str:
         """Summarize content using AI"""
@@ -162,7 +392,7 @@ Content:
 
         if self.ollama_client:
             try:
-                response = self.ollama_client.chat(
+                response = await self.ollama_client.chat(
                     model="deepseek-v2:latest",
                     messages=[
                         {"role": "user", "content": prompt}
@@ -174,7 +404,7 @@ Content:
 
         if self.openrouter_client:
             try:
-                response = self.openrouter_client.chat.completions.create(
+                response = await self.openrouter_client.chat.completions.create(
                     model="deepseek/deepseek-chat",
                     messages=[
                         {"role": "user", "content": prompt}
@@ -0,0 +1,158 @@
+from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+import copy
+import itertools
+import json
+import numpy as np
+from app.core.config import settings
+
+
+class _ScopeVectors:
+    """L2-normalized query vectors of one cache scope.
+
+    Rows live in a preallocated buffer that grows by doubling, so storing an
+    answer does not copy the matrix; a removed row is replaced by the last one.
+    """
+
+    def __init__(self, dimension: int, capacity: int = 16):
+        self.keys: List[int] = []
+        self._positions: Dict[int, int] = {}
+        self._buffer = np.zeros((capacity, dimension), dtype=np.float32)
+
+    @property
+    def matrix(self) -> np.ndarray:
+        return self._buffer[:len(self.keys)]
+
+    def add(self, key: int, vector: np.ndarray):
+        count = len(self.keys)
+        if count == len(self._buffer):
+            grown = np.zeros((count * 2, self._buffer.shape[1]), dtype=np.float32)
+            grown[:count] = self._buffer
+            self._buffer = grown
+        self._buffer[count] = vector
+        self._positions[key] = count
+        self.keys.append(key)
+
+    def remove(self, key: int):
+        position = self._positions.pop(key)
+        last = len(self.keys) - 1
+        if position != last:
+            moved = self.keys[last]
+            self._buffer[position] = self._buffer[last]
+            self.keys[position] = moved
+            self._positions[moved] = position
+        self.keys.pop()
+
+
+class AnswerCache:
+    """Semantic cache of RAG answers keyed by query embedding.
+
+    A lookup is a single matrix-vector product over the cached query vectors of
+    the same scope (endpoint, embedder and retrieval parameters); the best
+    match is a hit when its cosine similarity reaches ``threshold``. Entries are
+    evicted LRU by count and approximate size, and the whole cache is dropped
+    whenever the collection generation changes.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, threshold: float):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.threshold = threshold
+        self.generation: Optional[int] = None
+        self.entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.scopes: Dict[str, _ScopeVectors] = {}
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._keys = itertools.count()
+
+    @staticmethod
+    def scope_key(endpoint: str, provider: str, model: str, params: Dict[str, Any]) -> str:
+        return json.dumps([endpoint, provider, model, params], sort_keys=True, default=str)
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _sync_generation(self, generation: int):
+        if self.generation != generation:
+            if self.entries:
+                self.invalidations += 1
+            self.clear()
+            self.generation = generation
+
+    def lookup(self, scope: str, vector: List[float], generation: int) -> Optional[Dict[str, Any]]:
+        """Return a copy of the cached response most similar to ``vector``, if similar enough"""
+        self._sync_generation(generation)
+        vectors = self.scopes.get(scope)
+        query = self._normalize(vector)
+        if vectors is None or not vectors.keys or vectors.matrix.shape[1] != len(query):
+            self.misses += 1
+            return None
+
+        similarities = vectors.matrix @ query
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        key = vectors.keys[best]
+        self.entries.move_to_end(key)
+        self.hits += 1
+        response = copy.deepcopy(self.entries[key]['response'])
+        response['cache_similarity'] = round(float(similarities[best]), 4)
+        return response
+
+    def store(self, scope: str, vector: List[float], generation: int, response: Dict[str, Any]):
+        self._sync_generation(generation)
+        query = self._normalize(vector)
+        size = len(json.dumps(response, default=str)) + query.nbytes
+        if size > self.max_bytes:
+            return
+
+        key = next(self._keys)
+        self.entries[key] = {'scope': scope, 'response': copy.deepcopy(response), 'bytes': size}
+        self.scopes.setdefault(scope, _ScopeVectors(len(query))).add(key, query)
+        self.bytes_used += size
+
+        while self.entries and (len(self.entries) > self.max_entries or self.bytes_used > self.max_bytes):
+            self._evict(next(iter(self.entries)))
+
+    def _evict(self, key: int):
+        entry = self.entries.pop(key)
+        self.bytes_used -= entry['bytes']
+        vectors = self.scopes[entry['scope']]
+        vectors.remove(key)
+        if not vectors.keys:
+            del self.scopes[entry['scope']]
+
+    def clear(self):
+        self.entries.clear()
+        self.scopes.clear()
+        self.bytes_used = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'enabled': settings.ANSWER_CACHE_ENABLED,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'entries': len(self.entries),
+            'bytes_used': self.bytes_used,
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'threshold': self.threshold,
+            'invalidations': self.invalidations,
+            'generation': self.generation
+        }
+
+
+answer_cache = AnswerCache(
+    settings.ANSWER_CACHE_MAX_ENTRIES,
+    settings.ANSWER_CACHE_MAX_BYTES,
+    settings.ANSWER_CACHE_THRESHOLD
+)
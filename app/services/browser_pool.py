@@ -0,0 +1,260 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+import asyncio
+import functools
+import time
+from app.core.config import settings
+
+CHROME_ARGS = ('--headless', '--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu', '--disable-extensions')
+
+
+class PooledBrowser:
+    """One long-lived Chrome instance; each checkout gets a fresh tab in it"""
+
+    def __init__(self, pool: "BrowserPool", driver: Any):
+        self.pool = pool
+        self.driver = driver
+        self.home = driver.current_window_handle
+        self.pages = 0
+        self.created = time.monotonic()
+        self.idle_since = self.created
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run ``fn(driver, *args, **kwargs)`` on the pool's driver threads"""
+        return await self.pool._run(fn, self.driver, *args, **kwargs)
+
+    def _open_tab(self, user_agent: Optional[str]):
+        self.driver.switch_to.new_window('tab')
+        if user_agent:
+            try:
+                self.driver.execute_cdp_cmd('Network.setUserAgentOverride', {'userAgent': user_agent})
+            except Exception:
+                pass
+
+    def _close_tab(self):
+        """Close every tab but the home one, so the next checkout starts clean"""
+        for handle in self.driver.window_handles:
+            if handle != self.home:
+                self.driver.switch_to.window(handle)
+                self.driver.close()
+        self.driver.switch_to.window(self.home)
+
+    def _healthy(self) -> bool:
+        try:
+            return self.home in self.driver.window_handles
+        except Exception:
+            return False
+
+
+class BrowserPool:
+    """Bounded pool of warm headless Chrome instances for the Selenium scrape path.
+
+    At most ``size`` browsers exist at once; ``checkout()`` reuses an idle
+    one (most recently used first, so spare ones age out) or launches one
+    while under the limit, and otherwise waits up to ``checkout_timeout``
+    seconds before raising TimeoutError. Every checkout runs in a new tab
+    that is closed again on return. A browser is quit and replaced after
+    ``max_pages`` pages, when its health check fails, or after sitting idle
+    for ``idle_seconds``. A checkout that is cancelled abandons its browser:
+    the driver call it was waiting on keeps running on a pool thread, so the
+    browser is quit rather than handed to the next caller.
+
+    Driver calls block, so they run on the pool's own threads rather than
+    on the event loop or the default executor.
+    """
+
+    def __init__(self, size: int, max_pages: int, checkout_timeout: float, idle_seconds: float,
+                 page_load_timeout: float, factory: Optional[Callable[[], Any]] = None):
+        self.size = max(1, size)
+        self.max_pages = max(1, max_pages)
+        self.checkout_timeout = checkout_timeout
+        self.idle_seconds = idle_seconds
+        self.page_load_timeout = page_load_timeout
+        self.factory = factory or self._launch_chrome
+        self._idle: Deque[PooledBrowser] = deque()
+        self._live = 0
+        self._in_use = 0
+        self._closed = False
+        self._cond: Optional[asyncio.Condition] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._counts = {'launched': 0, 'recycled': 0, 'unhealthy': 0, 'pages': 0, 'checkout_timeouts': 0,
+                        'abandoned': 0}
+        self._wait_s = 0.0
+
+    def _launch_chrome(self) -> Any:
+        import undetected_chromedriver as uc
+
+        options = uc.ChromeOptions()
+        for arg in CHROME_ARGS:
+            options.add_argument(arg)
+        return uc.Chrome(options=options)
+
+    async def _run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if self._executor is None:
+            # one thread per browser plus spares for launches and quits
+            self._executor = ThreadPoolExecutor(max_workers=self.size * 2, thread_name_prefix="browser")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    def _condition(self) -> asyncio.Condition:
+        if self._cond is None:
+            self._cond = asyncio.Condition()
+        return self._cond
+
+    @asynccontextmanager
+    async def checkout(self, user_agent: Optional[str] = None) -> AsyncIterator[PooledBrowser]:
+        """A browser with a fresh tab open, returned to the pool on exit"""
+        browser = await self._acquire()
+        outcome = 'ok'
+        try:
+            await self._run(browser._open_tab, user_agent)
+            browser.pages += 1
+            self._counts['pages'] += 1
+            yield browser
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            raise
+        except BaseException:
+            outcome = 'failed'
+            raise
+        finally:
+            if outcome == 'cancelled':
+                await self._abandon(browser)
+            else:
+                await self._release(browser, outcome == 'failed')
+
+    async def _acquire(self) -> PooledBrowser:
+        cond = self._condition()
+        started = time.perf_counter()
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            browser, launch = None, False
+            async with cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError("Browser pool is closed")
+                    self._reap_idle()
+                    if self._idle:
+                        browser = self._idle.pop()
+                        break
+                    if self._live < self.size:
+                        self._live += 1
+                        launch = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counts['checkout_timeouts'] += 1
+                        raise TimeoutError(f"No browser free within {self.checkout_timeout}s")
+                    try:
+                        await asyncio.wait_for(cond.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                self._in_use += 1
+
+            if launch:
+                try:
+                    browser = await self._run(self._start)
+                    self._counts['launched'] += 1
+                except BaseException:
+                    await self._forget()
+                    raise
+            else:
+                try:
+                    healthy = await self._run(browser._healthy)
+                except asyncio.CancelledError:
+                    await self._abandon(browser)
+                    raise
+                if not healthy:
+                    self._counts['unhealthy'] += 1
+                    await self._discard(browser)
+                    continue
+            self._wait_s += time.perf_counter() - started
+            return browser
+
+    def _start(self) -> PooledBrowser:
+        driver = self.factory()
+        driver.set_page_load_timeout(self.page_load_timeout)
+        return PooledBrowser(self, driver)
+
+    async def _release(self, browser: PooledBrowser, failed: bool):
+        if not self._closed and browser.pages < self.max_pages:
+            try:
+                await self._run(browser._close_tab)
+                healthy = not failed or await self._run(browser._healthy)
+            except Exception:
+                healthy = False
+            if healthy:
+                browser.idle_since = time.monotonic()
+                async with self._condition():
+                    self._in_use -= 1
+                    self._idle.append(browser)
+                    self._condition().notify()
+                return
+            self._counts['unhealthy'] += 1
+        elif not self._closed:
+            self._counts['recycled'] += 1
+        await self._discard(browser)
+
+    async def _discard(self, browser: PooledBrowser):
+        try:
+            await self._run(browser.driver.quit)
+        except Exception as e:
+            print(f"[WARN] Browser quit failed: {e}")
+        await self._forget()
+
+    async def _abandon(self, browser: PooledBrowser):
+        """Give up a browser whose driver may still be busy; it is quit in the background"""
+        self._counts['abandoned'] += 1
+        asyncio.get_running_loop().run_in_executor(self._executor, browser.driver.quit)
+        await self._forget()
+
+    async def _forget(self):
+        """A checked-out browser is gone; its slot is free for a new launch"""
+        async with self._condition():
+            self._live -= 1
+            self._in_use -= 1
+            self._condition().notify()
+
+    def _reap_idle(self):
+        """Quit browsers idle longer than idle_seconds (oldest are at the left)"""
+        now = time.monotonic()
+        while self._idle and now - self._idle[0].idle_since > self.idle_seconds:
+            browser = self._idle.popleft()
+            self._live -= 1
+            self._counts['recycled'] += 1
+            asyncio.get_running_loop().run_in_executor(self._executor, browser.driver.quit)
+
+    async def close(self):
+        """Quit idle browsers now; browsers in use are quit when they come back"""
+        self._closed = True
+        async with self._condition():
+            idle, self._idle = list(self._idle), deque()
+            self._live -= len(idle)
+            self._condition().notify_all()
+        for browser in idle:
+            try:
+                await self._run(browser.driver.quit)
+            except Exception as e:
+                print(f"[WARN] Browser quit failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        checkouts = self._counts['pages']
+        return {
+            'size': self.size,
+            'live': self._live,
+            'idle': len(self._idle),
+            'in_use': self._in_use,
+            **self._counts,
+            'avg_checkout_wait_ms': round(self._wait_s * 1000 / checkouts, 2) if checkouts else 0.0
+        }
+
+
+browser_pool = BrowserPool(
+    settings.BROWSER_POOL_SIZE,
+    settings.BROWSER_MAX_PAGES,
+    settings.BROWSER_CHECKOUT_TIMEOUT,
+    settings.BROWSER_IDLE_SECONDS,
+    settings.BROWSER_PAGE_TIMEOUT
+)
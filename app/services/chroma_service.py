@@ -1,163 +1,1174 @@
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from typing import List, Dict, Any
-import uuid
+import numpy as np
+from typing import List, Dict, Any, Iterable, Iterator, Tuple, Optional
+from datetime import datetime
+import asyncio
+import copy
+import hashlib
+import json
+import re
 import os
+import threading
+import time
 from app.core.config import settings
 from app.services.ai_service import ai_service
+from app.services.lexical_index import LexicalIndex
+from app.services.url_index import UrlIndex
+from app.services.chunker import iter_chunks
+from app.services.micro_batcher import MicroBatcher, SingleFlight
+from app.services.quantized_index import QuantizedIndex, QUANTIZED_DTYPES
+from app.services.vector_store import VectorStore, create_vector_store
+from app.services import reranker
+
+COLLECTION_NAME = "enterprise_rag_knowledge"
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+RERANK_MODES = ("none", "mmr", "lexical", "mmr_lexical")
 
 
 class ChromaService:
+    """Retrieval over embedding namespaces kept in a VectorStore (Chroma, or the NumPy backend)"""
+
     def __init__(self):
-        self.client = None
-        self.collection = None
+        self.store: Optional[VectorStore] = None
+        self.collections: Dict[str, Any] = {}
+        # collection name -> {'provider', 'model', 'dimension'} for every embedding namespace
+        self.namespaces: Dict[str, Dict[str, Any]] = {}
+        self.lexical_indexes: Dict[str, LexicalIndex] = {}
+        self.url_indexes: Dict[str, UrlIndex] = {}
+        # optional int8/float16 copies of the embeddings for two-stage search (VECTOR_TIER)
+        self.quantized_indexes: Dict[str, QuantizedIndex] = {}
+        # pre-namespace collections left unqueried -> the warning reported for them
+        self.legacy_collections: Dict[str, str] = {}
+        # Bumped on every write so answer caches can tell when the knowledge base changed
+        self.generation = 0
+        self._index_lock = asyncio.Lock()
+        # writes to collections whose derived indexes are being built, replayed when the build
+        # finishes; keyed by (index kind, collection name), guarded by _derived_lock
+        self._build_logs: Dict[Tuple[str, str], List[Tuple]] = {}
+        self._derived_lock = threading.Lock()
+        # held by every chunk write (they run on worker threads) and by the final step of a namespace swap
+        self._write_lock = threading.Lock()
+        # concurrent searches share embedding calls and collection queries (see search_with_timings)
+        self._embed_batcher = MicroBatcher(self._embed_batch, settings.SEARCH_BATCH_WINDOW_MS, settings.SEARCH_BATCH_MAX)
+        self._query_batcher = MicroBatcher(self._query_batch, settings.SEARCH_BATCH_WINDOW_MS, settings.SEARCH_BATCH_MAX)
+        self._search_flight = SingleFlight()
 
     async def initialize(self):
-        """Initialize ChromaDB client and collection"""
+        """Open the configured vector store (VECTOR_BACKEND) and load the embedding namespaces"""
         try:
-            os.makedirs(settings.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
+            self.store = create_vector_store()
+
+            self.load_namespaces()
+            await self.adopt_legacy_collections()
+            print(f"Connected to {settings.VECTOR_BACKEND} vector store ({len(self.namespaces)} embedding namespaces)")
+
+        except Exception as e:
+            self.store = None
+            print(f"Vector store ({settings.VECTOR_BACKEND}) initialization error: {e}")
+            print("Continuing without vector storage...")
+
+    def load_namespaces(self):
+        """Rebuild the namespace registry from collection metadata, dropping cached indexes"""
+        self.collections, self.namespaces = {}, {}
+        self.lexical_indexes, self.url_indexes, self.quantized_indexes = {}, {}, {}
+        for collection in self.store.list_collections():
+            metadata = collection.metadata or {}
+            if metadata.get('embedding_provider'):
+                self.collections[collection.name] = collection
+                self.namespaces[collection.name] = {
+                    'provider': metadata['embedding_provider'],
+                    'model': metadata['embedding_model'],
+                    'dimension': metadata['embedding_dimension']
+                }
+        self.generation += 1
+
+    async def adopt_legacy_collections(self):
+        """Serve pre-namespace collections whose vectors fit the active embedder.
+
+        enterprise_rag_knowledge and enterprise_rag_knowledge_local predate the
+        embedding metadata. One whose stored dimension matches the active
+        embedder becomes that embedder's namespace (renamed and tagged) unless
+        the namespace exists already; any other is left unqueried and reported
+        at startup and in /stats, pointing to the /api/admin/reembed migration.
+        """
+        self.legacy_collections = {}
+        legacy = []
+        for collection in self.store.list_collections():
+            metadata = collection.metadata or {}
+            if collection.name.startswith(COLLECTION_NAME) and not metadata.get('embedding_provider') \
+                    and not metadata.get('reembed_job'):
+                legacy.append((await asyncio.to_thread(collection.count), collection))
+        if not legacy:
+            return
+
+        provider, model = ai_service.active_embedding_model()
+        dimension = await self._embedder_dimension(provider, model)
+        for count, collection in sorted(legacy, key=lambda item: item[0], reverse=True):
+            sample = await asyncio.to_thread(collection.get, limit=1, include=['embeddings'])
+            if not sample['embeddings']:
+                continue
+            stored = len(sample['embeddings'][0])
+            name = self.namespace_name(provider, model, stored)
+            if stored == dimension and name not in self.collections:
+                legacy_name = collection.name
+                await asyncio.to_thread(collection.modify, name=name,
+                                        metadata=self._namespace_metadata(provider, model, stored))
+                self.collections[name] = collection
+                self.namespaces[name] = {'provider': provider, 'model': model, 'dimension': stored}
+                self.generation += 1
+                print(f"Adopted legacy collection {legacy_name} ({count} chunks) as namespace {name}")
+                continue
+
+            if dimension is None:
+                reason = f"the dimension of the active embedder {provider}/{model} could not be determined"
+            elif stored != dimension:
+                reason = f"the active embedder {provider}/{model} produces {dimension}-d vectors"
+            else:
+                reason = f"namespace {name} already exists"
+            warning = (f"Legacy collection {collection.name} ({count} chunks, {stored}-d) is not queried: {reason}. "
+                       f"Migrate it with POST /api/admin/reembed and source_collection={collection.name}")
+            self.legacy_collections[collection.name] = warning
+            print(f"[WARN] {warning}")
+
+    async def _embedder_dimension(self, provider: str, model: str) -> Optional[int]:
+        """Vector size of an embedder: known locally, from its namespace, or by embedding a probe"""
+        if provider == ai_service.local_embedder.provider:
+            return ai_service.local_embedder.dimension
+        for namespace in self.namespaces.values():
+            if (namespace['provider'], namespace['model']) == (provider, model):
+                return namespace['dimension']
+        try:
+            _, _, embeddings = await ai_service.embed_texts_with(provider, ["dimension probe"])
+            return len(embeddings[0])
+        except Exception as e:
+            print(f" {provider} embedding failed: {str(e)}")
+            return None
+
+    @staticmethod
+    def _namespace_metadata(provider: str, model: str, dimension: int) -> Dict[str, Any]:
+        return {
+            "description": f"Enterprise RAG Bot Knowledge Base ({provider}/{model}, {dimension}-d)",
+            "embedding_provider": provider,
+            "embedding_model": model,
+            "embedding_dimension": dimension
+        }
+
+    @staticmethod
+    def namespace_name(provider: str, model: str, dimension: int) -> str:
+        """Collection name for one (provider, model, dimension) namespace, within Chroma's 63 character limit"""
+        slug = re.sub(r"[^a-zA-Z0-9]+", "-", f"{provider}__{model}").strip("-").lower()
+        name = f"{COLLECTION_NAME}__{slug}__{dimension}"
+        if len(name) > 63:
+            digest = hashlib.sha256(f"{provider}|{model}".encode('utf-8')).hexdigest()[:8]
+            keep = 63 - len(f"{COLLECTION_NAME}__-{digest}__{dimension}")
+            name = f"{COLLECTION_NAME}__{slug[:keep].strip('-')}-{digest}__{dimension}"
+        return name
+
+    def _find_namespace(self, provider: str, model: str, dimension: Optional[int] = None):
+        """Existing collection for an embedder, or None when nothing was stored with it yet"""
+        if dimension is not None:
+            return self.collections.get(self.namespace_name(provider, model, dimension))
+        for name, namespace in self.namespaces.items():
+            if namespace['provider'] == provider and namespace['model'] == model:
+                return self.collections[name]
+        return None
 
-            self.client = chromadb.PersistentClient(
-                path=settings.CHROMA_PERSIST_DIRECTORY,
-                settings=ChromaSettings(
-                    anonymized_telemetry=False,
-                    allow_reset=True
+    def _collection_for(self, provider: str, model: str, dimension: int):
+        """Get or create the namespace collection, refusing vectors of another dimension"""
+        name = self.namespace_name(provider, model, dimension)
+        namespace = self.namespaces.get(name)
+        if namespace is not None:
+            if (namespace['provider'], namespace['model'], namespace['dimension']) != (provider, model, dimension):
+                raise ValueError(
+                    f"Refusing to write {provider}/{model} {dimension}-d vectors into {name}, which holds "
+                    f"{namespace['provider']}/{namespace['model']} {namespace['dimension']}-d vectors"
                 )
-            )
+            return self.collections[name]
+
+        collection = self.store.get_or_create_collection(
+            name=name,
+            metadata=self._namespace_metadata(provider, model, dimension)
+        )
+        self.collections[name] = collection
+        self.namespaces[name] = {'provider': provider, 'model': model, 'dimension': dimension}
+        print(f"Created vector store namespace {name}")
+        return collection
+
+    def get_stored_collection(self, name: str):
+        """Any knowledge collection by name, including legacy and shadow collections"""
+        if name in self.collections:
+            return self.collections[name]
+        if not name.startswith(COLLECTION_NAME):
+            raise ValueError(f"Unknown collection: {name}")
+        try:
+            return self.store.get_collection(name)
+        except ValueError:
+            raise ValueError(f"Unknown collection: {name}")
+
+    def create_shadow_collection(self, job_id: str):
+        """Empty collection that a migration fills before it replaces a namespace"""
+        return self.store.get_or_create_collection(
+            name=f"{COLLECTION_NAME}_shadow_{job_id[:16]}",
+            metadata={"description": "Enterprise RAG Bot re-embedding shadow collection", "reembed_job": job_id}
+        )
 
+    async def swap_in_namespace(self, shadow, provider: str, model: str, dimension: int) -> Dict[str, Any]:
+        """Make a filled shadow collection the (provider, model, dimension) namespace.
+
+        Chunks of the existing namespace are carried over first (the newer
+        timestamp wins for ids present in both). The bulk copy runs on worker
+        threads while ingestion goes on; writes to the namespace meanwhile are
+        logged and settled in the final step, which holds the write lock and
+        runs without yielding to the event loop, so no search or ingestion
+        observes a half-swapped namespace.
+        """
+        name = self.namespace_name(provider, model, dimension)
+        try:
+            existing = self.collections.get(name) or self.store.get_collection(name)
+        except ValueError:
+            existing = None
+
+        carried = set()
+        key = ('swap', name)
+        if existing is not None:
+            with self._derived_lock:
+                self._build_logs[key] = []
             try:
-                self.collection = self.client.get_collection("enterprise_rag_knowledge")
-                print("Connected to existing ChromaDB collection")
-            except Exception:
-                self.collection = self.client.create_collection(
-                    name="enterprise_rag_knowledge",
-                    metadata={"description": "Enterprise RAG Bot Knowledge Base"}
-                )
-                print("Created new ChromaDB collection")
+                async for page in self._snapshot_pages(existing, ['documents', 'metadatas', 'embeddings'], 500):
+                    carried.update(await asyncio.to_thread(self._carry_over, shadow, page))
+            except BaseException:
+                with self._derived_lock:
+                    self._build_logs.pop(key, None)
+                raise
 
-        except Exception as e:
-            print(f"ChromaDB initialization error: {e}")
-            print("Continuing without ChromaDB...")
+        # taken on a worker thread so the loop never blocks on it; released from the loop below
+        await asyncio.to_thread(self._write_lock.acquire)
+        try:
+            if existing is not None:
+                with self._derived_lock:
+                    log = self._build_logs.pop(key, [])
+                for op in log:
+                    if op[0] == 'add':
+                        page = existing.get(ids=op[1], include=['documents', 'metadatas', 'embeddings'])
+                        carried.update(self._carry_over(shadow, page))
+                    else:
+                        gone = [doc_id for doc_id in op[1] if doc_id in carried]
+                        if gone:
+                            shadow.delete(ids=gone)
+                            carried.difference_update(gone)
+                self.store.delete_collection(name)
+
+            shadow.modify(name=name, metadata=self._namespace_metadata(provider, model, dimension))
+            self.collections[name] = shadow
+            self.namespaces[name] = {'provider': provider, 'model': model, 'dimension': dimension}
+            self.lexical_indexes.pop(name, None)
+            self.url_indexes.pop(name, None)
+            self.quantized_indexes.pop(name, None)
+            self.generation += 1
+        finally:
+            self._write_lock.release()
+        print(f"Swapped re-embedded collection into namespace {name} ({len(carried)} live chunks carried over)")
+        return {'collection': name, 'carried_over': len(carried), 'replaced_existing': existing is not None}
+
+    @staticmethod
+    def _carry_over(shadow, page: Dict[str, Any]) -> List[str]:
+        """Copy the chunks of ``page`` that the shadow lacks or holds an older version of; returns their ids"""
+        if not page['ids']:
+            return []
+        current = shadow.get(ids=page['ids'], include=['metadatas'])
+        shadow_epochs = {
+            doc_id: (metadata or {}).get('timestamp_epoch', 0)
+            for doc_id, metadata in zip(current['ids'], current['metadatas'])
+        }
+        keep = [
+            i for i, doc_id in enumerate(page['ids'])
+            if doc_id not in shadow_epochs
+            or (page['metadatas'][i] or {}).get('timestamp_epoch', 0) > shadow_epochs[doc_id]
+        ]
+        if keep:
+            shadow.upsert(
+                ids=[page['ids'][i] for i in keep],
+                documents=[page['documents'][i] for i in keep],
+                metadatas=[page['metadatas'][i] for i in keep],
+                embeddings=[page['embeddings'][i] for i in keep]
+            )
+        return [page['ids'][i] for i in keep]
+
+    def restore_collections(self, collections: Iterable[Tuple[str, Dict[str, Any], Iterable[Tuple]]],
+                            replace: bool = True) -> None:
+        """Bulk-load (name, metadata, blocks) collections, each block being (ids, documents, metadatas, embeddings).
+
+        Runs on a worker thread and holds the write lock throughout, so no chunk
+        write interleaves with the load. With ``replace`` each collection is
+        emptied first. The namespace registry is reloaded afterwards, which
+        drops the derived indexes (quantized tiers on disk too) and bumps the
+        generation so cached answers are not served from the old contents.
+        """
+        with self._write_lock:
+            for name, metadata, blocks in collections:
+                if replace:
+                    try:
+                        self.store.delete_collection(name)
+                    except ValueError:
+                        pass
+                QuantizedIndex.destroy(self._quantized_path(name))
+                collection = self.store.get_or_create_collection(name=name, metadata=metadata)
+                for ids, documents, metadatas, embeddings in blocks:
+                    collection.upsert(ids=ids, documents=documents, metadatas=metadatas, embeddings=embeddings)
+            self.load_namespaces()
+
+    def drop_collection(self, name: str):
+        """Delete one knowledge collection (a migrated source or an abandoned shadow)"""
+        try:
+            self.store.delete_collection(name)
+        except ValueError:
+            pass
+        self.collections.pop(name, None)
+        self.namespaces.pop(name, None)
+        self.legacy_collections.pop(name, None)
+        self.lexical_indexes.pop(name, None)
+        self.url_indexes.pop(name, None)
+        self.quantized_indexes.pop(name, None)
+        QuantizedIndex.destroy(self._quantized_path(name))
+        self.generation += 1
+
+    @staticmethod
+    def document_key(doc: Dict[str, Any], content: str) -> str:
+        """Identity of a document: its URL, or its source plus a hash of its full text when it has none"""
+        if doc.get('url'):
+            return doc['url']
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        return f"{doc.get('source', 'web_scraping')}:{digest}"
+
+    @staticmethod
+    def make_chunk_id(document_key: str, chunk_index: int) -> str:
+        """Stable chunk id: document identity + chunk position (the content hash lives in metadata)"""
+        key = f"{document_key}#{chunk_index}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
 
     async def add_documents(self, documents: List[Dict[str, Any]]) -> List[str]:
-        """Add documents to ChromaDB with embeddings"""
-        if not self.collection:
+        """Chunk and upsert documents into the vector store, returning the chunk ids ([] on failure)"""
+        if not self.store:
             await self.initialize()
 
-        if not self.collection:
-            print("ChromaDB not available, skipping document addition")
+        if not self.store:
+            print("Vector store not available, skipping document addition")
             return []
 
         try:
-            ids, texts, metadatas = [], [], []
+            return (await self.ingest_documents(documents))['ids']
+        except Exception as e:
+            print(f"Error adding documents to the vector store: {e}")
+            return []
+
+    def chunk_records(self, doc: Dict[str, Any]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        """Lazily yield (chunk id, chunk text, chunk metadata) for one document"""
+        content = doc['content']
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        else:
+            content = str(content).encode('utf-8', errors='replace').decode('utf-8')
+
+        url = doc.get('url', '')
+        document_key = self.document_key(doc, content)
+        timestamp = doc.get('timestamp', '')
+        try:
+            timestamp_epoch = self._to_epoch(timestamp) if timestamp else time.time()
+        except ValueError:
+            timestamp_epoch = time.time()
 
-            for doc in documents:
-                doc_id = str(uuid.uuid4())
+        for chunk_index, chunk in enumerate(iter_chunks(content)):
+            content_hash = hashlib.sha256(chunk.encode('utf-8')).hexdigest()
+            yield self.make_chunk_id(document_key, chunk_index), chunk, {
+                'url': url,
+                'domain': UrlIndex.domain_of(url),
+                'format': doc.get('format', 'text'),
+                'timestamp': timestamp,
+                'timestamp_epoch': timestamp_epoch,
+                'source': doc.get('source', 'web_scraping'),
+                'title': doc.get('title', ''),
+                'content_length': len(content),
+                'chunk_index': chunk_index,
+                'content_hash': content_hash
+            }
+
+    async def ingest_documents(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Chunk and upsert documents, embedding only new or changed chunks.
+
+        Each document is split lazily by the shared chunker and written in
+        batches of INGEST_BATCH_CHUNKS, so long pages are stored in full
+        without ever holding all of their chunks in memory. Chunks left over
+        from a longer previous version of the same URL are removed, which
+        makes re-ingesting a URL a replace that only embeds what changed.
+        """
+        if not self.store:
+            await self.initialize()
+        if not self.store:
+            raise ValueError("Vector store is not available")
+
+        ids, pending, chunk_counts = [], {}, {}
+        upserted = skipped = 0
+
+        for doc in documents:
+            chunk_count = 0
+            for doc_id, chunk, metadata in self.chunk_records(doc):
                 ids.append(doc_id)
+                pending[doc_id] = (chunk, metadata)
+                chunk_count += 1
+
+                if len(pending) >= settings.INGEST_BATCH_CHUNKS:
+                    stored = await self._upsert_chunks(pending)
+                    upserted += stored
+                    skipped += len(pending) - stored
+                    pending = {}
+
+            if doc.get('url', ''):
+                chunk_counts[doc['url']] = chunk_count
 
-                
-                content = doc['content']
-                if isinstance(content, bytes):
-                    content = content.decode('utf-8', errors='replace')
-                else:
-                    content = str(content).encode('utf-8', errors='replace').decode('utf-8')
-
-                
-                if len(content) > 8000:
-                    content = content[:8000] + "..."
-
-                texts.append(content)
-                metadatas.append({
-                    'url': doc.get('url', ''),
-                    'format': doc.get('format', 'text'),
-                    'timestamp': doc.get('timestamp', ''),
-                    'source': doc.get('source', 'web_scraping'),
-                    'title': doc.get('title', ''),
-                    'content_length': len(doc.get('content', ''))
-                })
-
-            embeddings = await ai_service.generate_embeddings(texts)
-            self.collection.add(
+        if pending:
+            stored = await self._upsert_chunks(pending)
+            upserted += stored
+            skipped += len(pending) - stored
+
+        removed = 0
+        for url, chunk_count in chunk_counts.items():
+            removed += await asyncio.to_thread(self.delete_stale_chunks, url, chunk_count)
+
+        print(f"Upserted {upserted} chunks to the vector store ({skipped} unchanged skipped, {removed} stale removed)")
+        return {'ids': ids, 'upserted': upserted, 'unchanged': skipped, 'stale_removed': removed}
+
+    async def _upsert_chunks(self, pending: Dict[str, Tuple[str, Dict[str, Any]]]) -> int:
+        """Embed and upsert the chunks whose content hash changed; returns how many were written"""
+        provider, model, pending, embeddings = await self.embed_changed(pending)
+        if not pending:
+            return 0
+
+        upsert_ids = list(pending)
+        texts = [pending[doc_id][0] for doc_id in upsert_ids]
+        metadatas = [pending[doc_id][1] for doc_id in upsert_ids]
+        return await asyncio.to_thread(self.store_embedded, provider, model, upsert_ids, texts, metadatas, embeddings)
+
+    async def embed_changed(self, pending: Dict[str, Tuple[str, Dict[str, Any]]]
+                            ) -> Tuple[str, str, Dict[str, Tuple[str, Dict[str, Any]]], List[List[float]]]:
+        """Embed the chunks of ``pending`` that the embedding provider has not stored yet.
+
+        Providers are tried in embed_texts' fallback order, and each one is
+        checked against its own namespace before it embeds, so a fallback
+        never skips chunks only the failed provider had stored. Returns
+        (provider, model, changed chunks, their embeddings in order).
+        """
+        chain = ai_service.embedding_chain()
+        for provider, model in chain:
+            changed = await asyncio.to_thread(self.changed_chunks, pending, provider, model)
+            if not changed:
+                return provider, model, {}, []
+            try:
+                _, model, embeddings = await ai_service.embed_texts_with(provider, [chunk for chunk, _ in changed.values()])
+            except Exception as e:
+                print(f" {provider} embedding failed: {str(e)}")
+                continue
+            if provider == chain[-1][0] and len(chain) > 1:
+                print("All remote embedding services failed, using local hashing embedder")
+            return provider, model, changed, embeddings
+        raise ValueError("No embedding provider available")
+
+    def changed_chunks(self, pending: Dict[str, Tuple[str, Dict[str, Any]]], provider: str,
+                       model: str) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """The subset of ``pending`` not already stored with the same content hash in the namespace of provider/model"""
+        pending = dict(pending)
+        collection = self._find_namespace(provider, model)
+        if collection is not None:
+            existing = collection.get(ids=list(pending), include=['metadatas'])
+            for existing_id, metadata in zip(existing['ids'], existing['metadatas']):
+                if metadata and metadata.get('content_hash') == pending[existing_id][1]['content_hash']:
+                    del pending[existing_id]
+        return pending
+
+    def store_embedded(self, provider: str, model: str, ids: List[str], texts: List[str],
+                       metadatas: List[Dict[str, Any]], embeddings: List[List[float]]) -> int:
+        """Upsert already embedded chunks into their namespace and keep the side indexes in step"""
+        dimensions = {len(embedding) for embedding in embeddings}
+        if len(dimensions) != 1:
+            raise ValueError(f"Refusing mixed-dimension batch from {provider}/{model}: {sorted(dimensions)}")
+        with self._write_lock:
+            collection = self._collection_for(provider, model, dimensions.pop())
+            collection.upsert(
                 documents=texts,
                 metadatas=metadatas,
                 ids=ids,
                 embeddings=embeddings
             )
+            self.generation += 1
+            self._update_derived(collection.name, ('add', ids, texts, [m['url'] for m in metadatas], embeddings))
+        return len(ids)
 
-            print(f"Added {len(documents)} documents to ChromaDB")
-            return ids
-        except Exception as e:
-            print(f"Error adding documents to ChromaDB: {e}")
-            return []
+    def delete_stale_chunks(self, url: str, chunk_count: int) -> int:
+        """Remove chunks of ``url`` beyond its current chunk count from every namespace"""
+        removed = 0
+        with self._write_lock:
+            for collection in list(self.collections.values()):
+                stale = collection.get(
+                    where={'$and': [{'url': {'$eq': url}}, {'chunk_index': {'$gte': chunk_count}}]},
+                    include=[]
+                )
+                if not stale['ids']:
+                    continue
+                collection.delete(ids=stale['ids'])
+                self.generation += 1
+                self._update_derived(collection.name, ('remove', stale['ids']))
+                removed += len(stale['ids'])
+        return removed
 
-    async def search_documents(self, query: str, n_results: int = 5) -> List[Dict[str, Any]]:
-        """Search documents in ChromaDB"""
-        if not self.collection:
+    def _delete_ids(self, name: str, ids: List[str]) -> int:
+        """Delete chunks from one namespace by id, keeping the side indexes in step"""
+        with self._write_lock:
+            collection = self.collections.get(name)
+            if collection is None:
+                return 0
+            for start in range(0, len(ids), 5000):
+                collection.delete(ids=ids[start:start + 5000])
+            self._update_derived(name, ('remove', ids))
+        return len(ids)
+
+    async def delete_documents(self, url: Optional[str] = None, url_prefix: Optional[str] = None,
+                               source: Optional[str] = None) -> Dict[str, Any]:
+        """Delete every chunk matching all given criteria, in every namespace.
+
+        URL and URL-prefix matches are resolved through the provenance index
+        (URL -> chunk ids); ``source`` is evaluated by the vector store. Other chunks and
+        their embeddings are left untouched.
+        """
+        if not (url or url_prefix or source):
+            raise ValueError("Specify at least one of url, url_prefix or source")
+        if not self.store:
             await self.initialize()
+        if not self.store:
+            raise ValueError("Vector store is not available")
+
+        deleted: Dict[str, int] = {}
+        for name, collection in list(self.collections.items()):
+            ids = None
+            if url or url_prefix:
+                _, url_index = await self._indexes_for(collection)
+                urls = url_index.urls_with_prefix(url_prefix) if url_prefix else []
+                if url:
+                    urls = [u for u in urls if u == url] if url_prefix else [url]
+                ids = set(url_index.ids_for_urls(urls))
+            if source:
+                matched = await asyncio.to_thread(collection.get, where={'source': {'$eq': source}}, include=[])
+                ids = set(matched['ids']) if ids is None else ids & set(matched['ids'])
+            if not ids:
+                continue
+
+            deleted[name] = await asyncio.to_thread(self._delete_ids, name, list(ids))
 
-        if not self.collection:
-            print("ChromaDB not available, returning empty results")
+        if deleted:
+            self.generation += 1
+        total = sum(deleted.values())
+        print(f"Deleted {total} chunks (url={url}, url_prefix={url_prefix}, source={source})")
+        return {'deleted': total, 'namespaces': deleted}
+
+    def _update_derived(self, name: str, op: Tuple):
+        """Apply a write to the derived indexes of a collection, and log it for builds in progress.
+
+        ``op`` is ('add', ids, texts, urls, embeddings) or ('remove', ids).
+        """
+        with self._derived_lock:
+            for (_, logged), log in self._build_logs.items():
+                if logged == name:
+                    log.append(op)
+            if name in self.lexical_indexes:
+                self._apply_lexical(op, self.lexical_indexes[name], self.url_indexes[name])
+            if name in self.quantized_indexes:
+                self._apply_quantized(op, self.quantized_indexes[name])
+
+    @staticmethod
+    def _apply_lexical(op: Tuple, lexical_index: LexicalIndex, url_index: UrlIndex):
+        if op[0] == 'add':
+            lexical_index.add_many(op[1], op[2])
+            url_index.add_many(op[1], op[3])
+        else:
+            lexical_index.remove(op[1])
+            url_index.remove(op[1])
+
+    @staticmethod
+    def _apply_quantized(op: Tuple, index: QuantizedIndex):
+        if op[0] == 'add':
+            index.upsert(op[1], op[4])
+        else:
+            index.remove(op[1])
+
+    @staticmethod
+    async def _snapshot_pages(collection, include: List[str], page_size: int = 1000):
+        """Pages of a collection fetched by a snapshot of its ids, sorted once, so writes during the scan cannot shift rows"""
+        snapshot = await asyncio.to_thread(collection.get, include=[])
+        ids = sorted(snapshot['ids'])
+        for start in range(0, len(ids), page_size):
+            page = await asyncio.to_thread(collection.get, ids=ids[start:start + page_size], include=include)
+            if page['ids']:
+                yield page
+
+    async def _indexes_for(self, collection) -> Tuple[LexicalIndex, UrlIndex]:
+        """BM25 and URL indexes for a collection, built from its stored chunks on first use.
+
+        Writes made while the build scans the collection are logged by
+        _update_derived and replayed before the indexes are registered.
+        """
+        async with self._index_lock:
+            if collection.name not in self.lexical_indexes:
+                lexical_index, url_index = LexicalIndex(), UrlIndex()
+                key = ('lexical', collection.name)
+                with self._derived_lock:
+                    log = self._build_logs[key] = []
+                try:
+                    async for page in self._snapshot_pages(collection, ['documents', 'metadatas']):
+                        lexical_index.add_many(page['ids'], page['documents'])
+                        url_index.add_many(page['ids'], [(m or {}).get('url', '') for m in page['metadatas']])
+                    with self._derived_lock:
+                        for op in log:
+                            self._apply_lexical(op, lexical_index, url_index)
+                        # a restore or swap that replaced the collection meanwhile invalidates the build
+                        if self.collections.get(collection.name) is collection:
+                            self.lexical_indexes[collection.name] = lexical_index
+                            self.url_indexes[collection.name] = url_index
+                finally:
+                    with self._derived_lock:
+                        self._build_logs.pop(key, None)
+                print(f"Built lexical and URL indexes for {collection.name} ({len(lexical_index)} chunks)")
+                return lexical_index, url_index
+            return self.lexical_indexes[collection.name], self.url_indexes[collection.name]
+
+    @staticmethod
+    def _quantized_path(name: str) -> str:
+        return os.path.join(settings.VECTOR_TIER_DIRECTORY, name)
+
+    async def _quantized_for(self, collection) -> Optional[QuantizedIndex]:
+        """Quantized vector tier of a namespace, or None when VECTOR_TIER is off.
+
+        An index left on disk is reused when it belongs to the same collection,
+        dtype and chunk count; otherwise it is rebuilt from the stored embeddings,
+        replaying writes made during the build as _indexes_for does. A tier whose
+        chunk count still disagrees with the collection afterwards is dropped and
+        rebuilt on next use rather than served.
+        """
+        if settings.VECTOR_TIER not in QUANTIZED_DTYPES or collection.name not in self.namespaces:
+            return None
+        async with self._index_lock:
+            if collection.name not in self.quantized_indexes:
+                path = self._quantized_path(collection.name)
+                dimension = self.namespaces[collection.name]['dimension']
+                key = ('quantized', collection.name)
+                with self._derived_lock:
+                    log = self._build_logs[key] = []
+                try:
+                    index = QuantizedIndex.open(path)
+                    count = await asyncio.to_thread(collection.count)
+                    if index is None or (index.source_id, index.dtype, index.dimension, len(index)) != (
+                            str(collection.id), settings.VECTOR_TIER, dimension, count):
+                        index = QuantizedIndex.create(path, dimension, settings.VECTOR_TIER, str(collection.id))
+                        async for page in self._snapshot_pages(collection, ['embeddings']):
+                            await asyncio.to_thread(index.upsert, page['ids'], page['embeddings'])
+                        print(f"Built {settings.VECTOR_TIER} vector tier for {collection.name} "
+                              f"({len(index)} chunks, {index.nbytes()} bytes)")
+                    with self._derived_lock:
+                        for op in log:
+                            self._apply_quantized(op, index)
+                        if self.collections.get(collection.name) is not collection:
+                            return None
+                        self.quantized_indexes[collection.name] = index
+                finally:
+                    with self._derived_lock:
+                        self._build_logs.pop(key, None)
+                if not await self._tier_consistent(collection, index):
+                    return None
+            return self.quantized_indexes[collection.name]
+
+    async def _tier_consistent(self, collection, index: QuantizedIndex) -> bool:
+        """Compare the tier's live rows with the collection; an inconsistent tier is dropped"""
+        count = await asyncio.to_thread(collection.count)
+        if len(index) == count:
+            return True
+        print(f"[WARN] {settings.VECTOR_TIER} vector tier for {collection.name} has {len(index)} chunks, "
+              f"the collection {count}; rebuilding it on next use")
+        with self._derived_lock:
+            if self.quantized_indexes.get(collection.name) is index:
+                del self.quantized_indexes[collection.name]
+        QuantizedIndex.destroy(self._quantized_path(collection.name))
+        return False
+
+    @staticmethod
+    def _to_epoch(value: Any) -> float:
+        if isinstance(value, datetime):
+            return value.timestamp()
+        if isinstance(value, (int, float)):
+            return float(value)
+        return datetime.fromisoformat(str(value)).timestamp()
+
+    async def _where_for(self, collection, filters: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], bool]:
+        """Translate search filters into a vector store where clause.
+
+        Returns (where, matchable); matchable is False when a URL prefix matches
+        nothing, so the search can be skipped entirely.
+        """
+        if not filters:
+            return None, True
+
+        clauses = []
+        for key in ('source', 'format'):
+            if filters.get(key):
+                clauses.append({key: {'$eq': filters[key]}})
+        if filters.get('domain'):
+            clauses.append({'domain': {'$eq': filters['domain'].lower()}})
+        if filters.get('timestamp_from') is not None:
+            clauses.append({'timestamp_epoch': {'$gte': self._to_epoch(filters['timestamp_from'])}})
+        if filters.get('timestamp_to') is not None:
+            clauses.append({'timestamp_epoch': {'$lte': self._to_epoch(filters['timestamp_to'])}})
+        if filters.get('url_prefix'):
+            _, url_index = await self._indexes_for(collection)
+            urls = url_index.urls_with_prefix(filters['url_prefix'])
+            if not urls:
+                return None, False
+            clauses.append({'url': {'$in': urls}})
+
+        if not clauses:
+            return None, True
+        return (clauses[0] if len(clauses) == 1 else {'$and': clauses}), True
+
+    async def _embed_batch(self, _, queries: List[str]) -> List[Tuple[str, str, List[float]]]:
+        """Embed every distinct query of a batch in one provider call"""
+        distinct = list(dict.fromkeys(queries))
+        provider, model, embeddings = await ai_service.embed_texts(distinct)
+        by_query = dict(zip(distinct, embeddings))
+        return [(provider, model, by_query[query]) for query in queries]
+
+    async def _query_batch(self, group: Tuple, items: List[Tuple[Any, List[float]]]) -> List[Dict[str, Any]]:
+        """Run one multi-vector query for items sharing collection, n_results, where and include"""
+        _, n_results, where_key, include = group
+        collection = items[0][0]
+        quantized = await self._quantized_for(collection) if where_key == "null" else None
+        if quantized is not None:
+            return await asyncio.to_thread(
+                self._two_stage_query, quantized, collection, [embedding for _, embedding in items], n_results
+            )
+        results = await asyncio.to_thread(
+            collection.query,
+            query_embeddings=[embedding for _, embedding in items],
+            n_results=n_results,
+            where=json.loads(where_key),
+            include=list(include)
+        )
+        return [
+            {key: (values[i] if isinstance(values, list) else None) for key, values in results.items()}
+            for i in range(len(items))
+        ]
+
+    @staticmethod
+    def _candidates_from(row: Dict[str, Any], with_embeddings: bool) -> List[Dict[str, Any]]:
+        """Turn one query row of a vector store result into candidate dicts"""
+        candidates = []
+        for i, doc_id in enumerate(row['ids']):
+            candidate = {
+                'id': doc_id,
+                'distance': row['distances'][i],
+                'relevance_score': 1 - row['distances'][i]
+            }
+            if with_embeddings:
+                candidate['embedding'] = row['embeddings'][i]
+            candidates.append(candidate)
+        return candidates
+
+    @staticmethod
+    def _query_group(collection, n_results: int, where: Optional[Dict[str, Any]], with_embeddings: bool) -> Tuple:
+        include = ('distances', 'embeddings') if with_embeddings else ('distances',)
+        return collection.name, n_results, json.dumps(where, sort_keys=True), include
+
+    @staticmethod
+    def _two_stage_query(index: QuantizedIndex, collection, embeddings: List[List[float]],
+                         n_results: int) -> List[Dict[str, Any]]:
+        """Coarse scan of the quantized tier, exact rescoring against the vectors in the vector store"""
+        def fetch_full(ids: List[str]) -> Dict[str, List[float]]:
+            fetched = collection.get(ids=ids, include=['embeddings'])
+            return dict(zip(fetched['ids'], fetched['embeddings']))
+
+        rows = []
+        for hits in index.search(embeddings, n_results, settings.VECTOR_TIER_OVERSAMPLE, fetch_full):
+            rows.append({
+                'ids': [doc_id for doc_id, _, _ in hits],
+                'distances': [distance for _, distance, _ in hits],
+                'embeddings': [vector.tolist() for _, _, vector in hits]
+            })
+        return rows
+
+    async def _vector_search(self, collection, query_embedding: List[float], n_results: int,
+                             where: Optional[Dict[str, Any]], timings: Dict[str, float],
+                             with_embeddings: bool = False) -> List[Dict[str, Any]]:
+        """Nearest-neighbour candidates (ids, distances and optionally embeddings, no content)"""
+        started = time.perf_counter()
+        group = self._query_group(collection, n_results, where, with_embeddings)
+        row = await self._query_batcher.submit(group, (collection, query_embedding))
+        timings['vector_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return self._candidates_from(row, with_embeddings)
+
+    async def _lexical_search(self, collection, query: str, n_results: int,
+                              where: Optional[Dict[str, Any]], timings: Dict[str, float]) -> List[Dict[str, Any]]:
+        """BM25 candidates; relevance_score is the BM25 score normalized by the best hit"""
+        lexical_index, _ = await self._indexes_for(collection)
+
+        started = time.perf_counter()
+        allowed_ids = None
+        if where:
+            allowed = await asyncio.to_thread(collection.get, where=where, include=[])
+            allowed_ids = set(allowed['ids'])
+        hits = await asyncio.to_thread(lexical_index.search, query, n_results, allowed_ids)
+        timings['lexical_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+        top_score = hits[0][1] if hits and hits[0][1] else 1.0
+        return [{
+            'id': doc_id,
+            'distance': 1 - score / top_score,
+            'relevance_score': score / top_score,
+            'lexical_score': score
+        } for doc_id, score in hits]
+
+    @staticmethod
+    def _reciprocal_rank_fusion(result_lists: List[List[Dict[str, Any]]], n_results: int) -> List[Dict[str, Any]]:
+        """Merge ranked lists by RRF; a chunk keeps the fields of the first list it appears in"""
+        fused: Dict[str, Dict[str, Any]] = {}
+        for results in result_lists:
+            for rank, result in enumerate(results):
+                entry = fused.setdefault(result['id'], dict(result, rrf_score=0.0))
+                entry['rrf_score'] += 1.0 / (settings.RRF_K + rank + 1)
+        return sorted(fused.values(), key=lambda r: r['rrf_score'], reverse=True)[:n_results]
+
+    async def _rerank(self, collection, query: str, query_embedding: Optional[List[float]],
+                      candidates: List[Dict[str, Any]], n_results: int, rerank: str,
+                      timings: Dict[str, float]) -> List[Dict[str, Any]]:
+        """Reorder candidates by MMR and/or BM25 blending and keep the best ``n_results``"""
+        started = time.perf_counter()
+        ids = [c['id'] for c in candidates]
+        embeddings = None
+        if rerank in ("mmr", "mmr_lexical"):
+            missing = [c['id'] for c in candidates if 'embedding' not in c]
+            if missing:
+                fetched = await asyncio.to_thread(collection.get, ids=missing, include=['embeddings'])
+                by_id = dict(zip(fetched['ids'], fetched['embeddings']))
+                candidates = [c for c in candidates if 'embedding' in c or c['id'] in by_id]
+                for c in candidates:
+                    c.setdefault('embedding', by_id.get(c['id']))
+                ids = [c['id'] for c in candidates]
+            embeddings = [c['embedding'] for c in candidates]
+            relevance = reranker.cosine_relevance(query_embedding, embeddings)
+        else:
+            relevance = np.array([c['relevance_score'] for c in candidates], dtype=np.float32)
+
+        if rerank in ("lexical", "mmr_lexical"):
+            lexical_index, _ = await self._indexes_for(collection)
+            lexical_scores = lexical_index.score(query, ids)
+            relevance = reranker.blend_lexical(
+                relevance, [lexical_scores.get(doc_id, 0.0) for doc_id in ids], settings.RERANK_LEXICAL_WEIGHT
+            )
+
+        order = reranker.rerank_order(relevance, n_results, embeddings, settings.MMR_LAMBDA)
+        reranked = []
+        for i in order:
+            candidates[i]['rerank_score'] = float(relevance[i])
+            reranked.append(candidates[i])
+        timings['rerank_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return reranked
+
+    async def _hydrate(self, collection, candidates: List[Dict[str, Any]], timings: Dict[str, float]) -> List[Dict[str, Any]]:
+        """Fetch content and metadata for the final candidates only"""
+        if not candidates:
             return []
+        started = time.perf_counter()
+        fetched = await asyncio.to_thread(
+            collection.get, ids=[c['id'] for c in candidates], include=['documents', 'metadatas']
+        )
+        by_id = dict(zip(fetched['ids'], zip(fetched['documents'], fetched['metadatas'])))
+        search_results = []
+        for candidate in candidates:
+            if candidate['id'] not in by_id:
+                continue
+            candidate.pop('embedding', None)
+            candidate['content'], candidate['metadata'] = by_id[candidate['id']]
+            search_results.append(candidate)
+        timings['fetch_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return search_results
 
+    async def search_documents(self, query: str, n_results: int = 5, mode: str = "vector",
+                               filters: Optional[Dict[str, Any]] = None, rerank: str = "none",
+                               fetch_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Search the stored documents"""
+        search_results, _ = await self.search_with_timings(query, n_results, mode, filters, rerank, fetch_k)
+        return search_results
+
+    async def search_with_timings(self, query: str, n_results: int = 5, mode: str = "vector",
+                                  filters: Optional[Dict[str, Any]] = None, rerank: str = "none",
+                                  fetch_k: Optional[int] = None,
+                                  embedded: Optional[Tuple[str, str, List[float]]] = None
+                                  ) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """Search by vector similarity, BM25 or both fused with reciprocal rank fusion.
+
+        ``filters`` may contain source, format, domain, url_prefix, timestamp_from
+        and timestamp_to; they are evaluated inside the vector store rather than on the results.
+        With ``rerank`` set, ``fetch_k`` candidates are retrieved without content,
+        reranked (mmr, lexical or mmr_lexical) and only the final ``n_results`` are fetched.
+        Pass ``embedded`` as (provider, model, embedding) when the query is already embedded.
+
+        Searches running at the same time are coalesced: identical in-flight
+        searches share one computation, and the query embeddings and vector
+        queries of the rest are batched within SEARCH_BATCH_WINDOW_MS.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if rerank not in RERANK_MODES:
+            raise ValueError(f"Unknown rerank mode: {rerank}")
+
+        if not self.store:
+            await self.initialize()
+
+        if not self.store:
+            print("Vector store not available, returning empty results")
+            return [], {}
+
+        if isinstance(query, bytes):
+            query = query.decode('utf-8', errors='replace')
+        else:
+            query = str(query).encode('utf-8', errors='replace').decode('utf-8')
+
+        key = (query, n_results, mode, json.dumps(filters, sort_keys=True, default=str), rerank, fetch_k)
+        (search_results, timings), shared = await self._search_flight.do(
+            key, lambda: self._search(query, n_results, mode, filters, rerank, fetch_k, embedded)
+        )
+        if shared:
+            # followers get their own copies so callers can annotate results freely
+            return copy.deepcopy(search_results), dict(timings, shared=True)
+        return search_results, timings
+
+    @staticmethod
+    def _pool_sizes(n_results: int, mode: str, rerank: str, fetch_k: Optional[int]) -> Tuple[int, int]:
+        """(candidates kept after retrieval, candidates fetched from the vector index)"""
+        pool_size = max(fetch_k or n_results, n_results) if rerank != "none" else n_results
+        if mode == "hybrid":
+            return pool_size, max(pool_size * 2, settings.HYBRID_CANDIDATES)
+        return pool_size, pool_size
+
+    async def _search(self, query: str, n_results: int, mode: str, filters: Optional[Dict[str, Any]],
+                      rerank: str, fetch_k: Optional[int], embedded: Optional[Tuple[str, str, List[float]]] = None,
+                      vector_candidates: Optional[List[Dict[str, Any]]] = None,
+                      timings: Optional[Dict[str, float]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, float]]:
+        """One search; ``embedded`` and ``vector_candidates`` are supplied when search_batch already computed them"""
         try:
-            if isinstance(query, bytes):
-                query = query.decode('utf-8', errors='replace')
+            timings = dict(timings or {})
+            started = time.perf_counter()
+            pool_size, vector_k = self._pool_sizes(n_results, mode, rerank, fetch_k)
+
+            # queries only ever read the namespace of the embedder that produced the query vector
+            query_embedding = None
+            if embedded is not None:
+                provider, model, query_embedding = embedded
+                collection = self._find_namespace(provider, model, len(query_embedding))
+            elif mode != "lexical" or rerank in ("mmr", "mmr_lexical"):
+                provider, model, query_embedding = await self._embed_batcher.submit(None, query)
+                timings['embedding_ms'] = round((time.perf_counter() - started) * 1000, 2)
+                collection = self._find_namespace(provider, model, len(query_embedding))
             else:
-                query = str(query).encode('utf-8', errors='replace').decode('utf-8')
+                provider, model = ai_service.active_embedding_model()
+                collection = self._find_namespace(provider, model)
+            if collection is None:
+                print(f"No documents stored with {provider}/{model} yet")
+                return [], timings
 
-            query_embeddings = await ai_service.generate_embeddings([query])
+            where, matchable = await self._where_for(collection, filters)
+            if not matchable:
+                return [], timings
 
-            results = self.collection.query(
-                query_embeddings=query_embeddings,
-                n_results=n_results,
-                include=['documents', 'metadatas', 'distances']
-            )
+            with_embeddings = rerank in ("mmr", "mmr_lexical")
+
+            async def vector_stage():
+                if vector_candidates is not None:
+                    return vector_candidates
+                return await self._vector_search(collection, query_embedding, vector_k, where, timings, with_embeddings)
+
+            if mode == "vector":
+                candidates = await vector_stage()
+            elif mode == "lexical":
+                candidates = await self._lexical_search(collection, query, pool_size, where, timings)
+            else:
+                vector_results, lexical_candidates = await asyncio.gather(
+                    vector_stage(), self._lexical_search(collection, query, vector_k, where, timings)
+                )
+                fusion_started = time.perf_counter()
+                candidates = self._reciprocal_rank_fusion([vector_results, lexical_candidates], pool_size)
+                timings['fusion_ms'] = round((time.perf_counter() - fusion_started) * 1000, 2)
+
+            if rerank != "none" and candidates:
+                candidates = await self._rerank(collection, query, query_embedding, candidates, n_results, rerank, timings)
 
-            search_results = []
-            for i in range(len(results['documents'][0])):
-                search_results.append({
-                    'content': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i],
-                    'relevance_score': 1 - results['distances'][0][i]
-                })
-
-            print(f"Found {len(search_results)} relevant documents")
-            return search_results
+            search_results = await self._hydrate(collection, candidates[:n_results], timings)
+            timings['total_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+            print(f"Found {len(search_results)} relevant documents ({mode}, rerank={rerank})")
+            return search_results, timings
         except Exception as e:
-            print(f"Error searching documents in ChromaDB: {e}")
+            print(f"Error searching documents in the vector store: {e}")
+            return [], {}
+
+    async def search_batch(self, queries: List[str], n_results: int = 5, mode: str = "vector",
+                           filters: Optional[Dict[str, Any]] = None, rerank: str = "none",
+                           fetch_k: Optional[int] = None,
+                           embedded: Optional[Tuple[str, str, List[List[float]]]] = None
+                           ) -> List[Tuple[List[Dict[str, Any]], Dict[str, float]]]:
+        """Run many searches with one embedding call and one multi-vector store query.
+
+        Returns one (results, timings) pair per query, in input order. Pass
+        ``embedded`` as (provider, model, embeddings) when the caller already
+        embedded the queries. Lexical-only searches need no vectors and simply
+        run concurrently.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        if rerank not in RERANK_MODES:
+            raise ValueError(f"Unknown rerank mode: {rerank}")
+        if not queries:
             return []
 
+        if not self.store:
+            await self.initialize()
+        if not self.store:
+            print("Vector store not available, returning empty results")
+            return [([], {}) for _ in queries]
+
+        queries = [
+            q.decode('utf-8', errors='replace') if isinstance(q, bytes)
+            else str(q).encode('utf-8', errors='replace').decode('utf-8')
+            for q in queries
+        ]
+        if mode == "lexical" and rerank not in ("mmr", "mmr_lexical"):
+            return list(await asyncio.gather(
+                *(self._search(query, n_results, mode, filters, rerank, fetch_k) for query in queries)
+            ))
+
+        try:
+            timings: Dict[str, float] = {}
+            started = time.perf_counter()
+            if embedded is None:
+                distinct = list(dict.fromkeys(queries))
+                provider, model, embeddings = await ai_service.embed_texts(distinct)
+                by_query = dict(zip(distinct, embeddings))
+                embeddings = [by_query[query] for query in queries]
+                timings['embedding_ms'] = round((time.perf_counter() - started) * 1000, 2)
+            else:
+                provider, model, embeddings = embedded
+
+            collection = self._find_namespace(provider, model, len(embeddings[0]))
+            if collection is None:
+                print(f"No documents stored with {provider}/{model} yet")
+                return [([], dict(timings)) for _ in queries]
+            where, matchable = await self._where_for(collection, filters)
+            if not matchable:
+                return [([], dict(timings)) for _ in queries]
+
+            candidate_lists = [None] * len(queries)
+            if mode != "lexical":
+                vector_started = time.perf_counter()
+                _, vector_k = self._pool_sizes(n_results, mode, rerank, fetch_k)
+                with_embeddings = rerank in ("mmr", "mmr_lexical")
+                rows = await self._query_batch(
+                    self._query_group(collection, vector_k, where, with_embeddings),
+                    [(collection, embedding) for embedding in embeddings]
+                )
+                candidate_lists = [self._candidates_from(row, with_embeddings) for row in rows]
+                timings['vector_ms'] = round((time.perf_counter() - vector_started) * 1000, 2)
+        except Exception as e:
+            print(f"Error searching documents in the vector store: {e}")
+            return [([], {}) for _ in queries]
+
+        print(f"Batched {len(queries)} queries into one embedding call and one vector query")
+        return list(await asyncio.gather(*(
+            self._search(query, n_results, mode, filters, rerank, fetch_k, (provider, model, embedding),
+                         candidates, timings)
+            for query, embedding, candidates in zip(queries, embeddings, candidate_lists)
+        )))
+
+    def batching_stats(self) -> Dict[str, Any]:
+        return {
+            'window_ms': settings.SEARCH_BATCH_WINDOW_MS,
+            'embedding': self._embed_batcher.stats(),
+            'vector_query': self._query_batcher.stats(),
+            'shared_searches': self._search_flight.shared
+        }
+
     async def delete_collection(self):
-        """Delete the collection"""
+        """Delete every embedding namespace and the legacy collections"""
         try:
-            if self.client and self.collection:
-                self.client.delete_collection("enterprise_rag_knowledge")
-                self.collection = None
-                print("ChromaDB collection deleted")
+            if self.store:
+                for collection in self.store.list_collections():
+                    if collection.name.startswith(COLLECTION_NAME):
+                        self.store.delete_collection(collection.name)
+                        QuantizedIndex.destroy(self._quantized_path(collection.name))
+                self.collections = {}
+                self.namespaces = {}
+                self.legacy_collections = {}
+                self.lexical_indexes = {}
+                self.url_indexes = {}
+                self.quantized_indexes = {}
+                self.generation += 1
+                print("Knowledge collections deleted")
         except Exception as e:
-            print(f"Error deleting ChromaDB collection: {e}")
+            print(f"Error deleting knowledge collections: {e}")
 
     async def get_collection_stats(self) -> Dict[str, Any]:
-        """Get collection statistics"""
-        if not self.collection:
+        """Get collection statistics, per embedding namespace"""
+        if not self.store:
             await self.initialize()
 
-        if not self.collection:
+        if not self.store:
             return {
                 'document_count': 0,
                 'collection_name': 'enterprise_rag_knowledge (not available)'
             }
 
         try:
-            count = self.collection.count()
+            active_provider, active_model = ai_service.active_embedding_model()
+            namespaces = []
+            for collection in self.store.list_collections():
+                if not collection.name.startswith(COLLECTION_NAME):
+                    continue
+                namespace = self.namespaces.get(collection.name)
+                entry = {
+                    'collection': collection.name,
+                    'count': await asyncio.to_thread(collection.count),
+                    'provider': namespace['provider'] if namespace else None,
+                    'model': namespace['model'] if namespace else None,
+                    'dimension': namespace['dimension'] if namespace else None,
+                    'active': bool(namespace) and (namespace['provider'], namespace['model']) == (active_provider, active_model)
+                }
+                if collection.name in self.quantized_indexes:
+                    quantized = self.quantized_indexes[collection.name]
+                    entry['vector_tier'] = {'dtype': quantized.dtype, 'chunks': len(quantized), 'bytes': quantized.nbytes(),
+                                            'consistent': len(quantized) == entry['count']}
+                if namespace is None and (collection.metadata or {}).get('reembed_job'):
+                    entry['shadow'] = True
+                elif namespace is None:
+                    # collections from before namespacing that could not be adopted are kept for migration
+                    entry['legacy'] = True
+                    if collection.name in self.legacy_collections:
+                        entry['warning'] = self.legacy_collections[collection.name]
+                    sample = await asyncio.to_thread(collection.get, limit=1, include=['embeddings'])
+                    if sample['embeddings']:
+                        entry['dimension'] = len(sample['embeddings'][0])
+                namespaces.append(entry)
+
             return {
-                'document_count': count,
+                'document_count': sum(entry['count'] for entry in namespaces if entry['provider']),
                 'collection_name': 'enterprise_rag_knowledge',
+                'active_embedder': {'provider': active_provider, 'model': active_model},
+                'namespaces': namespaces,
+                'warnings': list(self.legacy_collections.values()),
                 'status': 'active'
             }
         except Exception as e:
-            print(f"Error getting ChromaDB stats: {e}")
+            print(f"Error getting vector store stats: {e}")
             return {
                 'document_count': 0,
                 'collection_name': 'enterprise_rag_knowledge (error)',
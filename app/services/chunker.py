@@ -0,0 +1,152 @@
+from typing import Iterable, Iterator, List, Tuple, Union
+import re
+from app.core.config import settings
+from app.services.context_packer import estimate_tokens
+
+_BLOCK_BREAK_RE = re.compile(r"\n[ \t]*\n")
+_SENTENCE_BREAK_RE = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"')\]]))\s+|\s*\n\s*")
+_WORD_RE = re.compile(r"\S+")
+_HEADING_RE = re.compile(r"^(#{1,6}\s+\S|[A-Z0-9][^\n.!?]{0,80}:?$)")
+
+
+def _iter_blocks(source: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Yield blank-line separated blocks without copying the whole input"""
+    if isinstance(source, str):
+        start = 0
+        for match in _BLOCK_BREAK_RE.finditer(source):
+            block = source[start:match.start()].strip()
+            if block:
+                yield block
+            start = match.end()
+        block = source[start:].strip()
+        if block:
+            yield block
+        return
+
+    buffer = ""
+    for piece in source:
+        # only the tail that can contain a new break is rescanned
+        scan_from = max(0, len(buffer) - 64)
+        buffer += piece
+        last = None
+        for last in _BLOCK_BREAK_RE.finditer(buffer, scan_from):
+            pass
+        if last is None:
+            continue
+        yield from _iter_blocks(buffer[:last.start()])
+        buffer = buffer[last.end():]
+    yield from _iter_blocks(buffer)
+
+
+def _is_heading(block: str) -> bool:
+    return "\n" not in block and bool(_HEADING_RE.match(block))
+
+
+def _split_words(text: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Split an oversized sentence on whitespace so no word is ever cut"""
+    words, used = [], 0
+    for match in _WORD_RE.finditer(text):
+        word = match.group()
+        tokens = estimate_tokens(word)
+        if tokens > max_tokens:
+            # unbroken runs such as encoded blobs are the one case that is cut by characters
+            if words:
+                yield " ".join(words), used
+                words, used = [], 0
+            step = max_tokens * 6
+            for start in range(0, len(word), step):
+                piece = word[start:start + step]
+                yield piece, estimate_tokens(piece)
+            continue
+        if words and used + tokens > max_tokens:
+            yield " ".join(words), used
+            words, used = [], 0
+        words.append(word)
+        used += tokens
+    if words:
+        yield " ".join(words), used
+
+
+def _iter_units(block: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Break a block into (sentence or word run, tokens) units that each fit in ``max_tokens``"""
+    # blocks far longer than the limit cannot fit, so they skip the whole-block token count
+    if len(block) <= 8 * max_tokens:
+        tokens = estimate_tokens(block)
+        if tokens <= max_tokens:
+            yield block, tokens
+            return
+    start = 0
+    for match in _SENTENCE_BREAK_RE.finditer(block):
+        yield from _fit(block[start:match.start()], max_tokens)
+        start = match.end()
+    yield from _fit(block[start:], max_tokens)
+
+
+def _fit(sentence: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    sentence = sentence.strip()
+    if not sentence:
+        return
+    tokens = estimate_tokens(sentence)
+    if tokens <= max_tokens:
+        yield sentence, tokens
+    else:
+        yield from _split_words(sentence, max_tokens)
+
+
+def iter_chunks(source: Union[str, Iterable[str]], target_tokens: int = None, overlap_tokens: int = None,
+                max_tokens: int = None) -> Iterator[str]:
+    """Lazily split text into retrieval chunks along document structure.
+
+    ``source`` is a string or an iterable of text pieces (e.g. a file read in
+    blocks). Paragraphs are packed together up to ``target_tokens``; headings
+    start a new chunk and stay attached to the text they introduce; paragraphs
+    larger than ``max_tokens`` are split at sentence, then word, boundaries.
+    Consecutive chunks share up to ``overlap_tokens`` of trailing sentences.
+    Only the chunk being assembled is held in memory.
+    """
+    target_tokens = target_tokens or settings.CHUNK_TARGET_TOKENS
+    overlap_tokens = settings.CHUNK_OVERLAP_TOKENS if overlap_tokens is None else overlap_tokens
+    max_tokens = max(max_tokens or settings.CHUNK_MAX_TOKENS, target_tokens)
+
+    units: List[str] = []
+    unit_tokens: List[int] = []
+    separators: List[str] = []  # paragraph break before a block's first unit, a space before later sentences
+    used = 0
+    fresh = 0  # units added since the last emitted chunk (overlap units are not fresh)
+
+    def emit() -> str:
+        nonlocal units, unit_tokens, separators, used, fresh
+        chunk = units[0] + "".join(separator + unit for separator, unit in zip(separators[1:], units[1:]))
+        keep, carried_tokens = 0, 0
+        for tokens in reversed(unit_tokens):
+            if carried_tokens + tokens > overlap_tokens or keep + 1 >= len(units):
+                break
+            keep += 1
+            carried_tokens += tokens
+        units = units[len(units) - keep:]
+        unit_tokens = unit_tokens[len(unit_tokens) - keep:]
+        separators = separators[len(separators) - keep:]
+        used = carried_tokens
+        fresh = 0
+        return chunk
+
+    for block in _iter_blocks(source):
+        if _is_heading(block) and fresh:
+            yield emit()
+            # a new section does not inherit the previous section's tail
+            units, unit_tokens, separators, used = [], [], [], 0
+        separator = "\n\n"
+        for unit, tokens in _iter_units(block, max_tokens):
+            if fresh and used + tokens > target_tokens:
+                last_is_heading = fresh == 1 and _is_heading(units[-1])
+                if not last_is_heading:
+                    yield emit()
+            units.append(unit)
+            unit_tokens.append(tokens)
+            separators.append(separator)
+            separator = " "
+            used += tokens
+            fresh += 1
+
+    if fresh:
+        yield emit()
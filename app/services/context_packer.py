@@ -0,0 +1,130 @@
+from typing import List, Optional, Sequence
+from dataclasses import dataclass, field
+import re
+
+# one token per punctuation mark and per run of up to six word characters
+_TOKEN_RE = re.compile(r"\w{1,6}|[^\w\s]", re.UNICODE)
+_SENTENCE_END_RE = re.compile(r"[.!?](?=\s)|\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count: one per punctuation mark, one per ~6 word characters"""
+    return len(_TOKEN_RE.findall(text or ""))
+
+
+@dataclass
+class PackedContext:
+    chunks: List[str] = field(default_factory=list)
+    indices: List[int] = field(default_factory=list)
+    tokens: int = 0
+    budget: int = 0
+    available: int = 0
+    trimmed: int = 0
+    truncated: int = 0
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.chunks)
+
+    def stats(self) -> dict:
+        return {
+            'context_tokens': self.tokens,
+            'context_budget': self.budget,
+            'chunks_used': len(self.chunks),
+            'chunks_available': self.available,
+            'chunks_trimmed': self.trimmed,
+            'chunks_truncated': self.truncated
+        }
+
+
+def _overlap(left: str, right: str, min_overlap: int) -> int:
+    """Length of the longest suffix of ``left`` that is also a prefix of ``right``"""
+    if len(left) < min_overlap or len(right) < min_overlap:
+        return 0
+    probe = right[:min_overlap]
+    start = max(0, len(left) - len(right))
+    best = 0
+    position = left.find(probe, start)
+    while position >= 0:
+        length = len(left) - position
+        if right.startswith(left[position:]):
+            best = length
+            break
+        position = left.find(probe, position + 1)
+    return best
+
+
+def _remove_overlap(chunk: str, selected: Sequence[str], min_overlap: int) -> str:
+    """Drop the parts of ``chunk`` already present at the seams of selected chunks"""
+    for other in selected:
+        if chunk in other:
+            return ""
+        head = _overlap(other, chunk, min_overlap)
+        if head:
+            chunk = chunk[head:]
+        tail = _overlap(chunk, other, min_overlap)
+        if tail:
+            chunk = chunk[:len(chunk) - tail]
+    return chunk.strip()
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to at most ``max_tokens``, preferring a sentence boundary"""
+    cut = 0
+    used = 0
+    for match in _TOKEN_RE.finditer(text):
+        used += 1
+        if used > max_tokens:
+            break
+        cut = match.end()
+    head = text[:cut]
+    boundary = None
+    for boundary in _SENTENCE_END_RE.finditer(head):
+        pass
+    if boundary is not None and boundary.end() > len(head) // 2:
+        head = head[:boundary.end()]
+    return head.strip()
+
+
+def pack_context(chunks: Sequence[str], budget_tokens: int, scores: Optional[Sequence[float]] = None,
+                 min_overlap: int = 32, min_fragment_tokens: int = 48) -> PackedContext:
+    """Greedily fill ``budget_tokens`` with chunks in relevance order.
+
+    Chunks are taken best-first (``scores`` descending, or input order when no
+    scores are given). Text overlapping an already packed chunk, as produced
+    by sliding-window chunking, is trimmed before counting. A chunk that does
+    not fit is truncated when at least ``min_fragment_tokens`` remain, and
+    otherwise skipped so that smaller, less relevant chunks can still fill the
+    budget.
+    """
+    order = list(range(len(chunks)))
+    if scores is not None:
+        order.sort(key=lambda i: -scores[i])
+
+    packed = PackedContext(budget=budget_tokens, available=len(chunks))
+    separator = estimate_tokens("\n\n") or 1
+    for index in order:
+        remaining = budget_tokens - packed.tokens - (separator if packed.chunks else 0)
+        if remaining <= 0:
+            break
+        original = (chunks[index] or "").strip()
+        text = _remove_overlap(original, packed.chunks, min_overlap)
+        if not text:
+            continue
+        if text != original:
+            packed.trimmed += 1
+
+        tokens = estimate_tokens(text)
+        if tokens > remaining:
+            if remaining < min_fragment_tokens:
+                continue
+            text = _truncate_to_tokens(text, remaining)
+            tokens = estimate_tokens(text)
+            packed.truncated += 1
+            if not text:
+                continue
+
+        packed.tokens += tokens + (separator if packed.chunks else 0)
+        packed.chunks.append(text)
+        packed.indices.append(index)
+    return packed
@@ -0,0 +1,188 @@
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urljoin, urlparse
+import asyncio
+import time
+import aiohttp
+import lxml.html
+from lxml import etree
+
+SKIPPED_EXTENSIONS = ('.pdf', '.jpg', '.png', '.gif', '.css', '.js')
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+
+class AsyncCrawler:
+    """Breadth-first crawler confined to one host.
+
+    Pages wait in a deque frontier and a fixed pool of workers fetches them
+    over one pooled aiohttp session. ``per_host`` caps requests in flight to
+    any one host and ``host_delay`` spaces out the requests each worker
+    slot makes to it. Links are parsed with lxml in a thread so large pages
+    do not stall the event loop.
+
+    A crawl stops once ``max_urls`` same-site links have been discovered or
+    the frontier is exhausted; pages deeper than ``max_depth`` are only
+    fetched in ``fetch_all`` mode.
+    """
+
+    def __init__(self, concurrency: int = 8, per_host: int = 4, host_delay: float = 0.0,
+                 timeout: float = 15.0, headers: Optional[Dict[str, str]] = None):
+        self.concurrency = max(1, concurrency)
+        self.per_host = max(1, per_host)
+        self.host_delay = max(0.0, host_delay)
+        self.timeout = timeout
+        self.headers = headers or {}
+        self._host_slots: Dict[str, asyncio.Semaphore] = {}
+
+    def _slot(self, host: str) -> asyncio.Semaphore:
+        if host not in self._host_slots:
+            self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        return self._host_slots[host]
+
+    @staticmethod
+    def extract_links(page_url: str, html: bytes) -> List[str]:
+        """Absolute same-site page links on a page, fragments removed, in document order"""
+        base_domain = urlparse(page_url).netloc
+        try:
+            anchors = lxml.html.fromstring(html).iter('a')
+        except (etree.ParserError, ValueError):
+            return []
+        links = []
+        for a in anchors:
+            if not a.get('href'):
+                continue
+            href = urldefrag(urljoin(page_url, a.get('href').strip()))[0]
+            parsed = urlparse(href)
+            if parsed.scheme not in ('http', 'https') or parsed.netloc != base_domain:
+                continue
+            if href.lower().endswith(SKIPPED_EXTENSIONS):
+                continue
+            links.append(href)
+        return links
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str) -> Tuple[int, str, bytes]:
+        async with self._slot(urlparse(url).netloc):
+            try:
+                async with session.get(url) as resp:
+                    resp.raise_for_status()
+                    return resp.status, resp.headers.get('Content-Type', ''), await resp.read()
+            finally:
+                if self.host_delay:
+                    await asyncio.sleep(self.host_delay)
+
+    async def crawl(self, base_url: str, max_depth: int = 2, max_urls: int = 100,
+                    on_page: Optional[Callable[[str, int, str, bytes], Awaitable[Any]]] = None,
+                    fetch_all: bool = False) -> Dict[str, Any]:
+        """Crawl from ``base_url``; returns the discovered URLs and crawl statistics.
+
+        ``on_page(url, depth, content_type, body)`` is awaited for every page
+        fetched successfully, after its links have been queued. With
+        ``fetch_all`` every discovered URL is fetched, including those found
+        at ``max_depth`` whose links are then not followed, so ``on_page``
+        sees the start page plus all discovered pages.
+        """
+        started = time.perf_counter()
+        frontier: Deque[Tuple[str, int]] = deque([(base_url, 0)])
+        discovered: Dict[str, None] = {}
+        seen: Set[str] = {base_url}
+        stats = {'pages': 0, 'errors': 0, 'bytes': 0}
+        wakeup = asyncio.Condition()
+        busy = 0
+
+        def finished() -> bool:
+            return not frontier or (len(discovered) >= max_urls and not fetch_all)
+
+        async def worker(session: aiohttp.ClientSession):
+            nonlocal busy
+            while True:
+                async with wakeup:
+                    # a worker may only quit once nobody is left who could add work
+                    await wakeup.wait_for(lambda: busy == 0 or not finished())
+                    if finished():
+                        wakeup.notify_all()
+                        return
+                    url, depth = frontier.popleft()
+                    busy += 1
+                page, links = None, []
+                try:
+                    page = await self._fetch_page(session, url, stats)
+                    if page is not None and depth <= max_depth and page[0].lower().startswith(HTML_CONTENT_TYPES):
+                        links = await asyncio.to_thread(self.extract_links, url, page[1])
+                finally:
+                    # publish links and leave ``busy`` together so idle workers never see a false end
+                    async with wakeup:
+                        for link in links:
+                            if len(discovered) >= max_urls:
+                                break
+                            if link in seen:
+                                continue
+                            seen.add(link)
+                            discovered[link] = None
+                            if depth < max_depth or fetch_all:
+                                frontier.append((link, depth + 1))
+                        busy -= 1
+                        wakeup.notify_all()
+                if page is not None and on_page is not None:
+                    try:
+                        await on_page(url, depth, page[0], page[1])
+                    except Exception as e:
+                        print(f"[WARN] Page handler failed for {url}: {e}")
+
+        async with self._session() as session:
+            await asyncio.gather(*(worker(session) for _ in range(self.concurrency)))
+
+        stats['discovered'] = len(discovered)
+        return {'urls': list(discovered), 'stats': self._finish_stats(stats, started)}
+
+    async def fetch_urls(self, urls: List[str],
+                         on_page: Callable[[str, int, str, bytes], Awaitable[Any]]) -> Dict[str, Any]:
+        """Fetch a fixed list of URLs with the worker pool, without following links.
+
+        ``on_page`` is called as in ``crawl`` (with depth 0); returns the crawl statistics.
+        """
+        started = time.perf_counter()
+        pending: Deque[str] = deque(dict.fromkeys(urls))
+        stats = {'pages': 0, 'errors': 0, 'bytes': 0}
+
+        async def worker(session: aiohttp.ClientSession):
+            while pending:
+                url = pending.popleft()
+                page = await self._fetch_page(session, url, stats)
+                if page is None:
+                    continue
+                try:
+                    await on_page(url, 0, page[0], page[1])
+                except Exception as e:
+                    print(f"[WARN] Page handler failed for {url}: {e}")
+
+        async with self._session() as session:
+            await asyncio.gather(*(worker(session) for _ in range(self.concurrency)))
+        return self._finish_stats(stats, started)
+
+    def _session(self) -> aiohttp.ClientSession:
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host)
+        return aiohttp.ClientSession(headers=self.headers, timeout=timeout, connector=connector)
+
+    @staticmethod
+    def _finish_stats(stats: Dict[str, Any], started: float) -> Dict[str, Any]:
+        elapsed = time.perf_counter() - started
+        stats.update({
+            'elapsed_s': round(elapsed, 3),
+            'pages_per_sec': round(stats['pages'] / elapsed, 2) if elapsed > 0 else 0.0
+        })
+        return stats
+
+    async def _fetch_page(self, session: aiohttp.ClientSession, url: str,
+                          stats: Dict[str, int]) -> Optional[Tuple[str, bytes]]:
+        """(content type, body), or None when the fetch failed"""
+        try:
+            _, content_type, body = await self._fetch(session, url)
+        except Exception as e:
+            stats['errors'] += 1
+            print(f"[WARN] URL discovery failed at {url}: {e}")
+            return None
+        stats['pages'] += 1
+        stats['bytes'] += len(body)
+        # servers that omit the header are treated as serving HTML
+        return content_type or 'text/html', body
@@ -0,0 +1,188 @@
+from typing import List, Optional, Dict, Any
+from array import array
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from app.core.config import settings
+
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed by (provider, model, normalized text hash).
+
+    Vectors are stored as float32 blobs in SQLite. When the stored bytes exceed
+    ``max_bytes`` the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes_used = 0
+        self._lock = threading.Lock()
+        self.conn = None
+        self._setup()
+
+    def _setup(self):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    dim INTEGER NOT NULL,
+                    vector BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+            self.conn.commit()
+            row = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+            self._bytes_used = row[0]
+            print(f"Embedding cache ready at {self.path} ({self._bytes_used} bytes)")
+        except Exception as e:
+            print(f"Embedding cache setup failed: {e}")
+            self.conn = None
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text so that trivially different inputs share a cache entry"""
+        text = unicodedata.normalize("NFC", text)
+        return re.sub(r"\s+", " ", text).strip()
+
+    @classmethod
+    def make_key(cls, provider: str, model: str, text: str) -> str:
+        digest = hashlib.sha256(cls.normalize(text).encode("utf-8", errors="replace")).hexdigest()
+        return f"{provider}:{model}:{digest}"
+
+    def get_many(self, provider: str, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return cached vectors in input order, ``None`` for misses"""
+        keys = [self.make_key(provider, model, text) for text in texts]
+        if not self.conn or not keys:
+            with self._lock:
+                self.misses += len(keys)
+            return [None] * len(keys)
+
+        found: Dict[str, List[float]] = {}
+        unique_keys = list(dict.fromkeys(keys))
+        with self._lock:
+            try:
+                for start in range(0, len(unique_keys), 500):
+                    batch = unique_keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    rows = self.conn.execute(
+                        f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchall()
+                    for key, blob in rows:
+                        found[key] = array("f", blob).tolist()
+                if found:
+                    now = time.time()
+                    self.conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                        [(now, key) for key in found]
+                    )
+                    self.conn.commit()
+            except Exception as e:
+                print(f"Embedding cache read failed: {e}")
+                found = {}
+
+            results = [found.get(key) for key in keys]
+            hit_count = sum(1 for r in results if r is not None)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, provider: str, model: str, texts: List[str], embeddings: List[List[float]]):
+        if not self.conn or not texts:
+            return
+
+        now = time.time()
+        rows = {}
+        for text, embedding in zip(texts, embeddings):
+            blob = array("f", embedding).tobytes()
+            rows[self.make_key(provider, model, text)] = (len(embedding), blob, len(blob), now)
+
+        with self._lock:
+            try:
+                keys = list(rows)
+                replaced = 0
+                for start in range(0, len(keys), 500):
+                    batch = keys[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    replaced += self.conn.execute(
+                        f"SELECT COALESCE(SUM(size), 0) FROM embeddings WHERE key IN ({placeholders})", batch
+                    ).fetchone()[0]
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, dim, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                    [(key,) + row for key, row in rows.items()]
+                )
+                self.conn.commit()
+                self._bytes_used += sum(row[2] for row in rows.values()) - replaced
+                if self._bytes_used > self.max_bytes:
+                    self._evict()
+            except Exception as e:
+                print(f"Embedding cache write failed: {e}")
+
+    def _evict(self):
+        """Drop least recently used entries until usage is back under 90% of the limit"""
+        target = int(self.max_bytes * 0.9)
+        while self._bytes_used > target:
+            rows = self.conn.execute(
+                "SELECT key, size FROM embeddings ORDER BY last_access ASC LIMIT 500"
+            ).fetchall()
+            if not rows:
+                self._bytes_used = 0
+                break
+            freed, victims = 0, []
+            for key, size in rows:
+                victims.append((key,))
+                freed += size
+                if self._bytes_used - freed <= target:
+                    break
+            self.conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+            self.conn.commit()
+            self._bytes_used -= freed
+            self.evictions += len(victims)
+
+    def clear(self):
+        if not self.conn:
+            return
+        with self._lock:
+            self.conn.execute("DELETE FROM embeddings")
+            self.conn.commit()
+            self._bytes_used = 0
+
+    def stats(self) -> Dict[str, Any]:
+        entries = 0
+        if self.conn:
+            try:
+                with self._lock:
+                    entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            except Exception as e:
+                print(f"Embedding cache stats failed: {e}")
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'enabled': self.conn is not None,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes_used': self._bytes_used,
+            'max_bytes': self.max_bytes
+        }
+
+
+embedding_cache = EmbeddingCache(settings.EMBEDDING_CACHE_PATH, settings.EMBEDDING_CACHE_MAX_BYTES)
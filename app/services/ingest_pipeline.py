@@ -0,0 +1,328 @@
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from datetime import datetime
+import asyncio
+import time
+import uuid
+from app.core.config import settings
+from app.services.chroma_service import chroma_service
+from app.services.scraper_service import scraper_service
+
+# end-of-input marker; each worker of a stage consumes exactly one
+_DONE = object()
+
+
+class PipelineStage:
+    """A pool of workers draining one bounded input queue.
+
+    ``handler(batch, emit)`` receives up to ``batch_size`` items; when fewer
+    are queued the worker waits ``linger`` seconds once for more before
+    taking what is there. Handlers pass results on with ``emit``, which
+    blocks while the next stage's queue is full; that is how backpressure
+    reaches back to the fetchers. ``on_error(batch)`` is called with a
+    batch whose handler raised.
+    """
+
+    def __init__(self, name: str, handler: Callable[[List[Any], Callable[[Any], Awaitable[None]]], Awaitable[None]],
+                 workers: int = 1, queue_size: int = 64, batch_size: int = 1, linger: float = 0.0,
+                 on_error: Optional[Callable[[List[Any]], None]] = None):
+        self.name = name
+        self.handler = handler
+        self.on_error = on_error
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.linger = linger
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(queue_size, 2 * self.batch_size))
+        self.next: Optional["PipelineStage"] = None
+        self.received = self.emitted = self.errors = self.batches = 0
+        self.busy_s = 0.0
+
+    async def emit(self, item: Any):
+        self.emitted += 1
+        if self.next is not None:
+            await self.next.queue.put(item)
+
+    async def close_input(self):
+        for _ in range(self.workers):
+            await self.queue.put(_DONE)
+
+    async def _take(self) -> Tuple[List[Any], bool]:
+        """The next batch, and whether this worker's end marker came with it"""
+        item = await self.queue.get()
+        if item is _DONE:
+            return [], True
+        batch = [item]
+        if self.batch_size > 1 and self.linger > 0 and self.queue.qsize() < self.batch_size - 1:
+            await asyncio.sleep(self.linger)
+        while len(batch) < self.batch_size:
+            try:
+                item = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _work(self):
+        while True:
+            batch, done = await self._take()
+            if batch:
+                self.received += len(batch)
+                self.batches += 1
+                started = time.perf_counter()
+                try:
+                    await self.handler(batch, self.emit)
+                except Exception as e:
+                    self.errors += len(batch)
+                    print(f"[WARN] Pipeline stage {self.name} failed on {len(batch)} items: {e}")
+                    if self.on_error is not None:
+                        self.on_error(batch)
+                finally:
+                    self.busy_s += time.perf_counter() - started
+            if done:
+                return
+
+    async def run(self):
+        await asyncio.gather(*(self._work() for _ in range(self.workers)))
+        if self.next is not None:
+            await self.next.close_input()
+
+    def stats(self, elapsed: float) -> Dict[str, Any]:
+        return {
+            'stage': self.name,
+            'workers': self.workers,
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'received': self.received,
+            'emitted': self.emitted,
+            'errors': self.errors,
+            'avg_batch': round(self.received / self.batches, 2) if self.batches else 0.0,
+            'busy_s': round(self.busy_s, 3),
+            'items_per_sec': round(self.received / elapsed, 2) if elapsed > 0 else 0.0
+        }
+
+
+class IngestPipeline:
+    """fetch -> extract -> chunk -> embed -> store for one bulk scrape job.
+
+    The crawler's worker pool is the fetch stage; the other stages are
+    PipelineStages joined by bounded queues, so at most a few queues' worth
+    of pages, documents and chunks are in memory however large the crawl.
+    Embedding and storage work in batches (PIPELINE_EMBED_BATCH,
+    PIPELINE_STORE_BATCH). Chunks whose content is already stored are not
+    re-embedded, and chunks left over from a longer earlier version of a
+    page are removed, as in ChromaService.ingest_documents.
+
+    With ``store_documents`` the pipeline does not touch the vector store:
+    extracted documents go to it in batches of JOB_API_DOCUMENT_BATCH and it
+    returns the chunk counts; separate worker processes use this to have the
+    API process store their pages.
+
+    ``on_url_done(url, ok)`` is called once per fetched page when it has
+    gone all the way through (ok) or was dropped: no text, or a stage
+    failed on it. ``snapshot()`` reports per-stage throughput and queue
+    depths while the job runs.
+    """
+
+    def __init__(self, scrape_params: Dict[str, Any], document_fields: Dict[str, Any], store: bool = True,
+                 render_fallback: bool = False, label: str = "", job_id: Optional[str] = None,
+                 on_url_done: Optional[Callable[[str, bool], None]] = None,
+                 store_documents: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, int]]]] = None):
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.label = label
+        self.scrape_params = scrape_params
+        self.document_fields = document_fields
+        self.store = store
+        self.render_fallback = render_fallback
+        self.store_documents = store_documents
+        self.status = 'pending'
+        self.error: Optional[str] = None
+        self.created_at = datetime.now().isoformat()
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self.counts = {
+            'pages_scraped': 0,
+            'pages_failed': 0,
+            'chunks': 0,
+            'chunks_unchanged': 0,
+            'chunks_stored': 0,
+            'stale_removed': 0
+        }
+        self.fetch_stats: Dict[str, Any] = {'pages': 0, 'bytes': 0, 'errors': 0}
+        self.on_url_done = on_url_done
+        # url -> records still in flight, plus one while the page is being chunked
+        self._outstanding: Dict[str, int] = {}
+
+        linger = settings.PIPELINE_BATCH_LINGER_MS / 1000.0
+        queue_size = settings.PIPELINE_QUEUE_SIZE
+        self.stages = [PipelineStage('extract', self._extract, settings.PIPELINE_EXTRACT_WORKERS, queue_size,
+                                     on_error=self._dropped(lambda page: page[0], tracked=False))]
+        if store and store_documents is not None:
+            self.stages.append(PipelineStage('store', self._store_documents, settings.PIPELINE_STORE_WORKERS,
+                                             queue_size, settings.JOB_API_DOCUMENT_BATCH, linger,
+                                             self._dropped(lambda document: document['url'], tracked=False)))
+        elif store:
+            self.stages += [
+                PipelineStage('chunk', self._chunk, settings.PIPELINE_CHUNK_WORKERS, queue_size,
+                              on_error=self._dropped(lambda document: document['url'])),
+                PipelineStage('embed', self._embed, settings.PIPELINE_EMBED_WORKERS, queue_size,
+                              settings.PIPELINE_EMBED_BATCH, linger, self._dropped(lambda record: record[2]['url'])),
+                PipelineStage('store', self._store, settings.PIPELINE_STORE_WORKERS, queue_size,
+                              settings.PIPELINE_STORE_BATCH, linger, self._dropped(lambda row: row[4]['url']))
+            ]
+        for stage, following in zip(self.stages, self.stages[1:]):
+            stage.next = following
+
+    async def run_crawl(self, base_url: str, max_depth: int, max_urls: int):
+        """Crawl from ``base_url`` and ingest every page on the way (single pass)"""
+        crawler = scraper_service.crawler()
+        await self.run(lambda on_page: crawler.crawl(base_url, max_depth, max_urls, on_page=on_page, fetch_all=True))
+
+    async def run_urls(self, urls: List[str]):
+        """Fetch and ingest a list of already discovered URLs"""
+        crawler = scraper_service.crawler()
+        await self.run(lambda on_page: crawler.fetch_urls(urls, on_page))
+
+    async def run(self, fetch: Callable[[Callable], Awaitable[Dict[str, Any]]]):
+        """Run the stages while ``fetch(on_page)`` feeds them pages; it returns the fetch statistics"""
+        self.status = 'running'
+        self._started = time.perf_counter()
+        self.fetch_stats['workers'] = scraper_service.max_concurrent_requests
+        workers = [asyncio.create_task(stage.run()) for stage in self.stages]
+        try:
+            local_store = self.store and self.store_documents is None
+            if local_store and not chroma_service.store:
+                await chroma_service.initialize()
+            if local_store and not chroma_service.store:
+                raise ValueError("Vector store is not available")
+            result = await fetch(self._on_page)
+            self.fetch_stats.update(result.get('stats', result))
+            await self.stages[0].close_input()
+            await asyncio.gather(*workers)
+            self.status = 'completed'
+            print(f"Ingest job {self.job_id} completed: {self.counts}")
+        except asyncio.CancelledError:
+            self.status = 'cancelled'
+            raise
+        except Exception as e:
+            self.status = 'failed'
+            self.error = str(e)
+            print(f"Ingest job {self.job_id} failed: {e}")
+        finally:
+            for task in workers:
+                task.cancel()
+            self._finished = time.perf_counter()
+
+    async def _on_page(self, url: str, depth: int, content_type: str, body: bytes):
+        self.fetch_stats['pages'] += 1
+        self.fetch_stats['bytes'] += len(body)
+        await self.stages[0].queue.put((url, content_type, body))
+
+    async def _extract(self, pages: List[Tuple[str, str, bytes]], emit):
+        for url, content_type, body in pages:
+            result = await scraper_service.extract_fetched(url, content_type, body, self.scrape_params,
+                                                           self.render_fallback)
+            if result['status'] != 'success':
+                self.counts['pages_failed'] += 1
+                self._url_done(url, False)
+                continue
+            self.counts['pages_scraped'] += 1
+            await emit({
+                'content': result['content'].get('text', ''),
+                'url': url,
+                'title': result['content'].get('title', ''),
+                'timestamp': result['timestamp'],
+                **self.document_fields
+            })
+            if not self.store:
+                self._url_done(url, True)
+
+    async def _chunk(self, documents: List[Dict[str, Any]], emit):
+        for document in documents:
+            chunk_count = 0
+            self._outstanding[document['url']] = 1
+            for record in chroma_service.chunk_records(document):
+                self._outstanding[document['url']] += 1
+                await emit(record)
+                chunk_count += 1
+            self.counts['chunks'] += chunk_count
+            if document['url']:
+                self.counts['stale_removed'] += await asyncio.to_thread(
+                    chroma_service.delete_stale_chunks, document['url'], chunk_count
+                )
+            self._release(document['url'])
+
+    async def _embed(self, records: List[Tuple[str, str, Dict[str, Any]]], emit):
+        pending = {doc_id: (chunk, metadata) for doc_id, chunk, metadata in records}
+        provider, model, changed, embeddings = await chroma_service.embed_changed(pending)
+        self.counts['chunks_unchanged'] += len(pending) - len(changed)
+        for doc_id, (_, metadata) in pending.items():
+            if doc_id not in changed:
+                self._release(metadata['url'])
+        for doc_id, embedding in zip(changed, embeddings):
+            await emit((provider, model, doc_id, changed[doc_id][0], changed[doc_id][1], embedding))
+
+    async def _store(self, embedded: List[Tuple[str, str, str, str, Dict[str, Any], List[float]]], emit):
+        groups: Dict[Tuple[str, str], List[Tuple]] = {}
+        for row in embedded:
+            groups.setdefault((row[0], row[1]), []).append(row)
+        for (provider, model), rows in groups.items():
+            self.counts['chunks_stored'] += await asyncio.to_thread(
+                chroma_service.store_embedded, provider, model,
+                [row[2] for row in rows], [row[3] for row in rows], [row[4] for row in rows], [row[5] for row in rows]
+            )
+        for row in embedded:
+            self._release(row[4]['url'])
+
+    async def _store_documents(self, documents: List[Dict[str, Any]], emit):
+        result = await self.store_documents(documents)
+        for key in ('chunks', 'chunks_unchanged', 'chunks_stored', 'stale_removed'):
+            self.counts[key] += result[key]
+        for document in documents:
+            self._url_done(document['url'], True)
+
+    def _url_done(self, url: str, ok: bool):
+        if self.on_url_done is not None:
+            self.on_url_done(url, ok)
+
+    def _release(self, url: str):
+        """One record of ``url`` is finished; the page is done when none are left"""
+        if url not in self._outstanding:
+            return
+        self._outstanding[url] -= 1
+        if self._outstanding[url] == 0:
+            del self._outstanding[url]
+            self._url_done(url, True)
+
+    def _dropped(self, url_of: Callable[[Any], str], tracked: bool = True) -> Callable[[List[Any]], None]:
+        """on_error hook for a stage: the pages behind a failed batch are not done.
+
+        Past extraction a page counts as failed once, by its first failed record.
+        """
+        def drop(batch: List[Any]):
+            for url in dict.fromkeys(url_of(item) for item in batch):
+                if self._outstanding.pop(url, None) is not None or not tracked:
+                    self._url_done(url, False)
+        return drop
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = 0.0
+        if self._started is not None:
+            elapsed = (self._finished or time.perf_counter()) - self._started
+        fetch = dict(self.fetch_stats)
+        fetch.update({
+            'stage': 'fetch',
+            'queue_depth': None,
+            'items_per_sec': round(fetch['pages'] / elapsed, 2) if elapsed > 0 else 0.0
+        })
+        return {
+            'job_id': self.job_id,
+            'label': self.label,
+            'status': self.status,
+            'error': self.error,
+            'created_at': self.created_at,
+            'elapsed_s': round(elapsed, 3),
+            'counts': dict(self.counts),
+            'stages': [fetch] + [stage.stats(elapsed) for stage in self.stages]
+        }
+
@@ -0,0 +1,587 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from datetime import datetime
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from app.core.config import settings
+
+JOB_QUEUE_BACKENDS = ("sqlite", "redis")
+ACTIVE_JOB_STATUSES = ("queued", "running")
+URL_STATUSES = ("pending", "fetching", "done", "failed")
+
+# Jobs are dictionaries with: job_id, kind ('crawl' follows links from its
+# seed URLs, 'urls' fetches a fixed list), label, status (queued, running,
+# completed, failed, cancelled), params, counts, stages, error, worker,
+# lease_until (epoch seconds), runs, created_at, started_at, updated_at,
+# finished_at, run_started (epoch), run_finished_urls and url_counts
+# ({status: count} over the job's URL frontier). The job claim_job returns
+# also carries lease_token, the secret of that run, which no other call exposes.
+
+
+class JobQueue(ABC):
+    """Durable bulk-scrape jobs and their URL frontiers.
+
+    A worker leases a job with ``claim_job`` and keeps the lease with
+    ``heartbeat``; a job whose lease runs out (its worker died) can be
+    claimed again and carries on from its frontier. Each URL is pending,
+    fetching (claimed by the running worker) or finished as done/failed.
+    Only the worker holding a job's lease changes its URLs.
+    """
+
+    @abstractmethod
+    def enqueue(self, kind: str, label: str, params: Dict[str, Any], urls: Sequence[Tuple[str, int]]) -> Dict[str, Any]:
+        """Queue a new job whose frontier starts with (url, depth) pairs"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+
+    @abstractmethod
+    def running_jobs(self) -> List[str]:
+        """Ids of running jobs whose lease has not run out"""
+
+    @abstractmethod
+    def claim_job(self, worker: str, lease_s: float) -> Optional[Dict[str, Any]]:
+        """Lease the oldest queued job, or a running job whose lease has expired"""
+
+    @abstractmethod
+    def holds_lease(self, job_id: str, lease_token: str) -> bool:
+        """Whether ``lease_token`` is the token of the job's current, unexpired run"""
+
+    @abstractmethod
+    def heartbeat(self, job_id: str, worker: str, lease_s: float, counts: Dict[str, Any],
+                  stages: List[Dict[str, Any]]) -> Optional[str]:
+        """Extend the lease and save progress; the job's status, or None once ``worker`` no longer holds it"""
+
+    @abstractmethod
+    def requeue(self, job_id: str, worker: str, counts: Dict[str, Any]) -> None:
+        """Give a running job back to the queue, e.g. when its worker shuts down"""
+
+    @abstractmethod
+    def finish_job(self, job_id: str, worker: str, status: str, counts: Dict[str, Any],
+                   stages: List[Dict[str, Any]], error: Optional[str] = None) -> None:
+        """Record the outcome of a run; a job cancelled meanwhile stays cancelled"""
+
+    @abstractmethod
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Mark a queued or running job cancelled; its worker stops at the next heartbeat"""
+
+    @abstractmethod
+    def claim_urls(self, job_id: str, limit: int) -> List[Tuple[str, int]]:
+        """Up to ``limit`` pending (url, depth) pairs in discovery order, now marked fetching"""
+
+    @abstractmethod
+    def add_urls(self, job_id: str, urls: Sequence[str], depth: int, max_urls: int) -> int:
+        """Append unseen URLs as pending while the frontier holds fewer than ``max_urls``; returns how many"""
+
+    @abstractmethod
+    def finish_urls(self, job_id: str, results: Sequence[Tuple[str, str, Optional[str]]]) -> None:
+        """Record (url, 'done' or 'failed', error) for fetching URLs"""
+
+    @abstractmethod
+    def release_urls(self, job_id: str, worker: str, max_attempts: int) -> int:
+        """Put the fetching URLs of an interrupted run back to pending; those already tried
+        ``max_attempts`` times fail instead. Returns how many were put back, and does
+        nothing unless ``worker`` holds the job."""
+
+    @abstractmethod
+    def fail_fetching(self, job_id: str, worker: str, error: str) -> int:
+        """Fail the URLs still marked fetching when a run ends; returns how many.
+        Does nothing unless ``worker`` holds the job."""
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+def _url_counts(counts: Dict[str, int]) -> Dict[str, int]:
+    counts = {status: int(counts.get(status, 0)) for status in URL_STATUSES}
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+class SqliteJobQueue(JobQueue):
+    """Jobs in a local SQLite file, shared by every process on the host.
+
+    Leases and frontier claims run inside ``BEGIN IMMEDIATE`` transactions,
+    so API and worker processes can use the same file safely.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                label TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                counts TEXT NOT NULL DEFAULT '{}',
+                stages TEXT NOT NULL DEFAULT '[]',
+                error TEXT,
+                worker TEXT,
+                lease_until REAL,
+                runs INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL,
+                started_at TEXT,
+                updated_at TEXT,
+                finished_at TEXT,
+                run_started REAL,
+                run_finished_urls INTEGER NOT NULL DEFAULT 0,
+                lease_token TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+            CREATE TABLE IF NOT EXISTS job_urls (
+                job_id TEXT NOT NULL,
+                url TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                PRIMARY KEY (job_id, url)
+            );
+            CREATE INDEX IF NOT EXISTS idx_job_urls_status ON job_urls(job_id, status);"""
+        )
+        columns = {row['name'] for row in self.conn.execute("PRAGMA table_info(jobs)")}
+        if 'lease_token' not in columns:
+            self.conn.execute("ALTER TABLE jobs ADD COLUMN lease_token TEXT")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _job(self, conn, job_id: str) -> Optional[Dict[str, Any]]:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop('lease_token', None)
+        for key in ('params', 'counts', 'stages'):
+            job[key] = json.loads(job[key])
+        rows = conn.execute("SELECT status, COUNT(*) FROM job_urls WHERE job_id = ? GROUP BY status", (job_id,))
+        job['url_counts'] = _url_counts(dict(rows.fetchall()))
+        return job
+
+    def enqueue(self, kind, label, params, urls):
+        job_id = uuid.uuid4().hex[:12]
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, kind, label, status, params, created_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, label, json.dumps(params), _now())
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO job_urls (job_id, url, depth) VALUES (?, ?, ?)",
+                [(job_id, url, depth) for url, depth in urls]
+            )
+            return self._job(conn, job_id)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._job(self.conn, job_id)
+
+    def list(self, limit=50):
+        with self._lock:
+            rows = self.conn.execute("SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+            return [self._job(self.conn, row[0]) for row in rows]
+
+    def running_jobs(self):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT job_id FROM jobs WHERE status = 'running' AND lease_until >= ?", (time.time(),)
+            ).fetchall()
+            return [row[0] for row in rows]
+
+    def claim_job(self, worker, lease_s):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                """SELECT job_id FROM jobs
+                   WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                   ORDER BY created_at LIMIT 1""",
+                (now,)
+            ).fetchone()
+            if row is None:
+                return None
+            finished = conn.execute(
+                "SELECT COUNT(*) FROM job_urls WHERE job_id = ? AND status IN ('done', 'failed')", (row[0],)
+            ).fetchone()[0]
+            token = secrets.token_urlsafe(24)
+            conn.execute(
+                """UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, runs = runs + 1,
+                   started_at = COALESCE(started_at, ?), updated_at = ?, run_started = ?, run_finished_urls = ?,
+                   lease_token = ?
+                   WHERE job_id = ?""",
+                (worker, now + lease_s, _now(), _now(), now, finished, token, row[0])
+            )
+            return dict(self._job(conn, row[0]), lease_token=token)
+
+    def holds_lease(self, job_id, lease_token):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT 1 FROM jobs WHERE job_id = ? AND status = 'running' AND lease_token = ? AND lease_until >= ?",
+                (job_id, lease_token, time.time())
+            ).fetchone()
+        return row is not None
+
+    def heartbeat(self, job_id, worker, lease_s, counts, stages):
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET lease_until = ?, counts = ?, stages = ?, updated_at = ?
+                   WHERE job_id = ? AND worker = ?""",
+                (time.time() + lease_s, json.dumps(counts), json.dumps(stages), _now(), job_id, worker)
+            )
+            row = conn.execute("SELECT status, worker FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None or row['worker'] != worker:
+            return None
+        return row['status']
+
+    def requeue(self, job_id, worker, counts):
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, lease_token = NULL,
+                   counts = ?, updated_at = ?
+                   WHERE job_id = ? AND worker = ? AND status = 'running'""",
+                (json.dumps(counts), _now(), job_id, worker)
+            )
+
+    def finish_job(self, job_id, worker, status, counts, stages, error=None):
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET status = CASE WHEN status = 'cancelled' THEN status ELSE ? END,
+                   worker = NULL, lease_until = NULL, lease_token = NULL, counts = ?, stages = ?, error = ?,
+                   updated_at = ?, finished_at = COALESCE(finished_at, ?)
+                   WHERE job_id = ? AND worker = ?""",
+                (status, json.dumps(counts), json.dumps(stages), error, _now(), _now(), job_id, worker)
+            )
+
+    def cancel(self, job_id):
+        with self._transaction() as conn:
+            conn.execute(
+                """UPDATE jobs SET status = 'cancelled', finished_at = ?, updated_at = ?
+                   WHERE job_id = ? AND status IN ('queued', 'running')""",
+                (_now(), _now(), job_id)
+            )
+            return self._job(conn, job_id)
+
+    def claim_urls(self, job_id, limit):
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT url, depth FROM job_urls WHERE job_id = ? AND status = 'pending' ORDER BY rowid LIMIT ?",
+                (job_id, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE job_urls SET status = 'fetching', attempts = attempts + 1 WHERE job_id = ? AND url = ?",
+                [(job_id, row['url']) for row in rows]
+            )
+        return [(row['url'], row['depth']) for row in rows]
+
+    def add_urls(self, job_id, urls, depth, max_urls):
+        added = 0
+        with self._transaction() as conn:
+            room = max_urls - conn.execute("SELECT COUNT(*) FROM job_urls WHERE job_id = ?", (job_id,)).fetchone()[0]
+            for url in urls:
+                if added >= room:
+                    break
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO job_urls (job_id, url, depth) VALUES (?, ?, ?)", (job_id, url, depth)
+                )
+                added += cursor.rowcount
+        return added
+
+    def finish_urls(self, job_id, results):
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE job_urls SET status = ?, error = ? WHERE job_id = ? AND url = ? AND status = 'fetching'",
+                [(status, error, job_id, url) for url, status, error in results]
+            )
+
+    @staticmethod
+    def _holds(conn, job_id: str, worker: str) -> bool:
+        return conn.execute("SELECT 1 FROM jobs WHERE job_id = ? AND worker = ?", (job_id, worker)).fetchone() is not None
+
+    def release_urls(self, job_id, worker, max_attempts):
+        with self._transaction() as conn:
+            if not self._holds(conn, job_id, worker):
+                return 0
+            conn.execute(
+                """UPDATE job_urls SET status = 'failed', error = 'interrupted too often'
+                   WHERE job_id = ? AND status = 'fetching' AND attempts >= ?""",
+                (job_id, max_attempts)
+            )
+            return conn.execute(
+                "UPDATE job_urls SET status = 'pending' WHERE job_id = ? AND status = 'fetching'", (job_id,)
+            ).rowcount
+
+    def fail_fetching(self, job_id, worker, error):
+        with self._transaction() as conn:
+            if not self._holds(conn, job_id, worker):
+                return 0
+            return conn.execute(
+                "UPDATE job_urls SET status = 'failed', error = ? WHERE job_id = ? AND status = 'fetching'",
+                (error, job_id)
+            ).rowcount
+
+
+class RedisJobQueue(JobQueue):
+    """Jobs in Redis, for workers spread over several hosts.
+
+    Per job: a hash of fields, a hash of URL entries, a list of pending URLs
+    in discovery order, a set of fetching URLs and a hash of counts per URL
+    status. Job leases are taken with WATCH/MULTI.
+    """
+
+    def __init__(self, url: str, prefix: str):
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._watch_error = redis.WatchError
+
+    def _key(self, job_id: str, part: str = "") -> str:
+        return f"{self.prefix}:job:{job_id}{':' + part if part else ''}"
+
+    def _decode(self, job_id: str, fields: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        if not fields:
+            return None
+        job = {'job_id': job_id, **{key: json.loads(value) for key, value in fields.items()}}
+        job.pop('lease_token', None)
+        job['url_counts'] = _url_counts(self.redis.hgetall(self._key(job_id, 'url_counts')))
+        return job
+
+    def _write(self, target, job_id: str, **fields):
+        target.hset(self._key(job_id), mapping={key: json.dumps(value) for key, value in fields.items()})
+
+    def _set_url_status(self, pipe, job_id: str, url: str, entry: Dict[str, Any], status: str):
+        pipe.hincrby(self._key(job_id, 'url_counts'), entry['status'], -1)
+        pipe.hincrby(self._key(job_id, 'url_counts'), status, 1)
+        entry['status'] = status
+        pipe.hset(self._key(job_id, 'urls'), url, json.dumps(entry))
+
+    def _url_entries(self, job_id: str, urls: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        if not urls:
+            return {}
+        values = self.redis.hmget(self._key(job_id, 'urls'), list(urls))
+        return {url: json.loads(value) for url, value in zip(urls, values) if value}
+
+    def enqueue(self, kind, label, params, urls):
+        job_id = uuid.uuid4().hex[:12]
+        pipe = self.redis.pipeline()
+        self._write(pipe, job_id, kind=kind, label=label, status='queued', params=params, counts={}, stages=[],
+                    error=None, worker=None, lease_until=None, runs=0, created_at=_now(), started_at=None,
+                    updated_at=None, finished_at=None, run_started=None, run_finished_urls=0)
+        seeds = list(dict.fromkeys(url for url, _ in urls))
+        depths = dict(urls)
+        for url in seeds:
+            pipe.hset(self._key(job_id, 'urls'), url, json.dumps({'depth': depths[url], 'status': 'pending',
+                                                                  'attempts': 0, 'error': None}))
+        if seeds:
+            pipe.rpush(self._key(job_id, 'pending'), *seeds)
+            pipe.hincrby(self._key(job_id, 'url_counts'), 'pending', len(seeds))
+        pipe.zadd(f"{self.prefix}:jobs", {job_id: time.time()})
+        pipe.execute()
+        return self.get(job_id)
+
+    def get(self, job_id):
+        return self._decode(job_id, self.redis.hgetall(self._key(job_id)))
+
+    def list(self, limit=50):
+        job_ids = self.redis.zrevrange(f"{self.prefix}:jobs", 0, limit - 1)
+        return [job for job in (self.get(job_id) for job_id in job_ids) if job]
+
+    def running_jobs(self):
+        now = time.time()
+        running = []
+        for job_id in self.redis.zrange(f"{self.prefix}:jobs", 0, -1):
+            status, lease_until = self.redis.hmget(self._key(job_id), ['status', 'lease_until'])
+            if json.loads(status or 'null') == 'running' and (json.loads(lease_until or 'null') or 0) >= now:
+                running.append(job_id)
+        return running
+
+    def claim_job(self, worker, lease_s):
+        now = time.time()
+        for job_id in self.redis.zrange(f"{self.prefix}:jobs", 0, -1):
+            with self.redis.pipeline() as pipe:
+                try:
+                    pipe.watch(self._key(job_id))
+                    status = json.loads(pipe.hget(self._key(job_id), 'status') or 'null')
+                    lease_until = json.loads(pipe.hget(self._key(job_id), 'lease_until') or 'null')
+                    if status != 'queued' and not (status == 'running' and (lease_until or 0) < now):
+                        continue
+                    counts = pipe.hgetall(self._key(job_id, 'url_counts'))
+                    runs = json.loads(pipe.hget(self._key(job_id), 'runs') or '0')
+                    started_at = json.loads(pipe.hget(self._key(job_id), 'started_at') or 'null')
+                    token = secrets.token_urlsafe(24)
+                    pipe.multi()
+                    self._write(pipe, job_id, status='running', worker=worker, lease_until=now + lease_s,
+                                runs=runs + 1, started_at=started_at or _now(), updated_at=_now(), run_started=now,
+                                run_finished_urls=int(counts.get('done', 0)) + int(counts.get('failed', 0)),
+                                lease_token=token)
+                    pipe.execute()
+                except self._watch_error:
+                    continue
+            return dict(self.get(job_id), lease_token=token)
+        return None
+
+    def holds_lease(self, job_id, lease_token):
+        status, lease_until, token = (
+            json.loads(value or 'null')
+            for value in self.redis.hmget(self._key(job_id), ['status', 'lease_until', 'lease_token'])
+        )
+        return status == 'running' and (lease_until or 0) >= time.time() and token == lease_token
+
+    def _update_if_owner(self, job_id: str, worker: str, allowed: Sequence[str], **fields) -> bool:
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(self._key(job_id))
+                if json.loads(pipe.hget(self._key(job_id), 'worker') or 'null') != worker:
+                    return False
+                status = json.loads(pipe.hget(self._key(job_id), 'status') or 'null')
+                if status not in allowed:
+                    fields.pop('status', None)
+                pipe.multi()
+                self._write(pipe, job_id, **fields)
+                pipe.execute()
+                return True
+            except self._watch_error:
+                return False
+
+    def heartbeat(self, job_id, worker, lease_s, counts, stages):
+        if not self._update_if_owner(job_id, worker, (), lease_until=time.time() + lease_s, counts=counts,
+                                     stages=stages, updated_at=_now()):
+            return None
+        return json.loads(self.redis.hget(self._key(job_id), 'status') or 'null')
+
+    def requeue(self, job_id, worker, counts):
+        self._update_if_owner(job_id, worker, ('running',), status='queued', worker=None, lease_until=None,
+                              lease_token=None, counts=counts, updated_at=_now())
+
+    def finish_job(self, job_id, worker, status, counts, stages, error=None):
+        finished_at = json.loads(self.redis.hget(self._key(job_id), 'finished_at') or 'null')
+        self._update_if_owner(job_id, worker, ('running',), status=status, worker=None, lease_until=None,
+                              lease_token=None, counts=counts, stages=stages, error=error, updated_at=_now(),
+                              finished_at=finished_at or _now())
+
+    def cancel(self, job_id):
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(self._key(job_id))
+                status = json.loads(pipe.hget(self._key(job_id), 'status') or 'null')
+                if status in ACTIVE_JOB_STATUSES:
+                    pipe.multi()
+                    self._write(pipe, job_id, status='cancelled', finished_at=_now(), updated_at=_now())
+                    pipe.execute()
+            except self._watch_error:
+                pass
+        return self.get(job_id)
+
+    def claim_urls(self, job_id, limit):
+        # LRANGE+LTRIM in one MULTI rather than LPOP with a count, which needs Redis 6.2
+        pipe = self.redis.pipeline()
+        pipe.lrange(self._key(job_id, 'pending'), 0, limit - 1)
+        pipe.ltrim(self._key(job_id, 'pending'), limit, -1)
+        urls, _ = pipe.execute()
+        entries = self._url_entries(job_id, urls)
+        pipe = self.redis.pipeline()
+        for url, entry in entries.items():
+            entry['attempts'] += 1
+            self._set_url_status(pipe, job_id, url, entry, 'fetching')
+            pipe.sadd(self._key(job_id, 'fetching'), url)
+        pipe.execute()
+        return [(url, entries[url]['depth']) for url in urls if url in entries]
+
+    def add_urls(self, job_id, urls, depth, max_urls):
+        room = max_urls - self.redis.hlen(self._key(job_id, 'urls'))
+        added = []
+        for url in dict.fromkeys(urls):
+            if len(added) >= room:
+                break
+            entry = {'depth': depth, 'status': 'pending', 'attempts': 0, 'error': None}
+            if self.redis.hsetnx(self._key(job_id, 'urls'), url, json.dumps(entry)):
+                added.append(url)
+        if added:
+            pipe = self.redis.pipeline()
+            pipe.rpush(self._key(job_id, 'pending'), *added)
+            pipe.hincrby(self._key(job_id, 'url_counts'), 'pending', len(added))
+            pipe.execute()
+        return len(added)
+
+    def finish_urls(self, job_id, results):
+        entries = self._url_entries(job_id, [url for url, _, _ in results])
+        pipe = self.redis.pipeline()
+        for url, status, error in results:
+            entry = entries.get(url)
+            if entry is None or entry['status'] != 'fetching':
+                continue
+            entry['error'] = error
+            self._set_url_status(pipe, job_id, url, entry, status)
+            pipe.srem(self._key(job_id, 'fetching'), url)
+        pipe.execute()
+
+    def _settle_fetching(self, job_id: str, worker: str, error: str, max_attempts: Optional[int]) -> Tuple[int, int]:
+        """Fail the fetching URLs of a job ``worker`` holds, or with ``max_attempts`` put those
+        tried fewer times back to pending; returns (put back, failed)"""
+        with self.redis.pipeline() as pipe:
+            try:
+                pipe.watch(self._key(job_id), self._key(job_id, 'fetching'))
+                if json.loads(pipe.hget(self._key(job_id), 'worker') or 'null') != worker:
+                    return 0, 0
+                urls = sorted(pipe.smembers(self._key(job_id, 'fetching')))
+                values = pipe.hmget(self._key(job_id, 'urls'), urls) if urls else []
+                entries = {url: json.loads(value) for url, value in zip(urls, values) if value}
+                retry = [url for url, entry in entries.items()
+                         if max_attempts is not None and entry['attempts'] < max_attempts]
+                pipe.multi()
+                for url, entry in entries.items():
+                    if url not in retry:
+                        entry['error'] = error
+                    self._set_url_status(pipe, job_id, url, entry, 'pending' if url in retry else 'failed')
+                    pipe.srem(self._key(job_id, 'fetching'), url)
+                if retry:
+                    pipe.lpush(self._key(job_id, 'pending'), *reversed(retry))
+                pipe.execute()
+            except self._watch_error:
+                return 0, 0
+        return len(retry), len(entries) - len(retry)
+
+    def release_urls(self, job_id, worker, max_attempts):
+        return self._settle_fetching(job_id, worker, 'interrupted too often', max_attempts)[0]
+
+    def fail_fetching(self, job_id, worker, error):
+        return self._settle_fetching(job_id, worker, error, None)[1]
+
+
+def create_job_queue(backend: Optional[str] = None) -> JobQueue:
+    """The job queue selected by JOB_QUEUE_BACKEND"""
+    backend = backend or settings.JOB_QUEUE_BACKEND
+    if backend == "sqlite":
+        return SqliteJobQueue(settings.JOB_QUEUE_PATH)
+    if backend == "redis":
+        if not settings.REDIS_URL:
+            raise ValueError("JOB_QUEUE_BACKEND=redis needs REDIS_URL")
+        return RedisJobQueue(settings.REDIS_URL, settings.JOB_QUEUE_REDIS_PREFIX)
+    raise ValueError(f"Unknown job queue backend: {backend}")
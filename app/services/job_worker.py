@@ -0,0 +1,268 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import aiohttp
+import asyncio
+import functools
+import os
+import socket
+import time
+import uuid
+from app.core.config import settings
+from app.services.crawler import AsyncCrawler, HTML_CONTENT_TYPES
+from app.services.ingest_pipeline import IngestPipeline
+from app.services.job_queue import JobQueue, create_job_queue
+from app.services.scraper_service import scraper_service
+
+class JobWorker:
+    """Runs bulk-scrape jobs from the durable job queue.
+
+    Each slot leases one job at a time and feeds an IngestPipeline from the
+    job's stored URL frontier: pending URLs are claimed in batches of
+    JOB_URL_BATCH, links found on crawl pages (down to max_depth, as in
+    AsyncCrawler.crawl's fetch_all mode) are appended to the frontier
+    before the page enters the pipeline, and a URL is recorded done or
+    failed once the pipeline has finished with it. A heartbeat every third
+    of JOB_LEASE_SECONDS keeps the lease, saves counts and stage statistics
+    and notices cancellation. When a worker dies its lease runs out and
+    another worker carries on from the frontier; URLs that were in flight
+    are fetched again, and their unchanged chunks are skipped at embedding.
+
+    The API process runs JOB_API_WORKER_SLOTS slots itself; more workers
+    can run separately with ``python -m app.worker``. The vector store is
+    only safe to use from one process, so a separate worker (``api_url``
+    set) only fetches and extracts, and posts the documents to the API
+    process, which stores them and keeps its answer cache and search
+    indexes current.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._queue: Optional[JobQueue] = None
+        self.pipelines: Dict[str, IngestPipeline] = {}
+        self._slots: List[asyncio.Task] = []
+        self._jobs: Dict[str, asyncio.Task] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.api_url: Optional[str] = None
+
+    @property
+    def queue(self) -> JobQueue:
+        if self._queue is None:
+            self._queue = create_job_queue()
+        return self._queue
+
+    async def submit(self, kind: str, label: str, urls: Sequence[Tuple[str, int]], scrape_params: Dict[str, Any],
+                     document_fields: Dict[str, Any], store: bool = True, render_fallback: bool = False,
+                     max_depth: int = 0, max_urls: int = 0) -> Dict[str, Any]:
+        """Queue a job; 'crawl' jobs follow links up to ``max_depth`` until ``max_urls`` are known"""
+        params = {
+            'scrape_params': scrape_params,
+            'document_fields': document_fields,
+            'store': store,
+            'render_fallback': render_fallback,
+            'max_depth': max_depth,
+            'max_urls': max_urls
+        }
+        job = await asyncio.to_thread(self.queue.enqueue, kind, label, params, list(urls))
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(self.queue.get, job_id)
+        return self._describe(job) if job else None
+
+    async def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return [self._describe(job) for job in await asyncio.to_thread(self.queue.list, limit)]
+
+    async def holds_lease(self, job_id: str, lease_token: str) -> bool:
+        return await asyncio.to_thread(self.queue.holds_lease, job_id, lease_token)
+
+    async def running_jobs(self) -> List[str]:
+        """Jobs being run right now by this or any other worker process"""
+        return await asyncio.to_thread(self.queue.running_jobs)
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(self.queue.cancel, job_id)
+        if job and job_id in self._jobs:
+            self._jobs[job_id].cancel()
+        return self._describe(job) if job else None
+
+    def _describe(self, job: Dict[str, Any]) -> Dict[str, Any]:
+        """A job with progress, and the rate and ETA of its current run"""
+        job = dict(job)
+        urls = job['url_counts']
+        finished = urls['done'] + urls['failed']
+        job['progress'] = round(finished / urls['total'], 4) if urls['total'] else 0.0
+        job['urls_per_sec'], job['eta_seconds'] = 0.0, None
+        if job['status'] == 'running' and job.get('run_started'):
+            elapsed = time.time() - job['run_started']
+            rate = (finished - job['run_finished_urls']) / elapsed if elapsed > 0 else 0.0
+            job['urls_per_sec'] = round(rate, 2)
+            # crawl jobs keep finding URLs, so this covers the frontier known so far
+            if rate > 0:
+                job['eta_seconds'] = round((urls['pending'] + urls['fetching']) / rate, 1)
+        if job['job_id'] in self.pipelines:
+            job['stages'] = self.pipelines[job['job_id']].snapshot()['stages']
+        return job
+
+    def start(self, slots: int):
+        """Start ``slots`` job loops on the running event loop"""
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._slots = [asyncio.create_task(self._loop()) for _ in range(max(0, slots))]
+        if self._slots:
+            print(f"Job worker {self.worker_id} running {len(self._slots)} slots ({settings.JOB_QUEUE_BACKEND} queue)")
+
+    async def stop(self):
+        """Stop the job loops; jobs in progress go back to the queue and resume elsewhere"""
+        self._stopping = True
+        for task in self._jobs.values():
+            task.cancel()
+        await asyncio.gather(*self._slots, return_exceptions=True)
+        self._slots = []
+
+    async def _loop(self):
+        while not self._stopping:
+            try:
+                job = await asyncio.to_thread(self.queue.claim_job, self.worker_id, settings.JOB_LEASE_SECONDS)
+            except Exception as e:
+                print(f"[WARN] Job queue unavailable: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), settings.JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run_job(job)
+            except Exception as e:
+                print(f"[WARN] Job {job['job_id']} could not be run: {e}")
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id, params = job['job_id'], job['params']
+        released = await asyncio.to_thread(self.queue.release_urls, job_id, self.worker_id,
+                                          settings.JOB_URL_MAX_ATTEMPTS)
+        print(f"Job {job_id} started (run {job['runs']}, {job['url_counts']['done']} URLs done, "
+              f"{released} resumed in flight)")
+
+        finished: List[Tuple[str, str, Optional[str]]] = []
+        session, store_documents = None, None
+        if self.api_url and params['store']:
+            session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=settings.JOB_API_TIMEOUT))
+            store_documents = functools.partial(self._post_documents, session, job_id, job['lease_token'])
+        pipeline = IngestPipeline(
+            params['scrape_params'], params['document_fields'], store=params['store'],
+            render_fallback=params['render_fallback'], label=job['label'], job_id=job_id,
+            on_url_done=lambda url, ok: finished.append((url, 'done', None) if ok else (url, 'failed', 'not ingested')),
+            store_documents=store_documents
+        )
+        pipeline.counts.update(job['counts'])
+        crawler = scraper_service.crawler()
+
+        async def fetch(on_page):
+            stats = {'pages': 0, 'bytes': 0, 'errors': 0}
+            while True:
+                batch = await asyncio.to_thread(self.queue.claim_urls, job_id, settings.JOB_URL_BATCH)
+                if not batch:
+                    return stats
+                depths = dict(batch)
+                fetched = set()
+
+                async def on_fetched(url, _, content_type, body):
+                    fetched.add(url)
+                    depth = depths[url]
+                    if (job['kind'] == 'crawl' and depth <= params['max_depth']
+                            and content_type.lower().startswith(HTML_CONTENT_TYPES)):
+                        links = await asyncio.to_thread(AsyncCrawler.extract_links, url, body)
+                        if links:
+                            # the start page is not counted against max_urls, as in AsyncCrawler.crawl
+                            await asyncio.to_thread(self.queue.add_urls, job_id, links, depth + 1,
+                                                    params['max_urls'] + 1)
+                    await on_page(url, depth, content_type, body)
+
+                result = await crawler.fetch_urls(list(depths), on_fetched)
+                for key in stats:
+                    stats[key] += result[key]
+                finished.extend((url, 'failed', 'fetch failed') for url in depths if url not in fetched)
+                await self._flush(job_id, finished)
+
+        run = asyncio.create_task(pipeline.run(fetch))
+        self.pipelines[job_id] = pipeline
+        self._jobs[job_id] = run
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, pipeline, finished, run))
+        try:
+            await asyncio.wait([run])
+        finally:
+            heartbeat.cancel()
+            self._jobs.pop(job_id, None)
+            self.pipelines.pop(job_id, None)
+            if session is not None:
+                await session.close()
+
+        await self._flush(job_id, finished)
+        if heartbeat.done() and not heartbeat.cancelled() and heartbeat.result() is None:
+            # another worker holds the job now and owns its fetching URLs
+            print(f"Job {job_id} left to the worker that took over its lease")
+            return
+        snapshot = pipeline.snapshot()
+        if self._stopping and pipeline.status == 'cancelled':
+            await asyncio.to_thread(self.queue.requeue, job_id, self.worker_id, pipeline.counts)
+            print(f"Job {job_id} returned to the queue")
+            return
+        if pipeline.status == 'completed':
+            await asyncio.to_thread(self.queue.fail_fetching, job_id, self.worker_id, 'not ingested')
+        else:
+            await asyncio.to_thread(self.queue.release_urls, job_id, self.worker_id, settings.JOB_URL_MAX_ATTEMPTS)
+        await asyncio.to_thread(self.queue.finish_job, job_id, self.worker_id, pipeline.status, pipeline.counts,
+                                snapshot['stages'], pipeline.error)
+
+    async def _post_documents(self, session: aiohttp.ClientSession, job_id: str, lease_token: str,
+                              documents: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Have the API process store a batch of this job's documents; returns its chunk counts.
+        ``lease_token`` comes from claim_job and proves this run still holds the job."""
+        url = f"{self.api_url.rstrip('/')}/api/scraper/jobs/{job_id}/documents"
+        async with session.post(url, json={'lease_token': lease_token, 'documents': documents}) as response:
+            if response.status != 200:
+                raise ValueError(f"API did not store documents ({response.status}): {await response.text()}")
+            return await response.json()
+
+    async def _flush(self, job_id: str, finished: List[Tuple[str, str, Optional[str]]]):
+        if finished:
+            results = list(finished)
+            del finished[:len(results)]
+            await asyncio.to_thread(self.queue.finish_urls, job_id, results)
+
+    async def _heartbeat(self, job_id: str, pipeline: IngestPipeline, finished: List,
+                         run: asyncio.Task) -> Optional[str]:
+        """Keep the lease until the run ends; cancels the run and returns the job's status
+        (None once the lease is lost) when the job stops being ours to run"""
+        interval = max(settings.JOB_LEASE_SECONDS / 3, 0.1)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self._flush(job_id, finished)
+                status = await asyncio.to_thread(
+                    self.queue.heartbeat, job_id, self.worker_id, settings.JOB_LEASE_SECONDS,
+                    pipeline.counts, pipeline.snapshot()['stages']
+                )
+            except Exception as e:
+                print(f"[WARN] Heartbeat for job {job_id} failed: {e}")
+                continue
+            if status != 'running':
+                print(f"Job {job_id} stopping: {status or 'lease lost'}")
+                run.cancel()
+                return status
+
+    async def run_forever(self, slots: int, api_url: str):
+        """Entry point for a standalone worker process; documents are stored through the API at ``api_url``"""
+        self.api_url = api_url
+        self.start(slots)
+        try:
+            await asyncio.gather(*self._slots)
+        finally:
+            await self.stop()
+
+
+job_worker = JobWorker()
@@ -0,0 +1,96 @@
+from typing import List, Dict, Tuple, Optional, Set
+from collections import Counter
+import heapq
+import math
+import re
+import threading
+
+
+class LexicalIndex:
+    """Incrementally maintained BM25 inverted index over stored chunks.
+
+    Postings map each term to ``{chunk_id: term_frequency}``. Adding a chunk
+    that is already indexed replaces its postings, so upserts and deletes keep
+    the index in step with the vector collection without a rebuild.
+    """
+
+    _TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.doc_terms: Dict[str, List[str]] = {}
+        self.doc_lengths: Dict[str, int] = {}
+        self.total_length = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return cls._TOKEN_RE.findall(str(text).lower())
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: str, text: str):
+        self.add_many([doc_id], [text])
+
+    def add_many(self, doc_ids: List[str], texts: List[str]):
+        with self._lock:
+            for doc_id, text in zip(doc_ids, texts):
+                self._remove(doc_id)
+                counts = Counter(self.tokenize(text))
+                for term, tf in counts.items():
+                    self.postings.setdefault(term, {})[doc_id] = tf
+                length = sum(counts.values())
+                self.doc_terms[doc_id] = list(counts)
+                self.doc_lengths[doc_id] = length
+                self.total_length += length
+
+    def remove(self, doc_ids: List[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+
+    def clear(self):
+        with self._lock:
+            self.postings.clear()
+            self.doc_terms.clear()
+            self.doc_lengths.clear()
+            self.total_length = 0
+
+    def score(self, query: str, doc_ids: List[str]) -> Dict[str, float]:
+        """BM25 scores for the given chunks only (chunks without matching terms are omitted)"""
+        return dict(self.search(query, len(doc_ids), set(doc_ids)))
+
+    def search(self, query: str, n_results: int = 10, allowed_ids: Optional[Set[str]] = None) -> List[Tuple[str, float]]:
+        """Return the top ``n_results`` (chunk_id, bm25_score) pairs, optionally restricted to ``allowed_ids``"""
+        with self._lock:
+            n_docs = len(self.doc_lengths)
+            if not n_docs:
+                return []
+            avg_length = self.total_length / n_docs
+            scores: Dict[str, float] = {}
+            for term in set(self.tokenize(query)):
+                docs = self.postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id, tf in docs.items():
+                    if allowed_ids is not None and doc_id not in allowed_ids:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return heapq.nlargest(n_results, scores.items(), key=lambda item: item[1])
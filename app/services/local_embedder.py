@@ -0,0 +1,104 @@
+from typing import List
+import numpy as np
+
+
+class HashingEmbedder:
+    """Deterministic CPU-only embedder based on signed feature hashing.
+
+    Each text is mapped to word unigrams, word bigrams and character n-grams
+    over the UTF-8 bytes of the lowercased text. Features are hashed into a
+    fixed number of buckets with a random sign, counts are damped with log1p
+    and vectors are L2-normalized, so nearest-neighbour search behaves like a
+    TF projection. Hashing and accumulation are vectorized over the whole
+    batch with NumPy.
+    """
+
+    provider = "local"
+    model = "hashing-v1"
+
+    _CHAR_NGRAM = 3
+    _CHAR_WEIGHT = 0.25
+    _POLY = np.uint64(0x100000001B3)
+    _POLY_INV = np.uint64(pow(0x100000001B3, -1, 2 ** 64))
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    @staticmethod
+    def _mix(h: np.ndarray) -> np.ndarray:
+        """64-bit finalizer (MurmurHash3 fmix64) to spread hash bits"""
+        h = h ^ (h >> np.uint64(33))
+        h = h * np.uint64(0xFF51AFD7ED558CCD)
+        h = h ^ (h >> np.uint64(33))
+        h = h * np.uint64(0xC4CEB9FE1A85EC53)
+        return h ^ (h >> np.uint64(33))
+
+    @staticmethod
+    def _encode_batch(texts: List[str]):
+        """Lowercase, whitespace-normalize and join the batch into one byte array with per-byte row ids"""
+        encoded = [" ".join(str(text).lower().split()).encode("utf-8") for text in texts]
+        lengths = np.array([len(b) + 1 for b in encoded], dtype=np.int64)
+        data = np.frombuffer(b"\n".join(encoded) + b"\n", dtype=np.uint8)
+        rows = np.repeat(np.arange(len(texts), dtype=np.int64), lengths)
+        return data, rows
+
+    def _word_features(self, data: np.ndarray, rows: np.ndarray):
+        """Unigram and in-document bigram hashes, computed with polynomial prefix sums over the bytes"""
+        is_word = (
+            ((data >= 48) & (data <= 57)) | ((data >= 97) & (data <= 122)) | (data == 95) | (data >= 128)
+        )
+        edges = np.diff(np.concatenate(([0], is_word.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        if len(starts) == 0:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+        powers = np.cumprod(np.full(len(data), self._POLY, dtype=np.uint64)) * self._POLY_INV
+        inverse_powers = np.cumprod(np.full(len(data), self._POLY_INV, dtype=np.uint64)) * self._POLY
+        prefix = np.zeros(len(data) + 1, dtype=np.uint64)
+        np.cumsum(data.astype(np.uint64) * powers, dtype=np.uint64, out=prefix[1:])
+        unigrams = (prefix[ends] - prefix[starts]) * inverse_powers[starts]
+        word_rows = rows[starts]
+
+        same_doc = word_rows[:-1] == word_rows[1:]
+        bigrams = unigrams[:-1][same_doc] * np.uint64(0x9E3779B97F4A7C15) + unigrams[1:][same_doc] + np.uint64(1)
+        return np.concatenate((unigrams, bigrams)), np.concatenate((word_rows, word_rows[:-1][same_doc]))
+
+    def _char_features(self, data: np.ndarray, rows: np.ndarray):
+        """Character n-gram hashes (FNV-1a over bytes) that do not cross document boundaries"""
+        n = self._CHAR_NGRAM
+        if len(data) < n:
+            return np.empty(0, dtype=np.uint64), np.empty(0, dtype=np.int64)
+
+        wide = data.astype(np.uint64)
+        h = np.full(len(data) - n + 1, 0xCBF29CE484222325, dtype=np.uint64)
+        for k in range(n):
+            h = (h ^ wide[k:len(data) - n + 1 + k]) * np.uint64(0x100000001B3)
+
+        starts = rows[:len(h)]
+        valid = starts == rows[n - 1:]
+        return h[valid] ^ np.uint64(0x5BD1E995), starts[valid]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        data, rows = self._encode_batch(texts)
+        word_h, word_rows = self._word_features(data, rows)
+        char_h, char_rows = self._char_features(data, rows)
+
+        h = self._mix(np.concatenate((word_h, char_h)))
+        w = np.concatenate((np.ones(len(word_h)), np.full(len(char_h), self._CHAR_WEIGHT)))
+        r = np.concatenate((word_rows, char_rows))
+        buckets = (h % np.uint64(self.dimension)).astype(np.int64)
+        signs = np.where((h >> np.uint64(63)) == 1, -1.0, 1.0)
+
+        flat = np.bincount(r * self.dimension + buckets, weights=w * signs, minlength=len(texts) * self.dimension)
+        matrix = flat.reshape(len(texts), self.dimension)
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
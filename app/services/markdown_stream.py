@@ -0,0 +1,75 @@
+from typing import Tuple
+import re
+
+_BOLD_RE = re.compile(r"\*\*(.*?)\*\*")
+_ITALIC_RE = re.compile(r"\*(.*?)\*")
+_HEADING_RE = re.compile(r"^#+\s*", re.MULTILINE)
+_BULLET_RE = re.compile(r"^[\-\*\+]\s*", re.MULTILINE)
+
+
+def markdown_passes(text: str) -> Tuple[str, bool]:
+    """The substitutions of ``AIService.strip_markdown``, in order, without the final strip.
+
+    Also reports whether a heading or bullet match ran to the end of the
+    text: its trailing ``\\s*`` would swallow whitespace that follows, so the
+    result is not final until more text arrives.
+    """
+    text = _BOLD_RE.sub(r"\1", text)
+    text = _ITALIC_RE.sub(r"\1", text)
+    open_ended = False
+    for pattern in (_HEADING_RE, _BULLET_RE):
+        source = text
+
+        def drop(match):
+            nonlocal open_ended
+            open_ended = open_ended or match.end() == len(source)
+            return ""
+
+        text = pattern.sub(drop, source)
+    return text, open_ended
+
+
+class MarkdownStreamStripper:
+    """Incremental counterpart of ``AIService.strip_markdown`` for token streams.
+
+    Text is held until its line is complete and then goes through the same
+    passes in the same order, so the streamed answer matches the stripped
+    full answer exactly. Emphasis never spans lines, but a heading or bullet
+    marker swallows the blank lines after it; a block whose marker match
+    runs to its end is held until non-blank text follows. Leading and
+    trailing whitespace of the whole answer is dropped, as ``strip()`` would.
+    """
+
+    def __init__(self):
+        self.pending = ""
+        self.started = False
+        self.held_whitespace = ""
+
+    def feed(self, delta: str) -> str:
+        self.pending += delta or ""
+        end = self.pending.rfind("\n") + 1
+        if not end:
+            return ""
+        text, open_ended = markdown_passes(self.pending[:end])
+        if open_ended:
+            return ""
+        self.pending = self.pending[end:]
+        return self._emit(text)
+
+    def flush(self) -> str:
+        text, _ = markdown_passes(self.pending)
+        self.pending = ""
+        out = self._emit(text)
+        self.held_whitespace = ""
+        return out
+
+    def _emit(self, text: str) -> str:
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return ""
+            self.started = True
+        text = self.held_whitespace + text
+        body = text.rstrip()
+        self.held_whitespace = text[len(body):]
+        return body
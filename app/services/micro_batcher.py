@@ -0,0 +1,93 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+import asyncio
+
+
+class MicroBatcher:
+    """Coalesce calls that arrive within a short window into one batched call.
+
+    ``submit(group, item)`` waits up to ``window_ms`` for other items of the
+    same group (or until ``max_batch`` items are queued), then runs
+    ``handler(group, items)`` once and hands each caller its own result.
+    Items only share a batch when their group keys are equal, so callers put
+    everything the batched call depends on (collection, n_results, filters)
+    into the key. A window of 0 turns batching off.
+    """
+
+    def __init__(self, handler: Callable[[Hashable, List[Any]], Awaitable[List[Any]]],
+                 window_ms: float, max_batch: int):
+        self.handler = handler
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.pending: Dict[Hashable, List[Tuple[Any, asyncio.Future]]] = {}
+        self.timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, group: Hashable, item: Any) -> Any:
+        if self.window <= 0:
+            self.batches += 1
+            self.items += 1
+            return (await self.handler(group, [item]))[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self.pending.setdefault(group, [])
+        queue.append((item, future))
+        if len(queue) >= self.max_batch:
+            self._flush(group)
+        elif group not in self.timers:
+            self.timers[group] = loop.call_later(self.window, self._flush, group)
+        return await future
+
+    def _flush(self, group: Hashable):
+        timer = self.timers.pop(group, None)
+        if timer is not None:
+            timer.cancel()
+        queue = self.pending.pop(group, [])
+        if queue:
+            asyncio.ensure_future(self._run(group, queue))
+
+    async def _run(self, group: Hashable, queue: List[Tuple[Any, asyncio.Future]]):
+        self.batches += 1
+        self.items += len(queue)
+        try:
+            results = await self.handler(group, [item for item, _ in queue])
+            if len(results) != len(queue):
+                raise ValueError(f"batch handler returned {len(results)} results for {len(queue)} items")
+        except Exception as e:
+            for _, future in queue:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(queue, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+        }
+
+
+class SingleFlight:
+    """Share one in-flight computation among concurrent callers with the same key"""
+
+    def __init__(self):
+        self.inflight: Dict[Hashable, asyncio.Future] = {}
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared); ``shared`` is True when another caller's computation was reused"""
+        if key in self.inflight:
+            self.shared += 1
+            return await asyncio.shield(self.inflight[key]), True
+
+        future = asyncio.ensure_future(fn())
+        self.inflight[key] = future
+        try:
+            return await asyncio.shield(future), False
+        finally:
+            if self.inflight.get(key) is future:
+                del self.inflight[key]
@@ -0,0 +1,502 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import uuid
+import numpy as np
+from app.services.vector_store import VectorCollection, VectorStore, GET_INCLUDE, QUERY_INCLUDE
+
+VECTOR_INDEXES = ("exact", "ivf")
+# same naming rule as Chroma, so collections move between backends unchanged
+_NAME_RE = re.compile(r"^[a-zA-Z0-9][a-zA-Z0-9._-]{1,61}[a-zA-Z0-9]$")
+_COMPARISONS = {'$eq': '=', '$ne': '!=', '$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}
+_SEGMENT_ROWS = 65536
+_SQL_PARAMS = 900
+# IVF is trained once a collection has this many live rows, and retrained whenever it doubles
+IVF_MIN_ROWS = 4096
+# filtered queries matching at most this many rows are answered exactly from those rows
+EXACT_SUBSET_ROWS = 20000
+
+
+def _compile_where(where: Dict[str, Any], params: List[Any]) -> str:
+    """Translate a Chroma-style metadata filter into SQL over the JSON metadata column"""
+    clauses = []
+    for key, condition in where.items():
+        if key in ('$and', '$or'):
+            if not isinstance(condition, list) or not condition:
+                raise ValueError(f"{key} expects a non-empty list of filters")
+            parts = [_compile_where(part, params) for part in condition]
+            clauses.append("(" + (" AND " if key == '$and' else " OR ").join(parts) + ")")
+            continue
+        if key.startswith('$') or '"' in key:
+            raise ValueError(f"Invalid metadata key in filter: {key}")
+        if not isinstance(condition, dict):
+            condition = {'$eq': condition}
+        for operator, value in condition.items():
+            field = "json_extract(metadata, ?)"
+            params.append(f'$."{key}"')
+            if operator in ('$in', '$nin'):
+                if not isinstance(value, list) or not value:
+                    raise ValueError(f"{operator} expects a non-empty list")
+                params.extend(value)
+                negate = "NOT " if operator == '$nin' else ""
+                clauses.append(f"{field} {negate}IN ({', '.join('?' * len(value))})")
+            elif operator in _COMPARISONS:
+                params.append(value)
+                clauses.append(f"{field} {_COMPARISONS[operator]} ?")
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+    return " AND ".join(clauses) if clauses else "1"
+
+
+class NumpyCollection(VectorCollection):
+    """A collection stored as memory-mapped NumPy arrays plus a SQLite record table.
+
+    Row ``r`` of ``vectors.f32`` (with its squared norm, live flag and IVF
+    list) belongs to the record whose ``row`` is ``r``. Deleted rows are
+    tombstoned; updates overwrite their row in place. Queries are exact
+    blocked scans, or, with the ``ivf`` index, a scan of the ``nprobe``
+    inverted lists nearest to the query followed by exact distances.
+    """
+
+    def __init__(self, store: "NumpyVectorStore", path: str, info: Dict[str, Any]):
+        self._store = store
+        self.path = path
+        self._info = info
+        self._index = store.index
+        self._nprobe = store.nprobe
+        self._lock = threading.RLock()
+        self._postings: Optional[Tuple[np.ndarray, np.ndarray]] = None
+        self._centroids: Optional[np.ndarray] = None
+        self._conn = sqlite3.connect(os.path.join(path, "records.db"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS records (
+                row INTEGER PRIMARY KEY,
+                id TEXT UNIQUE NOT NULL,
+                document TEXT,
+                metadata TEXT
+            )"""
+        )
+        self._conn.commit()
+        if info['dimension']:
+            self._map(info['capacity'])
+        centroids_path = os.path.join(path, "centroids.npy")
+        if os.path.exists(centroids_path):
+            self._centroids = np.load(centroids_path)
+
+    # -- metadata ---------------------------------------------------------
+
+    @property
+    def name(self) -> str:
+        return self._info['name']
+
+    @property
+    def id(self) -> uuid.UUID:
+        return uuid.UUID(self._info['id'])
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self._info['metadata']
+
+    def _save_info(self):
+        tmp_path = os.path.join(self.path, "collection.json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self._info, f)
+        os.replace(tmp_path, os.path.join(self.path, "collection.json"))
+
+    def _map(self, capacity: int):
+        dimension = self._info['dimension']
+        for name, dtype, shape in (
+            ('vectors', np.float32, (capacity, dimension)),
+            ('norms', np.float32, (capacity,)),
+            ('alive', np.uint8, (capacity,)),
+            ('lists', np.int32, (capacity,))
+        ):
+            filename = os.path.join(self.path, f"{name}.bin")
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            with open(filename, 'ab') as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            setattr(self, f"_{name}", np.memmap(filename, dtype=dtype, mode='r+', shape=shape))
+        self._info['capacity'] = capacity
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # -- reads ------------------------------------------------------------
+
+    def count(self) -> int:
+        return self._info['alive']
+
+    def _select(self, columns: str, ids: Optional[Sequence[str]], where: Optional[Dict[str, Any]],
+                rows: Optional[Sequence[int]] = None, limit: Optional[int] = None,
+                offset: Optional[int] = None) -> List[Tuple]:
+        """Matching records ordered by row (``columns`` must start with row).
+
+        Id and row lists are queried in parameter-sized chunks; ``limit`` and
+        ``offset`` are applied after ordering.
+        """
+        params: List[Any] = []
+        condition = _compile_where(where, params) if where else "1"
+        keys, key_column = (ids, "id") if ids is not None else (rows, "row")
+        if keys is None:
+            return self._conn.execute(
+                f"SELECT {columns} FROM records WHERE {condition} ORDER BY row LIMIT ? OFFSET ?",
+                params + [-1 if limit is None else limit, offset or 0]
+            ).fetchall()
+        found = []
+        keys = list(keys)
+        for start in range(0, len(keys), _SQL_PARAMS):
+            part = keys[start:start + _SQL_PARAMS]
+            found.extend(self._conn.execute(
+                f"SELECT {columns} FROM records WHERE {key_column} IN ({', '.join('?' * len(part))}) AND {condition}",
+                list(part) + params
+            ).fetchall())
+        found.sort(key=lambda record: record[0])
+        start = offset or 0
+        return found[start:start + limit] if limit is not None else found[start:]
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=GET_INCLUDE):
+        with self._lock:
+            records = self._select("row, id, document, metadata", ids, where, limit=limit, offset=offset)
+            rows = [record[0] for record in records]
+            return {
+                'ids': [record[1] for record in records],
+                'embeddings': self._vectors[rows].tolist() if 'embeddings' in include and rows else
+                ([] if 'embeddings' in include else None),
+                'documents': [record[2] for record in records] if 'documents' in include else None,
+                'metadatas': [json.loads(record[3]) if record[3] else None for record in records]
+                if 'metadatas' in include else None
+            }
+
+    def _exact(self, queries: np.ndarray, k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Exact nearest live rows per query, over ``rows`` or the whole collection"""
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        if rows is not None and len(rows) <= EXACT_SUBSET_ROWS:
+            rows = rows[self._alive[rows] == 1]
+            distances = self._norms[rows][:, None] - 2.0 * (self._vectors[rows] @ queries.T) + query_norms[None, :]
+            return [self._top(distances[:, q], rows, k) for q in range(len(queries))]
+
+        # large subsets are scanned in place with a mask rather than gathered
+        total = self._info['rows']
+        mask = None
+        if rows is not None:
+            mask = np.zeros(total, dtype=bool)
+            mask[rows] = True
+        best = [(np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)) for _ in queries]
+        for start in range(0, total, _SEGMENT_ROWS):
+            end = min(start + _SEGMENT_ROWS, total)
+            distances = (self._vectors[start:end] @ queries.T)
+            distances *= -2.0
+            distances += self._norms[start:end][:, None]
+            distances += query_norms[None, :]
+            distances[self._alive[start:end] == 0] = np.inf
+            if mask is not None:
+                distances[~mask[start:end]] = np.inf
+            segment_rows = np.arange(start, end, dtype=np.int64)
+            for q in range(len(queries)):
+                top_distances, top_rows = self._top(distances[:, q], segment_rows, k)
+                merged_distances = np.concatenate([best[q][0], top_distances])
+                merged_rows = np.concatenate([best[q][1], top_rows])
+                order = np.argsort(merged_distances, kind='stable')[:k]
+                best[q] = (merged_distances[order], merged_rows[order])
+        return [(d, r) for d, r in best]
+
+    @staticmethod
+    def _top(distances: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        finite = np.isfinite(distances)
+        distances, rows = distances[finite], rows[finite]
+        if len(distances) > k:
+            keep = np.argpartition(distances, k - 1)[:k]
+            distances, rows = distances[keep], rows[keep]
+        order = np.argsort(distances, kind='stable')
+        return distances[order].astype(np.float32), rows[order]
+
+    def _ivf(self, queries: np.ndarray, k: int, allowed: Optional[np.ndarray]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        if self._postings is None:
+            lists = np.asarray(self._lists[:self._info['rows']])
+            order = np.argsort(lists, kind='stable')
+            bounds = np.searchsorted(lists[order], np.arange(len(self._centroids) + 1))
+            self._postings = (order.astype(np.int64), bounds)
+        order, bounds = self._postings
+        centroid_distances = (np.einsum('ij,ij->i', self._centroids, self._centroids)[None, :]
+                              - 2.0 * queries @ self._centroids.T)
+        nprobe = min(self._nprobe, len(self._centroids))
+        results = []
+        for q, query in enumerate(queries):
+            probes = np.argpartition(centroid_distances[q], nprobe - 1)[:nprobe]
+            candidates = np.concatenate([order[bounds[p]:bounds[p + 1]] for p in probes])
+            if allowed is not None:
+                candidates = np.intersect1d(candidates, allowed, assume_unique=True)
+            hit = self._exact(query[None, :], k, candidates)[0]
+            if len(hit[1]) < k:
+                # the probed lists ran dry (e.g. a selective filter): answer this query exactly
+                hit = self._exact(query[None, :], k, allowed)[0]
+            results.append(hit)
+        return results
+
+    def query(self, query_embeddings, n_results=10, where=None, include=QUERY_INCLUDE):
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+        empty = {
+            'ids': [[] for _ in queries],
+            'distances': [[] for _ in queries] if 'distances' in include else None,
+            'embeddings': [[] for _ in queries] if 'embeddings' in include else None,
+            'documents': [[] for _ in queries] if 'documents' in include else None,
+            'metadatas': [[] for _ in queries] if 'metadatas' in include else None
+        }
+        with self._lock:
+            if not self._info['dimension'] or not self._info['alive'] or n_results <= 0:
+                return empty
+            if queries.shape[1] != self._info['dimension']:
+                raise ValueError(
+                    f"Query dimension {queries.shape[1]} does not match collection dimension {self._info['dimension']}"
+                )
+
+            allowed = None
+            if where:
+                allowed = np.array([record[0] for record in self._select("row", None, where)], dtype=np.int64)
+                if not len(allowed):
+                    return empty
+
+            use_ivf = self._index == "ivf" and self._centroids is not None
+            if use_ivf and (allowed is None or len(allowed) > EXACT_SUBSET_ROWS):
+                hits = self._ivf(queries, n_results, allowed)
+            else:
+                hits = self._exact(queries, n_results, allowed)
+
+            needed = np.unique(np.concatenate([rows for _, rows in hits])) if hits else np.empty(0, dtype=np.int64)
+            records = {}
+            if len(needed):
+                records = {
+                    record[0]: record
+                    for record in self._select("row, id, document, metadata", None, None, needed.tolist())
+                }
+
+            result = {key: ([] if value is not None else None) for key, value in empty.items()}
+            for distances, rows in hits:
+                rows = [int(row) for row in rows]
+                result['ids'].append([records[row][1] for row in rows])
+                if result['distances'] is not None:
+                    result['distances'].append([float(d) for d in distances])
+                if result['embeddings'] is not None:
+                    result['embeddings'].append(self._vectors[rows].tolist() if rows else [])
+                if result['documents'] is not None:
+                    result['documents'].append([records[row][2] for row in rows])
+                if result['metadatas'] is not None:
+                    result['metadatas'].append([json.loads(records[row][3]) if records[row][3] else None for row in rows])
+            return result
+
+    # -- writes -----------------------------------------------------------
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        ids = list(ids)
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        with self._lock:
+            if not self._info['dimension']:
+                self._info['dimension'] = int(vectors.shape[1])
+                self._map(self._info['capacity'])
+            if vectors.shape[1] != self._info['dimension']:
+                raise ValueError(
+                    f"Embedding dimension {vectors.shape[1]} does not match collection dimension {self._info['dimension']}"
+                )
+
+            # a repeated id within one call keeps its last occurrence, as in Chroma
+            last = {doc_id: i for i, doc_id in enumerate(ids)}
+            positions = list(last.values())
+            ids = list(last)
+            vectors = vectors[positions]
+            existing = {doc_id: row for row, doc_id in self._select("row, id", ids, None)}
+            rows = np.empty(len(ids), dtype=np.int64)
+            total = self._info['rows']
+            for i, doc_id in enumerate(ids):
+                if doc_id in existing:
+                    rows[i] = existing[doc_id]
+                else:
+                    rows[i] = total
+                    total += 1
+            if total > self._info['capacity']:
+                capacity = self._info['capacity']
+                while capacity < total:
+                    capacity *= 2
+                self._map(capacity)
+
+            self._vectors[rows] = vectors
+            self._norms[rows] = np.einsum('ij,ij->i', vectors, vectors)
+            self._alive[rows] = 1
+            self._lists[rows] = self._assign(vectors) if self._centroids is not None else -1
+            self._conn.executemany(
+                "INSERT INTO records (row, id, document, metadata) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET document = excluded.document, metadata = excluded.metadata",
+                [
+                    (int(row), doc_id,
+                     documents[position] if documents is not None else None,
+                     json.dumps(metadatas[position]) if metadatas is not None and metadatas[position] is not None else None)
+                    for row, doc_id, position in zip(rows, ids, positions)
+                ]
+            )
+            self._info['rows'] = total
+            self._info['alive'] += len(ids) - len(existing)
+            self._commit()
+            if self._index == "ivf" and self._info['alive'] >= IVF_MIN_ROWS and (
+                    self._centroids is None or self._info['alive'] >= 2 * self._info.get('ivf_trained_rows', 0)):
+                self._train_ivf()
+
+    def delete(self, ids=None, where=None):
+        if ids is None and where is None:
+            raise ValueError("Specify ids and/or where to delete")
+        with self._lock:
+            rows = [record[0] for record in self._select("row", ids, where)]
+            if not rows:
+                return
+            self._alive[rows] = 0
+            self._lists[rows] = -1
+            for start in range(0, len(rows), _SQL_PARAMS):
+                part = rows[start:start + _SQL_PARAMS]
+                self._conn.execute(f"DELETE FROM records WHERE row IN ({', '.join('?' * len(part))})", part)
+            self._info['alive'] -= len(rows)
+            self._commit()
+
+    def modify(self, name=None, metadata=None):
+        with self._lock:
+            if name is not None and name != self.name:
+                self._store._rename(self, name)
+            if metadata is not None:
+                self._info['metadata'] = metadata
+            self._save_info()
+
+    def _commit(self):
+        for array in (self._vectors, self._norms, self._alive, self._lists):
+            array.flush()
+        self._conn.commit()
+        self._save_info()
+        self._postings = None
+
+    # -- IVF --------------------------------------------------------------
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        centroid_norms = np.einsum('ij,ij->i', self._centroids, self._centroids)
+        assigned = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 8192):
+            block = vectors[start:start + 8192]
+            assigned[start:start + len(block)] = np.argmin(centroid_norms[None, :] - 2.0 * block @ self._centroids.T, axis=1)
+        return assigned
+
+    def _train_ivf(self, iterations: int = 8):
+        """k-means over a sample of live rows (about sqrt(n) lists), then reassign every row"""
+        live = np.flatnonzero(self._alive[:self._info['rows']])
+        nlist = int(min(1024, max(16, np.sqrt(len(live)))))
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, size=min(len(live), nlist * 32), replace=False))
+        data = np.asarray(self._vectors[sample])
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            self._centroids = centroids
+            assigned = self._assign(data)
+            counts = np.bincount(assigned, minlength=nlist)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assigned, data)
+            nonempty = counts > 0
+            centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+        self._centroids = centroids
+        for start in range(0, len(live), 65536):
+            rows = live[start:start + 65536]
+            self._lists[rows] = self._assign(np.asarray(self._vectors[rows]))
+        np.save(os.path.join(self.path, "centroids.npy"), centroids)
+        self._info['ivf_trained_rows'] = int(len(live))
+        self._commit()
+        print(f"Trained IVF index for {self.name}: {nlist} lists over {len(live)} rows")
+
+
+class NumpyVectorStore(VectorStore):
+    """In-process vector store: one directory of memory-mapped arrays per collection"""
+
+    def __init__(self, root: str, index: str = "exact", nprobe: int = 16):
+        if index not in VECTOR_INDEXES:
+            raise ValueError(f"Unknown vector index: {index}")
+        self.root = root
+        self.index = index
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._collections: Dict[str, NumpyCollection] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _open(self, name: str) -> Optional[NumpyCollection]:
+        if name in self._collections:
+            return self._collections[name]
+        path = os.path.join(self.root, name)
+        try:
+            with open(os.path.join(path, "collection.json")) as f:
+                info = json.load(f)
+        except (OSError, ValueError):
+            return None
+        collection = NumpyCollection(self, path, info)
+        self._collections[name] = collection
+        return collection
+
+    def list_collections(self):
+        with self._lock:
+            return [
+                collection for collection in (self._open(name) for name in sorted(os.listdir(self.root)))
+                if collection is not None
+            ]
+
+    def get_collection(self, name):
+        with self._lock:
+            collection = self._open(name) if _NAME_RE.match(name or "") else None
+            if collection is None:
+                raise ValueError(f"Collection {name} does not exist.")
+            return collection
+
+    def get_or_create_collection(self, name, metadata=None):
+        if not _NAME_RE.match(name or "") or ".." in name:
+            raise ValueError(f"Invalid collection name: {name}")
+        with self._lock:
+            collection = self._open(name)
+            if collection is not None:
+                if metadata is not None:
+                    collection.modify(metadata=metadata)
+                return collection
+            path = os.path.join(self.root, name)
+            os.makedirs(path)
+            info = {
+                'id': str(uuid.uuid4()),
+                'name': name,
+                'metadata': metadata,
+                'dimension': None,
+                'rows': 0,
+                'alive': 0,
+                'capacity': 1024
+            }
+            with open(os.path.join(path, "collection.json"), 'w') as f:
+                json.dump(info, f)
+            return self._open(name)
+
+    def delete_collection(self, name):
+        with self._lock:
+            collection = self._open(name) if _NAME_RE.match(name or "") else None
+            if collection is None:
+                raise ValueError(f"Collection {name} does not exist.")
+            collection.close()
+            del self._collections[name]
+            shutil.rmtree(collection.path)
+
+    def _rename(self, collection: NumpyCollection, name: str):
+        if not _NAME_RE.match(name) or ".." in name:
+            raise ValueError(f"Invalid collection name: {name}")
+        with self._lock:
+            if self._open(name) is not None:
+                raise ValueError(f"Collection {name} already exists.")
+            new_path = os.path.join(self.root, name)
+            os.rename(collection.path, new_path)
+            del self._collections[collection.name]
+            collection.path = new_path
+            collection._info['name'] = name
+            self._collections[name] = collection
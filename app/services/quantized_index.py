@@ -0,0 +1,255 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import shutil
+import threading
+import numpy as np
+
+QUANTIZED_DTYPES = ("int8", "float16")
+_FORMAT_VERSION = 1
+_ID_BYTES = 64
+# rows decoded to float32 at a time; small enough to stay in cache, large enough for BLAS
+_DECODE_ROWS = 512
+# rows scored before the running shortlist is merged
+_SEGMENT_ROWS = 65536
+
+
+class QuantizedIndex:
+    """Compact, memory-mapped copy of a collection's embeddings for coarse scans.
+
+    Vectors are stored as int8 codes with one float32 scale per row, or as
+    float16, next to each row's exact squared norm. ``search`` scans the
+    codes to shortlist ``k * oversample`` rows per query by approximate
+    squared L2 distance (the metric Chroma collections use), then rescores
+    the shortlist exactly against full-precision vectors supplied by the
+    caller. Deleted rows are tombstoned and their slots are not reused.
+
+    Files live in one directory: ``header.json`` plus ``ids``, ``codes``,
+    ``scales``, ``norms`` and ``alive`` arrays that grow by doubling.
+    """
+
+    def __init__(self, path: str, header: Dict):
+        self.path = path
+        self.header = header
+        self.dimension = header['dimension']
+        self.dtype = header['dtype']
+        self._rows: Optional[Dict[str, int]] = None
+        # writers run on worker threads; searches read a consistent prefix and need no lock
+        self._lock = threading.Lock()
+        self._map(header['capacity'])
+
+    @classmethod
+    def create(cls, path: str, dimension: int, dtype: str, source_id: str = "", capacity: int = 1024) -> "QuantizedIndex":
+        if dtype not in QUANTIZED_DTYPES:
+            raise ValueError(f"Unsupported quantized dtype: {dtype}")
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        header = {
+            'format_version': _FORMAT_VERSION,
+            'dimension': dimension,
+            'dtype': dtype,
+            'source_id': source_id,
+            'count': 0,
+            'alive': 0,
+            'capacity': capacity
+        }
+        index = cls(path, header)
+        index._save_header()
+        return index
+
+    @classmethod
+    def open(cls, path: str) -> Optional["QuantizedIndex"]:
+        """Open an existing index, or None when there is none (or it is from another format)"""
+        try:
+            with open(os.path.join(path, "header.json")) as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if header.get('format_version') != _FORMAT_VERSION:
+            return None
+        return cls(path, header)
+
+    @staticmethod
+    def destroy(path: str):
+        shutil.rmtree(path, ignore_errors=True)
+
+    def _layout(self) -> Dict[str, Tuple[np.dtype, Tuple[int, ...]]]:
+        code_dtype = np.int8 if self.dtype == "int8" else np.float16
+        return {
+            'ids': (np.dtype(f"S{_ID_BYTES}"), ()),
+            'codes': (np.dtype(code_dtype), (self.dimension,)),
+            'scales': (np.dtype(np.float32), ()),
+            'norms': (np.dtype(np.float32), ()),
+            'alive': (np.dtype(np.uint8), ())
+        }
+
+    def _map(self, capacity: int):
+        """(Re)map every array file at ``capacity`` rows, extending the files as needed"""
+        for name, (dtype, tail) in self._layout().items():
+            filename = os.path.join(self.path, f"{name}.bin")
+            size = capacity * dtype.itemsize * int(np.prod(tail or (1,)))
+            with open(filename, 'ab') as f:
+                if f.tell() < size:
+                    f.truncate(size)
+            setattr(self, name, np.memmap(filename, dtype=dtype, mode='r+', shape=(capacity,) + tail))
+        self.header['capacity'] = capacity
+
+    def _save_header(self):
+        tmp_path = os.path.join(self.path, "header.json.tmp")
+        with open(tmp_path, 'w') as f:
+            json.dump(self.header, f)
+        os.replace(tmp_path, os.path.join(self.path, "header.json"))
+
+    def __len__(self) -> int:
+        return self.header['alive']
+
+    @property
+    def source_id(self) -> str:
+        return self.header['source_id']
+
+    def nbytes(self) -> int:
+        """Bytes used by the live part of the arrays (what a scan touches)"""
+        count = self.header['count']
+        return sum(count * dtype.itemsize * int(np.prod(tail or (1,))) for dtype, tail in self._layout().values())
+
+    def _row_map(self) -> Dict[str, int]:
+        # only writers need id -> row, so searches never pay for building it
+        if self._rows is None:
+            count = self.header['count']
+            alive = np.flatnonzero(self.alive[:count])
+            self._rows = {doc_id.decode('utf-8'): int(row) for doc_id, row in zip(self.ids[alive], alive)}
+        return self._rows
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.dtype == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+        return codes, scales.astype(np.float32)
+
+    def upsert(self, ids: Sequence[str], embeddings) -> None:
+        with self._lock:
+            self._upsert(ids, embeddings)
+
+    def _upsert(self, ids: Sequence[str], embeddings) -> None:
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        if vectors.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-d vectors, got {vectors.shape[1]}-d")
+        rows_by_id = self._row_map()
+        rows = np.empty(len(ids), dtype=np.int64)
+        count = self.header['count']
+        for i, doc_id in enumerate(ids):
+            if len(doc_id.encode('utf-8')) > _ID_BYTES:
+                raise ValueError(f"Chunk id longer than {_ID_BYTES} bytes: {doc_id}")
+            row = rows_by_id.get(doc_id)
+            if row is None:
+                row = rows_by_id[doc_id] = count
+                count += 1
+                self.header['alive'] += 1
+            rows[i] = row
+
+        if count > self.header['capacity']:
+            capacity = self.header['capacity']
+            while capacity < count:
+                capacity *= 2
+            self._map(capacity)
+
+        codes, scales = self._encode(vectors)
+        self.ids[rows] = [doc_id.encode('utf-8') for doc_id in ids]
+        self.codes[rows] = codes
+        self.scales[rows] = scales
+        self.norms[rows] = np.einsum('ij,ij->i', vectors, vectors)
+        self.alive[rows] = 1
+        self.header['count'] = count
+        self.flush()
+
+    def remove(self, ids: Sequence[str]) -> int:
+        with self._lock:
+            rows_by_id = self._row_map()
+            rows = [rows_by_id.pop(doc_id) for doc_id in ids if doc_id in rows_by_id]
+            if rows:
+                self.alive[rows] = 0
+                self.header['alive'] -= len(rows)
+                self.flush()
+            return len(rows)
+
+    def flush(self):
+        for name in self._layout():
+            getattr(self, name).flush()
+        self._save_header()
+
+    def coarse_search(self, queries: np.ndarray, shortlist: int) -> List[np.ndarray]:
+        """Rows of the ``shortlist`` nearest live vectors per query by approximate squared L2"""
+        count = self.header['count']
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.dimension)
+        shortlist = min(shortlist, self.header['alive'])
+        if shortlist <= 0 or count == 0:
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+
+        # plain ndarray views skip np.memmap's per-slice bookkeeping in the hot loop
+        codes, scales, norms, alive = (np.asarray(a) for a in (self.codes, self.scales, self.norms, self.alive))
+        single = len(queries) == 1
+        transposed = np.ascontiguousarray(queries.T)
+        query_norms = np.einsum('ij,ij->i', queries, queries)
+        decoded = np.empty((_DECODE_ROWS, self.dimension), dtype=np.float32)
+        segment = np.empty((min(_SEGMENT_ROWS, count), len(queries)), dtype=np.float32)
+        best_rows = np.empty((0, len(queries)), dtype=np.int64)
+        best_distances = np.empty((0, len(queries)), dtype=np.float32)
+
+        for segment_start in range(0, count, _SEGMENT_ROWS):
+            segment_end = min(segment_start + _SEGMENT_ROWS, count)
+            for start in range(segment_start, segment_end, _DECODE_ROWS):
+                end = min(start + _DECODE_ROWS, segment_end)
+                np.copyto(decoded[:end - start], codes[start:end], casting='unsafe')
+                target = segment[start - segment_start:end - segment_start]
+                if single:
+                    # matrix-vector product is markedly faster than a one-column matrix product
+                    np.dot(decoded[:end - start], queries[0], out=target[:, 0])
+                else:
+                    np.dot(decoded[:end - start], transposed, out=target)
+            rows = slice(segment_start, segment_end)
+            distances = segment[:segment_end - segment_start]
+            # |x|^2 - 2 s (c . q) + |q|^2 with the exact |x|^2 and the int8 scale s
+            distances *= -2.0 * scales[rows][:, None]
+            distances += norms[rows][:, None]
+            distances += query_norms[None, :]
+            distances[alive[rows] == 0] = np.inf
+
+            keep = min(shortlist, len(distances))
+            top = np.argpartition(distances, keep - 1, axis=0)[:keep]
+            pool_distances = np.concatenate([best_distances, np.take_along_axis(distances, top, axis=0)])
+            pool_rows = np.concatenate([best_rows, top + segment_start])
+            keep = min(shortlist, len(pool_distances))
+            top = np.argpartition(pool_distances, keep - 1, axis=0)[:keep]
+            best_distances = np.take_along_axis(pool_distances, top, axis=0)
+            best_rows = np.take_along_axis(pool_rows, top, axis=0)
+
+        return [best_rows[np.isfinite(best_distances[:, q]), q] for q in range(len(queries))]
+
+    def search(self, queries, k: int, oversample: int,
+               fetch_full: Callable[[List[str]], Dict[str, Sequence[float]]]) -> List[List[Tuple[str, float, np.ndarray]]]:
+        """Two-stage search: coarse shortlist of ``k * oversample``, exact rescoring of the shortlist.
+
+        ``fetch_full(ids)`` returns the full-precision vectors of the given ids
+        (ids it cannot find are skipped). Returns, per query, up to ``k``
+        (id, squared L2 distance, vector) tuples nearest first.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dimension)
+        shortlists = self.coarse_search(queries, k * max(1, oversample))
+        shortlist_ids = [[doc_id.decode('utf-8') for doc_id in self.ids[rows]] for rows in shortlists]
+        full = fetch_full(list(dict.fromkeys(doc_id for ids in shortlist_ids for doc_id in ids)))
+
+        results = []
+        for query, ids in zip(queries, shortlist_ids):
+            ids = [doc_id for doc_id in ids if doc_id in full]
+            if not ids:
+                results.append([])
+                continue
+            vectors = np.asarray([full[doc_id] for doc_id in ids], dtype=np.float32)
+            differences = vectors - query
+            distances = np.einsum('ij,ij->i', differences, differences)
+            order = np.argsort(distances, kind='stable')[:k]
+            results.append([(ids[i], float(distances[i]), vectors[i]) for i in order])
+        return results
@@ -0,0 +1,254 @@
+from typing import Dict, Any, Optional
+from datetime import datetime
+import asyncio
+import bisect
+import json
+import os
+import time
+import uuid
+from app.core.config import settings
+from app.services.ai_service import ai_service
+from app.services.chroma_service import chroma_service, COLLECTION_NAME
+
+ACTIVE_STATUSES = ("running", "swapping")
+
+
+class ReembedService:
+    """Background migration of stored chunks to another embedding model.
+
+    Chunks are read from a source collection in pages, re-embedded with one
+    pinned provider under a chunks-per-second limit and written to a shadow
+    collection. When the source is exhausted the shadow replaces the target
+    namespace in one step. Pages follow the source's ids in sorted order, so
+    writes and deletes during the job cannot shift chunks past the scan, and
+    the last id done is checkpointed to a JSON file after every page; an
+    interrupted job resumes after it.
+    """
+
+    def __init__(self, checkpoint_path: str):
+        self.checkpoint_path = checkpoint_path
+        self.state: Optional[Dict[str, Any]] = self._load_checkpoint()
+        self.task: Optional[asyncio.Task] = None
+        self._run_started: Optional[float] = None
+        self._run_processed = 0
+
+    def _load_checkpoint(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.checkpoint_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_checkpoint(self):
+        self.state['updated_at'] = datetime.now().isoformat()
+        os.makedirs(os.path.dirname(os.path.abspath(self.checkpoint_path)), exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _default_source(self, target_provider: str, target_model: str) -> str:
+        """Largest stored collection that is not already embedded with the target model"""
+        best, best_count = None, 0
+        for collection in chroma_service.store.list_collections():
+            if not collection.name.startswith(COLLECTION_NAME) or (collection.metadata or {}).get('reembed_job'):
+                continue
+            namespace = chroma_service.namespaces.get(collection.name)
+            if namespace and (namespace['provider'], namespace['model']) == (target_provider, target_model):
+                continue
+            count = collection.count()
+            if count > best_count:
+                best, best_count = collection.name, count
+        if best is None:
+            raise ValueError("No collection needs re-embedding")
+        return best
+
+    async def start(self, target_provider: Optional[str] = None, source_collection: Optional[str] = None,
+                    drop_source: bool = False) -> Dict[str, Any]:
+        if self.state and self.state['status'] in ACTIVE_STATUSES:
+            raise ValueError(f"Re-embedding job {self.state['job_id']} is already {self.state['status']}")
+        if not chroma_service.store:
+            await chroma_service.initialize()
+        if not chroma_service.store:
+            raise ValueError("Vector store is not available")
+
+        target_provider = target_provider or ai_service.active_embedding_model()[0]
+        target_model = ai_service.embedding_model_for(target_provider)
+        source_collection = source_collection or self._default_source(target_provider, target_model)
+        source = chroma_service.get_stored_collection(source_collection)
+
+        job_id = uuid.uuid4().hex
+        shadow = chroma_service.create_shadow_collection(job_id)
+        self.state = {
+            'job_id': job_id,
+            'status': 'running',
+            'source_collection': source_collection,
+            'shadow_collection': shadow.name,
+            'target_provider': target_provider,
+            'target_model': target_model,
+            'target_dimension': None,
+            'drop_source': drop_source,
+            'cursor': None,
+            'processed': 0,
+            'total': await asyncio.to_thread(source.count),
+            'retries': 0,
+            'error': None,
+            'result': None,
+            'started_at': datetime.now().isoformat(),
+            'updated_at': None
+        }
+        self._save_checkpoint()
+        self._launch()
+        return self.status()
+
+    async def resume(self) -> Dict[str, Any]:
+        """Continue a paused, failed or interrupted job from its checkpoint"""
+        if not self.state:
+            raise ValueError("No re-embedding job to resume")
+        if self.task and not self.task.done():
+            raise ValueError(f"Re-embedding job {self.state['job_id']} is already running")
+        if self.state['status'] in ("completed", "cancelled"):
+            raise ValueError(f"Re-embedding job {self.state['job_id']} is {self.state['status']}")
+        if not chroma_service.store:
+            await chroma_service.initialize()
+        self.state['status'] = 'running'
+        self.state['error'] = None
+        self._save_checkpoint()
+        self._launch()
+        return self.status()
+
+    async def resume_if_interrupted(self):
+        """Called on startup: pick up a job that was running when the process stopped"""
+        if self.state and self.state['status'] in ACTIVE_STATUSES:
+            print(f"Resuming re-embedding job {self.state['job_id']} after {self.state['processed']} chunks")
+            await self.resume()
+
+    async def pause(self) -> Dict[str, Any]:
+        await self._stop('paused')
+        return self.status()
+
+    async def cancel(self) -> Dict[str, Any]:
+        await self._stop('cancelled')
+        chroma_service.drop_collection(self.state['shadow_collection'])
+        return self.status()
+
+    async def _stop(self, status: str):
+        if not self.state or self.state['status'] in ("completed", "cancelled"):
+            raise ValueError("No active re-embedding job")
+        if self.state['status'] == 'swapping':
+            raise ValueError("Re-embedding job is swapping collections and cannot be stopped")
+        if self.task and not self.task.done():
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+        self.state['status'] = status
+        self._save_checkpoint()
+
+    def _launch(self):
+        self._run_started = time.perf_counter()
+        self._run_processed = 0
+        self.task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        state = self.state
+        try:
+            source = chroma_service.get_stored_collection(state['source_collection'])
+            shadow = chroma_service.get_stored_collection(state['shadow_collection'])
+            batch_size = max(1, settings.REEMBED_BATCH_SIZE)
+            rate = settings.REEMBED_MAX_CHUNKS_PER_SEC
+            next_slot = time.perf_counter()
+
+            snapshot = await asyncio.to_thread(source.get, include=[])
+            ids = sorted(snapshot['ids'])
+            position = bisect.bisect_right(ids, state['cursor']) if state.get('cursor') is not None else 0
+
+            while position < len(ids):
+                page_ids = ids[position:position + batch_size]
+                position += len(page_ids)
+                page = await asyncio.to_thread(source.get, ids=page_ids, include=['documents', 'metadatas'])
+                if not page['ids']:
+                    state['cursor'] = page_ids[-1]
+                    continue
+
+                if rate > 0:
+                    delay = next_slot - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    next_slot = max(next_slot, time.perf_counter()) + len(page['ids']) / rate
+
+                embeddings = await self._embed_with_retries(page['documents'])
+                dimension = len(embeddings[0])
+                if state['target_dimension'] is None:
+                    state['target_dimension'] = dimension
+                if any(len(embedding) != state['target_dimension'] for embedding in embeddings):
+                    raise ValueError(
+                        f"{state['target_provider']}/{state['target_model']} returned vectors that do not match "
+                        f"the job's {state['target_dimension']} dimensions"
+                    )
+
+                await asyncio.to_thread(
+                    shadow.upsert,
+                    ids=page['ids'],
+                    documents=page['documents'],
+                    metadatas=page['metadatas'],
+                    embeddings=embeddings
+                )
+                state['cursor'] = page_ids[-1]
+                state['processed'] += len(page['ids'])
+                self._run_processed += len(page['ids'])
+                self._save_checkpoint()
+
+            state['status'] = 'swapping'
+            self._save_checkpoint()
+            if state['target_dimension'] is None:
+                state['result'] = {'collection': None, 'carried_over': 0, 'replaced_existing': False}
+                chroma_service.drop_collection(state['shadow_collection'])
+            else:
+                state['result'] = await chroma_service.swap_in_namespace(
+                    shadow, state['target_provider'], state['target_model'], state['target_dimension']
+                )
+            if state['drop_source']:
+                chroma_service.drop_collection(state['source_collection'])
+            state['status'] = 'completed'
+            self._save_checkpoint()
+            print(f"Re-embedding job {state['job_id']} completed: {state['processed']} chunks")
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            state['status'] = 'failed'
+            state['error'] = str(e)
+            self._save_checkpoint()
+            print(f"Re-embedding job {state['job_id']} failed: {e}")
+
+    async def _embed_with_retries(self, texts):
+        attempt = 0
+        while True:
+            try:
+                _, _, embeddings = await ai_service.embed_texts_with(self.state['target_provider'], texts)
+                return embeddings
+            except Exception as e:
+                attempt += 1
+                self.state['retries'] += 1
+                if attempt > settings.REEMBED_MAX_RETRIES:
+                    raise
+                backoff = min(2 ** attempt, 60)
+                print(f"Re-embedding batch failed ({e}), retrying in {backoff}s")
+                await asyncio.sleep(backoff)
+
+    def status(self) -> Dict[str, Any]:
+        if not self.state:
+            return {'status': 'idle'}
+        status = dict(self.state)
+        total, processed = status['total'], status['processed']
+        elapsed = time.perf_counter() - self._run_started if self._run_started else 0.0
+        throughput = self._run_processed / elapsed if elapsed > 0 and self._run_processed else 0.0
+        status['progress'] = round(processed / total, 4) if total else 1.0
+        status['throughput_chunks_per_sec'] = round(throughput, 2)
+        status['eta_seconds'] = round(max(total - processed, 0) / throughput, 1) if throughput else None
+        return status
+
+
+reembed_service = ReembedService(settings.REEMBED_CHECKPOINT_PATH)
@@ -0,0 +1,65 @@
+from typing import List, Optional, Sequence
+import numpy as np
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine_relevance(query_embedding: Sequence[float], candidate_embeddings: Sequence[Sequence[float]]) -> np.ndarray:
+    """Cosine similarity of every candidate to the query in one matrix-vector product"""
+    candidates = _normalize_rows(np.asarray(candidate_embeddings, dtype=np.float32))
+    query = _normalize_rows(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+    return candidates @ query
+
+
+def blend_lexical(relevance: np.ndarray, lexical_scores: Sequence[float], weight: float) -> np.ndarray:
+    """Mix semantic relevance with BM25 scores scaled to [0, 1] by the best candidate"""
+    lexical = np.asarray(lexical_scores, dtype=np.float32)
+    top = lexical.max() if len(lexical) else 0.0
+    if top > 0:
+        lexical = lexical / top
+    return (1 - weight) * np.asarray(relevance, dtype=np.float32) + weight * lexical
+
+
+def mmr_select(candidate_embeddings: Sequence[Sequence[float]], relevance: np.ndarray, k: int,
+               lambda_mult: float = 0.5) -> List[int]:
+    """Greedy maximal marginal relevance over candidate indices.
+
+    The pairwise similarity matrix is computed once; each step updates the
+    running max-similarity-to-selected vector instead of rescoring pairs.
+    """
+    candidates = _normalize_rows(np.asarray(candidate_embeddings, dtype=np.float32))
+    n = len(candidates)
+    k = min(k, n)
+    if k <= 0:
+        return []
+
+    pairwise = candidates @ candidates.T
+    relevance = np.asarray(relevance, dtype=np.float32)
+    max_similarity = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+
+    for step in range(k):
+        if step == 0:
+            scores = relevance.copy()
+        else:
+            scores = lambda_mult * relevance - (1 - lambda_mult) * max_similarity
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        max_similarity = np.maximum(max_similarity, pairwise[best])
+
+    return selected
+
+
+def rerank_order(relevance: np.ndarray, k: int, candidate_embeddings: Optional[Sequence[Sequence[float]]] = None,
+                 lambda_mult: float = 0.5) -> List[int]:
+    """Pick the final ``k`` candidates: MMR when embeddings are given, plain relevance order otherwise"""
+    if candidate_embeddings is not None:
+        return mmr_select(candidate_embeddings, relevance, k, lambda_mult)
+    return [int(i) for i in np.argsort(-np.asarray(relevance))[:k]]
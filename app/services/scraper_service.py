@@ -4,19 +4,21 @@ from bs4 import BeautifulSoup
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-import undetected_chromedriver as uc
 from fake_useragent import UserAgent
 import random
-from typing import List, Dict, Any
-from urllib.parse import urljoin, urlparse
+from typing import Any, Dict, List
+from urllib.parse import urljoin
 import trafilatura
 import json
 import pandas as pd
 import io
 import os
 import hashlib
+import time
 from datetime import datetime
 from app.core.config import settings
+from app.services.browser_pool import browser_pool
+from app.services.crawler import AsyncCrawler, HTML_CONTENT_TYPES
 
 OUTPUT_DIR = os.path.join(os.getcwd(), "outputs")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -27,6 +29,9 @@ class WebScraperService:
         self.ua = UserAgent()
         self.session = requests.Session()
         self._setup_session()
+        # crawl settings; /api/admin/configure adjusts them at runtime
+        self.max_concurrent_requests = settings.CRAWL_CONCURRENCY
+        self.request_delay = settings.CRAWL_HOST_DELAY
 
     def _setup_session(self):
         self.session.headers.update({
@@ -87,34 +92,27 @@ class WebScraperService:
         return content
 
     async def _scrape_with_selenium(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
-        options = uc.ChromeOptions()
-        for arg in ['--headless', '--no-sandbox', '--disable-dev-shm-usage', '--disable-gpu', '--disable-extensions']:
-            options.add_argument(arg)
-        options.add_argument(f'--user-agent={self.ua.random}')
+        async with browser_pool.checkout(user_agent=self.ua.random) as browser:
+            return await browser.run(self._render_page, url, params)
 
-        driver = None
-        try:
-            driver = uc.Chrome(options=options)
-            driver.set_page_load_timeout(30)
-            driver.get(url)
-            WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    def _render_page(self, driver, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Load ``url`` in a pooled browser tab and extract it; runs on a browser pool thread"""
+        driver.get(url)
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
 
-            if params.get('wait_for_element'):
-                try:
-                    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, params['wait_for_element'])))
-                except:
-                    pass
+        if params.get('wait_for_element'):
+            try:
+                WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, params['wait_for_element'])))
+            except:
+                pass
 
-            if params.get('scroll_page'):
-                driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                await asyncio.sleep(1.5)
+        if params.get('scroll_page'):
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(1.5)
 
-            soup = BeautifulSoup(driver.page_source, 'html.parser')
-            self._clean_html(soup)
-            return self._extract_common_content(url, soup, params)
-        finally:
-            if driver:
-                driver.quit()
+        soup = BeautifulSoup(driver.page_source, 'html.parser')
+        self._clean_html(soup)
+        return self._extract_common_content(url, soup, params)
 
     async def _scrape_with_trafilatura(self, url: str, params: Dict[str, Any]) -> Dict[str, Any]:
         downloaded = trafilatura.fetch_url(url)
@@ -129,37 +127,73 @@ class WebScraperService:
             'text': text or ''
         }
 
-    async def discover_urls(self, base_url: str, max_depth: int = 2, max_urls: int = 100) -> List[str]:
+    def crawler(self) -> AsyncCrawler:
+        """A crawler with the current crawl settings and a fresh User-Agent"""
+        headers = dict(self.session.headers)
+        headers['User-Agent'] = self.ua.random
+        return AsyncCrawler(
+            concurrency=self.max_concurrent_requests,
+            per_host=settings.CRAWL_PER_HOST,
+            host_delay=self.request_delay,
+            timeout=settings.CRAWL_TIMEOUT,
+            headers=headers
+        )
+
+    async def crawl(self, base_url: str, max_depth: int = 2, max_urls: int = 100) -> Dict[str, Any]:
+        """Discovered URLs plus crawl statistics (pages, errors, bytes, elapsed_s, pages_per_sec)"""
         print(f"[INFO] Discovering URLs from: {base_url}")
-        discovered, to_visit, visited = set(), [(base_url, 0)], set()
-        base_domain = urlparse(base_url).netloc
-
-        while to_visit and len(discovered) < max_urls:
-            current_url, depth = to_visit.pop(0)
-            if current_url in visited or depth > max_depth:
-                continue
-            visited.add(current_url)
+        result = await self.crawler().crawl(base_url, max_depth, max_urls)
+        print(f"[INFO] Discovered {len(result['urls'])} URLs from {base_url}: {result['stats']}")
+        return result
 
+    async def discover_urls(self, base_url: str, max_depth: int = 2, max_urls: int = 100) -> List[str]:
+        return (await self.crawl(base_url, max_depth, max_urls))['urls']
+
+    def extract_page(self, url: str, body: bytes, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Content of an already downloaded page: trafilatura first, then the BeautifulSoup extractor"""
+        # one parse for text and metadata; extract() plus extract_metadata() costs about three times as much
+        document = trafilatura.bare_extraction(body, include_comments=False, include_tables=True)
+        if document and document.get('text'):
+            return {
+                'method': 'trafilatura',
+                'content': {
+                    'title': document.get('title') or '',
+                    'author': document.get('author') or '',
+                    'date': document.get('date') or '',
+                    'text': document['text']
+                }
+            }
+        soup = BeautifulSoup(body, 'html.parser')
+        self._clean_html(soup)
+        return {'method': 'html', 'content': self._extract_common_content(url, soup, params)}
+
+    async def extract_fetched(self, url: str, content_type: str, body: bytes, params: Dict[str, Any],
+                              render_fallback: bool = False) -> Dict[str, Any]:
+        """Scrape result for a page that was already downloaded, shaped like scrape_url's.
+
+        Extraction runs in a thread. With ``render_fallback`` a page that yields
+        no text is retried in Selenium, the last method scrape_url tries.
+        """
+        content, method = {}, None
+        if content_type.lower().startswith(HTML_CONTENT_TYPES):
+            extracted = await asyncio.to_thread(self.extract_page, url, body, params)
+            content, method = extracted['content'], extracted['method']
+        if not content.get('text') and render_fallback:
             try:
-                self.session.headers['User-Agent'] = self.ua.random
-                resp = self.session.get(current_url, timeout=15)
-                resp.raise_for_status()
-                soup = BeautifulSoup(resp.content, 'html.parser')
-
-                for a in soup.find_all('a', href=True):
-                    href = urljoin(current_url, a['href'].strip())
-                    parsed = urlparse(href)
-                    if parsed.netloc == base_domain and not any(href.lower().endswith(ext) for ext in ['.pdf', '.jpg', '.png', '.gif', '.css', '.js']):
-                        if href not in discovered and href not in visited:
-                            discovered.add(href)
-                            if depth < max_depth:
-                                to_visit.append((href, depth + 1))
-
-                await asyncio.sleep(random.uniform(0.5, 1.2))
+                content, method = await self._scrape_with_selenium(url, params), 'selenium'
             except Exception as e:
-                print(f"[WARN] URL discovery failed at {current_url}: {e}")
+                print(f"[WARN] selenium failed for {url}: {e}")
+        if not content.get('text'):
+            return {'url': url, 'content': None, 'status': 'failed', 'error': 'No text extracted'}
 
-        return list(discovered)
+        await self._save_to_output_file(url, content, params.get('output_format', 'json'))
+        return {
+            'url': url,
+            'method': method,
+            'content': content,
+            'status': 'success',
+            'timestamp': datetime.now().isoformat()
+        }
 
     def _clean_html(self, soup: BeautifulSoup):
         for tag in ["script", "style", "nav", "footer", "header", "aside"]:
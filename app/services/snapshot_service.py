@@ -0,0 +1,156 @@
+from typing import Dict, Any, List, Iterator, Tuple
+from datetime import datetime
+import asyncio
+import gzip
+import json
+import os
+import re
+import numpy as np
+from app.core.config import settings
+from app.services.chroma_service import chroma_service, COLLECTION_NAME
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_DTYPES = ("float32", "float16")
+_SNAPSHOT_NAME_RE = re.compile(r"^snapshot_[0-9_]+$")
+
+
+class SnapshotService:
+    """Export and restore the vector store without touching an embedding provider.
+
+    A snapshot is a directory with a ``manifest.json`` and, per collection and
+    page, a compressed ``.npz`` block holding the embedding matrix plus a
+    gzipped JSON-lines table with ids, documents and metadata. Export pages over
+    a snapshot of each collection's ids, and both export and restore work one
+    page at a time, so memory stays bounded by the page size.
+    """
+
+    def __init__(self, backup_dir: str, page_size: int):
+        self.backup_dir = backup_dir
+        self.page_size = page_size
+
+    def _snapshot_path(self, name: str) -> str:
+        if not _SNAPSHOT_NAME_RE.match(name):
+            raise ValueError(f"Invalid snapshot name: {name}")
+        path = os.path.join(self.backup_dir, name)
+        if not os.path.isfile(os.path.join(path, "manifest.json")):
+            raise ValueError(f"Snapshot not found: {name}")
+        return path
+
+    def _collections(self) -> List[Any]:
+        return [
+            collection for collection in chroma_service.store.list_collections()
+            if collection.name.startswith(COLLECTION_NAME) and not (collection.metadata or {}).get('reembed_job')
+        ]
+
+    async def export_snapshot(self, dtype: str = "float32") -> Dict[str, Any]:
+        if dtype not in SNAPSHOT_DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+
+        name = f"snapshot_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}"
+        path = os.path.join(self.backup_dir, name)
+        os.makedirs(path)
+
+        manifest = {
+            'format_version': SNAPSHOT_FORMAT_VERSION,
+            'created_at': datetime.now().isoformat(),
+            'dtype': dtype,
+            'collections': []
+        }
+        total_bytes = 0
+        for collection_index, collection in enumerate(await asyncio.to_thread(self._collections)):
+            entry = {'name': collection.name, 'metadata': collection.metadata, 'count': 0, 'dimension': None, 'blocks': []}
+            block_index = 0
+            pages = chroma_service._snapshot_pages(collection, ['documents', 'metadatas', 'embeddings'], self.page_size)
+            async for page in pages:
+                stem = f"c{collection_index:03d}_b{block_index:06d}"
+                entry['dimension'], size = await asyncio.to_thread(self._write_block, path, stem, page, dtype)
+                entry['blocks'].append({'stem': stem, 'rows': len(page['ids'])})
+                entry['count'] += len(page['ids'])
+                total_bytes += size
+                block_index += 1
+            manifest['collections'].append(entry)
+
+        with open(os.path.join(path, "manifest.json"), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        print(f"Snapshot {name} written ({sum(c['count'] for c in manifest['collections'])} chunks, {total_bytes} bytes)")
+        return {
+            'snapshot': name,
+            'path': path,
+            'bytes': total_bytes,
+            'collections': [
+                {'name': c['name'], 'count': c['count'], 'dimension': c['dimension']} for c in manifest['collections']
+            ]
+        }
+
+    @staticmethod
+    def _write_block(path: str, stem: str, page: Dict[str, Any], dtype: str) -> Tuple[int, int]:
+        """Write one page as a block; returns (embedding dimension, bytes written)"""
+        embeddings = np.asarray(page['embeddings'], dtype=dtype)
+        np.savez_compressed(os.path.join(path, f"{stem}.npz"), embeddings=embeddings)
+        with gzip.open(os.path.join(path, f"{stem}.jsonl.gz"), 'wt', encoding='utf-8') as f:
+            for doc_id, document, metadata in zip(page['ids'], page['documents'], page['metadatas']):
+                f.write(json.dumps({'id': doc_id, 'document': document, 'metadata': metadata}) + "\n")
+        return int(embeddings.shape[1]), sum(os.path.getsize(os.path.join(path, f"{stem}{ext}")) for ext in (".npz", ".jsonl.gz"))
+
+    def _read_block(self, path: str, stem: str) -> Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]:
+        with np.load(os.path.join(path, f"{stem}.npz")) as block:
+            embeddings = block['embeddings'].astype(np.float32)
+        ids, documents, metadatas = [], [], []
+        with gzip.open(os.path.join(path, f"{stem}.jsonl.gz"), 'rt', encoding='utf-8') as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row['id'])
+                documents.append(row['document'])
+                metadatas.append(row['metadata'])
+        return ids, documents, metadatas, embeddings
+
+    def _blocks(self, path: str, entry: Dict[str, Any]) -> Iterator[Tuple]:
+        for block in entry['blocks']:
+            ids, documents, metadatas, embeddings = self._read_block(path, block['stem'])
+            yield ids, documents, metadatas, embeddings.tolist()
+
+    def restore_snapshot(self, name: str, replace: bool = True) -> Dict[str, Any]:
+        """Bulk-load a snapshot; ``replace`` empties each collection before loading it.
+
+        The load runs inside ChromaService.restore_collections, under its write
+        lock; callers make sure no re-embedding or ingest job is writing meanwhile.
+        """
+        path = self._snapshot_path(name)
+        with open(os.path.join(path, "manifest.json")) as f:
+            manifest = json.load(f)
+        if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format: {manifest.get('format_version')}")
+
+        chroma_service.restore_collections(
+            ((entry['name'], entry['metadata'], self._blocks(path, entry)) for entry in manifest['collections']),
+            replace
+        )
+        restored = [
+            {'name': entry['name'], 'count': entry['count'], 'dimension': entry['dimension']}
+            for entry in manifest['collections']
+        ]
+        print(f"Snapshot {name} restored ({sum(c['count'] for c in restored)} chunks)")
+        return {'snapshot': name, 'replace': replace, 'collections': restored}
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        snapshots = []
+        if not os.path.isdir(self.backup_dir):
+            return snapshots
+        for name in sorted(os.listdir(self.backup_dir), reverse=True):
+            manifest_path = os.path.join(self.backup_dir, name, "manifest.json")
+            if not _SNAPSHOT_NAME_RE.match(name) or not os.path.isfile(manifest_path):
+                continue
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            snapshots.append({
+                'snapshot': name,
+                'created_at': manifest['created_at'],
+                'dtype': manifest['dtype'],
+                'chunks': sum(c['count'] for c in manifest['collections']),
+                'collections': [c['name'] for c in manifest['collections']]
+            })
+        return snapshots
+
+
+snapshot_service = SnapshotService(settings.BACKUP_DIRECTORY, settings.SNAPSHOT_PAGE_SIZE)
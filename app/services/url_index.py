@@ -0,0 +1,76 @@
+from typing import List, Dict, Set, Optional
+import bisect
+import threading
+from urllib.parse import urlparse
+
+
+class UrlIndex:
+    """Secondary index from source URL to chunk ids.
+
+    URLs are kept in a sorted list so prefix lookups are a bisect plus a
+    contiguous scan, which Chroma's metadata filters cannot do natively.
+    """
+
+    def __init__(self):
+        self.url_to_ids: Dict[str, Set[str]] = {}
+        self.id_to_url: Dict[str, str] = {}
+        self.sorted_urls: List[str] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def domain_of(url: str) -> str:
+        return urlparse(url).netloc.lower() if url else ''
+
+    def __len__(self) -> int:
+        return len(self.id_to_url)
+
+    def add_many(self, doc_ids: List[str], urls: List[str]):
+        with self._lock:
+            for doc_id, url in zip(doc_ids, urls):
+                self._remove(doc_id)
+                if not url:
+                    continue
+                if url not in self.url_to_ids:
+                    self.url_to_ids[url] = set()
+                    bisect.insort(self.sorted_urls, url)
+                self.url_to_ids[url].add(doc_id)
+                self.id_to_url[doc_id] = url
+
+    def remove(self, doc_ids: List[str]):
+        with self._lock:
+            for doc_id in doc_ids:
+                self._remove(doc_id)
+
+    def _remove(self, doc_id: str):
+        url = self.id_to_url.pop(doc_id, None)
+        if url is None:
+            return
+        ids = self.url_to_ids.get(url)
+        if ids is not None:
+            ids.discard(doc_id)
+            if not ids:
+                del self.url_to_ids[url]
+                position = bisect.bisect_left(self.sorted_urls, url)
+                if position < len(self.sorted_urls) and self.sorted_urls[position] == url:
+                    del self.sorted_urls[position]
+
+    def clear(self):
+        with self._lock:
+            self.url_to_ids.clear()
+            self.id_to_url.clear()
+            self.sorted_urls.clear()
+
+    def urls_with_prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        with self._lock:
+            urls = []
+            position = bisect.bisect_left(self.sorted_urls, prefix)
+            while position < len(self.sorted_urls) and self.sorted_urls[position].startswith(prefix):
+                urls.append(self.sorted_urls[position])
+                if limit is not None and len(urls) >= limit:
+                    break
+                position += 1
+            return urls
+
+    def ids_for_urls(self, urls: List[str]) -> List[str]:
+        with self._lock:
+            return [doc_id for url in urls for doc_id in self.url_to_ids.get(url, ())]
@@ -0,0 +1,161 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Sequence
+import os
+from app.core.config import settings
+
+VECTOR_BACKENDS = ("chroma", "numpy")
+
+# Result dictionaries follow Chroma's shape: get() returns
+# {'ids', 'embeddings', 'documents', 'metadatas'} with one entry per record,
+# query() the same keys plus 'distances' with one list per query embedding.
+# Fields that were not included are None. Distances are squared L2.
+GET_INCLUDE = ("documents", "metadatas")
+QUERY_INCLUDE = ("documents", "metadatas", "distances")
+
+
+class VectorCollection(ABC):
+    """One named set of (id, embedding, document, metadata) records.
+
+    ``where`` filters use Chroma's metadata syntax: ``{key: value}``,
+    ``{key: {op: value}}`` with $eq, $ne, $gt, $gte, $lt, $lte, $in and $nin,
+    combined with ``{'$and': [...]}`` / ``{'$or': [...]}``.
+    """
+
+    name: str
+    id: Any
+    metadata: Optional[Dict[str, Any]]
+
+    @abstractmethod
+    def count(self) -> int:
+        ...
+
+    @abstractmethod
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Sequence[str] = GET_INCLUDE) -> Dict[str, Any]:
+        """Records by id and/or filter in insertion order; unknown ids are skipped"""
+
+    @abstractmethod
+    def query(self, query_embeddings: Sequence[Sequence[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None, include: Sequence[str] = QUERY_INCLUDE) -> Dict[str, Any]:
+        """Up to ``n_results`` nearest records per query embedding, nearest first"""
+
+    @abstractmethod
+    def upsert(self, ids: Sequence[str], embeddings: Sequence[Sequence[float]],
+               documents: Optional[Sequence[str]] = None,
+               metadatas: Optional[Sequence[Dict[str, Any]]] = None) -> None:
+        """Insert or replace records; vectors of another dimension raise an error"""
+
+    @abstractmethod
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        ...
+
+    @abstractmethod
+    def modify(self, name: Optional[str] = None, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Rename the collection and/or replace its metadata"""
+
+
+class VectorStore(ABC):
+    """Named vector collections; missing collections raise ValueError"""
+
+    @abstractmethod
+    def list_collections(self) -> List[VectorCollection]:
+        ...
+
+    @abstractmethod
+    def get_collection(self, name: str) -> VectorCollection:
+        ...
+
+    @abstractmethod
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> VectorCollection:
+        """Existing collection (its metadata replaced when given) or a new empty one"""
+
+    @abstractmethod
+    def delete_collection(self, name: str) -> None:
+        ...
+
+
+class ChromaCollection(VectorCollection):
+    def __init__(self, collection):
+        self._collection = collection
+
+    @property
+    def name(self) -> str:
+        return self._collection.name
+
+    @property
+    def id(self):
+        return self._collection.id
+
+    @property
+    def metadata(self) -> Optional[Dict[str, Any]]:
+        return self._collection.metadata
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include=GET_INCLUDE):
+        for attempt in range(3):
+            try:
+                return self._collection.get(ids=ids, where=where, limit=limit, offset=offset, include=list(include))
+            except IndexError:
+                # Chroma 0.4 can fail a get racing a delete of the same ids; the retry sees them gone
+                if attempt == 2:
+                    raise
+
+    def query(self, query_embeddings, n_results=10, where=None, include=QUERY_INCLUDE):
+        return self._collection.query(
+            query_embeddings=[list(e) for e in query_embeddings], n_results=n_results, where=where, include=list(include)
+        )
+
+    def upsert(self, ids, embeddings, documents=None, metadatas=None):
+        self._collection.upsert(ids=list(ids), embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def delete(self, ids=None, where=None):
+        # Chroma deletes everything when given neither; the interface refuses instead
+        if ids is None and where is None:
+            raise ValueError("Specify ids and/or where to delete")
+        self._collection.delete(ids=ids, where=where)
+
+    def modify(self, name=None, metadata=None):
+        self._collection.modify(name=name, metadata=metadata)
+
+
+class ChromaVectorStore(VectorStore):
+    """chromadb.PersistentClient behind the VectorStore interface"""
+
+    def __init__(self, path: str):
+        import chromadb
+        from chromadb.config import Settings as ChromaSettings
+
+        os.makedirs(path, exist_ok=True)
+        self._client = chromadb.PersistentClient(
+            path=path,
+            settings=ChromaSettings(
+                anonymized_telemetry=False,
+                allow_reset=True
+            )
+        )
+
+    def list_collections(self):
+        return [ChromaCollection(collection) for collection in self._client.list_collections()]
+
+    def get_collection(self, name):
+        return ChromaCollection(self._client.get_collection(name))
+
+    def get_or_create_collection(self, name, metadata=None):
+        return ChromaCollection(self._client.get_or_create_collection(name=name, metadata=metadata))
+
+    def delete_collection(self, name):
+        self._client.delete_collection(name)
+
+
+def create_vector_store(backend: Optional[str] = None) -> VectorStore:
+    """The vector store selected by VECTOR_BACKEND"""
+    backend = backend or settings.VECTOR_BACKEND
+    if backend == "chroma":
+        return ChromaVectorStore(settings.CHROMA_PERSIST_DIRECTORY)
+    if backend == "numpy":
+        from app.services.numpy_vector_store import NumpyVectorStore
+        return NumpyVectorStore(settings.VECTOR_STORE_DIRECTORY, settings.VECTOR_STORE_INDEX, settings.VECTOR_STORE_NPROBE)
+    raise ValueError(f"Unknown vector backend: {backend}")
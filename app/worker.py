@@ -0,0 +1,40 @@
+"""Standalone bulk-scrape job worker.
+
+Usage: python -m app.worker [--slots N] [--api-url URL]
+
+Runs jobs from the durable job queue (JOB_QUEUE_BACKEND) next to, or on
+other hosts than, the API. Set JOB_API_WORKER_SLOTS=0 on the API when all
+jobs should run here. The worker fetches and extracts pages and posts the
+documents to the API (JOB_API_URL), which embeds and stores them; it never
+opens the vector store itself. Stopping the worker returns its jobs to the
+queue.
+"""
+import argparse
+import asyncio
+import signal
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.core.config import settings  # noqa: E402
+from app.services.job_worker import job_worker  # noqa: E402
+
+
+async def main(slots: int, api_url: str):
+    # on SIGTERM hand running jobs back to the queue instead of waiting out their leases
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    try:
+        await job_worker.run_forever(slots, api_url)
+    except asyncio.CancelledError:
+        print("Job worker stopped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slots", type=int, default=1, help="jobs to run at once")
+    parser.add_argument("--api-url", default=settings.JOB_API_URL, help="API that stores the documents")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.slots, args.api_url))
+    except KeyboardInterrupt:
+        print("Job worker stopped")
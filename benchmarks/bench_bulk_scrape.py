@@ -0,0 +1,118 @@
+"""Compare two-pass and single-pass bulk scraping on a local fixture site.
+
+Usage: python benchmarks/bench_bulk_scrape.py [--pages 300] [--latency-ms 50] [--concurrency 8]
+
+Serves the generated site from bench_crawler.py and counts the requests and
+bytes the server sends. Two-pass is the discover-then-scrape flow: crawl
+for links, then download every discovered page again for extraction (at
+the same concurrency, without scrape_url's politeness sleeps or its
+trafilatura/requests/Selenium retries, so it is a lower bound). Single
+pass is IngestPipeline.run_crawl with storage off. Output files are left
+out of both.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_crawler import write_fixture_site  # noqa: E402
+from app.services.crawler import AsyncCrawler  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services.ingest_pipeline import IngestPipeline  # noqa: E402
+from app.services.scraper_service import scraper_service  # noqa: E402
+
+PARAMS = {'extract_text': True, 'extract_tables': True}
+
+
+async def serve(root: str, latency: float, traffic: dict) -> web.AppRunner:
+    @web.middleware
+    async def count(request, handler):
+        await asyncio.sleep(latency)
+        response = await handler(request)
+        traffic['requests'] += 1
+        traffic['bytes'] += response.content_length or 0
+        return response
+
+    async def page(request):
+        path = os.path.join(root, os.path.basename(request.path))
+        if not os.path.isfile(path):
+            raise web.HTTPNotFound()
+        with open(path, 'rb') as f:
+            return web.Response(body=f.read(), content_type='text/html')
+
+    app = web.Application(middlewares=[count])
+    app.router.add_get("/{name}", page)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+async def two_pass(base_url: str, args) -> int:
+    crawler = AsyncCrawler(concurrency=args.concurrency, per_host=args.concurrency)
+    urls = (await crawler.crawl(base_url, args.depth, args.pages))['urls']
+    slots = asyncio.Semaphore(args.concurrency)
+    scraped = 0
+
+    async def scrape(session: aiohttp.ClientSession, url: str):
+        nonlocal scraped
+        async with slots:
+            async with session.get(url) as resp:
+                body = await resp.read()
+            if (await asyncio.to_thread(scraper_service.extract_page, url, body, PARAMS))['content'].get('text'):
+                scraped += 1
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(scrape(session, url) for url in urls))
+    return scraped
+
+
+async def single_pass(base_url: str, args) -> int:
+    scraper_service.max_concurrent_requests = args.concurrency
+    scraper_service.request_delay = 0.0
+    settings.CRAWL_PER_HOST = args.concurrency
+    pipeline = IngestPipeline(PARAMS, {}, store=False)
+    await pipeline.run_crawl(base_url, args.depth, args.pages)
+    return pipeline.counts['pages_scraped']
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    async def no_output(*_):
+        pass
+
+    scraper_service._save_to_output_file = no_output
+    root = tempfile.mkdtemp(prefix="bench_bulk_scrape_")
+    write_fixture_site(root, args.pages)
+    traffic = {'requests': 0, 'bytes': 0}
+    runner = await serve(root, args.latency_ms / 1000, traffic)
+    base_url = f"http://127.0.0.1:{runner.addresses[0][1]}/page0.html"
+    print(f"{args.pages} pages, {args.latency_ms:.0f} ms per response, concurrency {args.concurrency}")
+    try:
+        for label, run in (("two-pass", two_pass), ("single-pass", single_pass)):
+            traffic.update(requests=0, bytes=0)
+            started = time.perf_counter()
+            scraped = await run(base_url, args)
+            elapsed = time.perf_counter() - started
+            print(f"  {label:>11}: {scraped:>4} pages extracted, {traffic['requests']:>4} requests, "
+                  f"{traffic['bytes'] / 2**20:6.2f} MB, {elapsed:6.2f} s")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
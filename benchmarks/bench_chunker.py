@@ -0,0 +1,76 @@
+"""Micro-benchmark for the structure-aware chunker.
+
+Usage: python benchmarks/bench_chunker.py [--mb 50]
+
+Streams a synthetic multi-section document through ``iter_chunks`` both as
+one in-memory string and as an iterable of 64KB pieces, and reports
+chunks/sec, MB/sec and the peak memory allocated by the chunker itself
+(the input string is allocated before tracing starts).
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chunker import iter_chunks  # noqa: E402
+
+
+def synthetic_pieces(total_bytes: int, piece_bytes: int = 64 * 1024):
+    """Yield markdown-ish text (headings, paragraphs, long run-on paragraphs) in pieces"""
+    buffer, produced, section = [], 0, 0
+    while produced < total_bytes:
+        section += 1
+        parts = [f"## Section {section}\n\n"]
+        for paragraph in range(6):
+            words = 40 if paragraph % 5 else 400
+            parts.append(" ".join(
+                f"Sentence {paragraph}.{i} of section {section} covers topic-{i % 17}." for i in range(words // 8)
+            ) + "\n\n")
+        text = "".join(parts)
+        buffer.append(text)
+        produced += len(text)
+        if sum(map(len, buffer)) >= piece_bytes:
+            yield "".join(buffer)
+            buffer = []
+    if buffer:
+        yield "".join(buffer)
+
+
+def run(label: str, make_source, size_mb: float):
+    started = time.perf_counter()
+    chunks = chars = 0
+    for chunk in iter_chunks(make_source()):
+        chunks += 1
+        chars += len(chunk)
+    elapsed = time.perf_counter() - started
+
+    # tracing slows allocation down considerably, so memory is measured in a separate pass
+    source = make_source()
+    tracemalloc.start()
+    for _ in iter_chunks(source):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{label:>8}: {chunks} chunks in {elapsed:.2f}s  "
+          f"{chunks / elapsed:,.0f} chunks/s  {size_mb / elapsed:.1f} MB/s  "
+          f"avg {chars // max(chunks, 1)} chars  peak {peak / 1024 / 1024:.2f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=50, help="size of the synthetic document")
+    args = parser.parse_args()
+    total = int(args.mb * 1024 * 1024)
+
+    run("stream", lambda: synthetic_pieces(total), args.mb)
+
+    text = "".join(synthetic_pieces(total))
+    run("string", lambda: text, len(text) / 1024 / 1024)
+
+
+if __name__ == "__main__":
+    main()
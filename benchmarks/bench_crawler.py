@@ -0,0 +1,85 @@
+"""Crawl a local fixture site and report pages/sec and wall time.
+
+Usage: python benchmarks/bench_crawler.py [--pages 300] [--latency-ms 50] [--depth 10]
+
+Writes a generated site (each page links to a handful of others, plus
+off-site, asset and fragment links the crawler must ignore) into a temp
+directory and serves it with aiohttp on 127.0.0.1, adding a fixed latency
+per response to stand in for a remote server. The same crawl then runs at
+several worker counts; concurrency 1 approximates the old serial BFS
+without its 0.5-1.2 s sleeps between pages.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.crawler import AsyncCrawler  # noqa: E402
+
+PARAGRAPH = ("Our support team answers billing, shipping and account questions. Refunds are issued to the "
+             "original payment method within five business days of the return arriving at the warehouse. ")
+
+
+def write_fixture_site(root: str, pages: int, links_per_page: int = 6):
+    rng = random.Random(0)
+    for i in range(pages):
+        # a spanning chain keeps every page reachable; the rest are random cross links
+        targets = {i + 1} if i + 1 < pages else set()
+        targets |= {rng.randrange(pages) for _ in range(links_per_page)}
+        links = "".join(f'<li><a href="/page{t}.html">Page {t}</a></li>' for t in sorted(targets))
+        extras = ('<a href="/page0.html#top">top</a><a href="https://example.org/">elsewhere</a>'
+                  '<a href="/static/manual.pdf">manual</a><a href="/static/site.css">css</a>')
+        body = "".join(f"<p>{PARAGRAPH * 3}</p>" for _ in range(8))
+        with open(os.path.join(root, f"page{i}.html"), "w") as f:
+            f.write(f"<html><head><title>Page {i}</title></head><body><nav><ul>{links}</ul>{extras}</nav>"
+                    f"<main><h1>Page {i}</h1>{body}</main></body></html>")
+
+
+async def serve(root: str, latency: float) -> web.AppRunner:
+    @web.middleware
+    async def slow(request, handler):
+        await asyncio.sleep(latency)
+        return await handler(request)
+
+    app = web.Application(middlewares=[slow])
+    app.router.add_static("/", root)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--depth", type=int, default=10)
+    parser.add_argument("--concurrency", default="1,4,8,16")
+    parser.add_argument("--per-host", type=int, default=16)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="bench_crawler_")
+    write_fixture_site(root, args.pages)
+    runner = await serve(root, args.latency_ms / 1000)
+    port = runner.addresses[0][1]
+    base_url = f"http://127.0.0.1:{port}/page0.html"
+    print(f"{args.pages} pages, {args.latency_ms:.0f} ms per response, max_depth {args.depth}")
+    try:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            crawler = AsyncCrawler(concurrency=concurrency, per_host=args.per_host)
+            result = await crawler.crawl(base_url, max_depth=args.depth, max_urls=args.pages)
+            stats = result['stats']
+            print(f"  concurrency {concurrency:>3}: {stats['discovered']:>4} urls, {stats['pages']:>4} pages, "
+                  f"{stats['errors']} errors, {stats['elapsed_s']:7.2f} s, {stats['pages_per_sec']:7.1f} pages/s")
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,133 @@
+"""Peak memory and throughput of bulk ingestion: collect-then-store vs the staged pipeline.
+
+Usage: python benchmarks/bench_ingest_pipeline.py [--pages 1500] [--paragraphs 40] [--latency-ms 20]
+
+Serves a generated fixture site (bench_crawler.py pages with longer bodies)
+on 127.0.0.1 and ingests it into a throwaway ChromaDB with the local
+hashing embedder. Each mode runs in its own subprocess so peak RSS is
+comparable:
+
+- collect: fetch and extract every page, keep the documents in a list
+  and call add_documents once at the end (the old bulk_scrape_task)
+- pipeline: IngestPipeline.run_urls, printing queue depths as it runs
+
+Run with different --pages to see collect's peak grow with the crawl while
+the pipeline's stays flat.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_site(root: str, pages: int, paragraphs: int):
+    from bench_crawler import PARAGRAPH, write_fixture_site
+    write_fixture_site(root, pages)
+    for i in range(pages):
+        path = os.path.join(root, f"page{i}.html")
+        with open(path) as f:
+            html = f.read()
+        # distinct text per page so nothing is skipped as unchanged
+        body = "".join(f"<p>Section {i}.{p}. {PARAGRAPH * 4}</p>" for p in range(paragraphs))
+        with open(path, "w") as f:
+            f.write(html.replace("</main>", body + "</main>"))
+
+
+async def run_mode(args):
+    workdir = tempfile.mkdtemp(prefix="bench_ingest_")
+    os.environ.update(
+        CHROMA_PERSIST_DIRECTORY=os.path.join(workdir, "chroma"),
+        EMBEDDING_CACHE_PATH=os.path.join(workdir, "embedding_cache.db"),
+        EMBEDDING_PROVIDER="local",
+        OLLAMA_BASE_URL="http://127.0.0.1:9"
+    )
+    from bench_bulk_scrape import serve
+    from app.services.chroma_service import chroma_service
+    from app.services.ingest_pipeline import IngestPipeline
+    from app.services.scraper_service import scraper_service
+
+    async def no_output(*_):
+        pass
+
+    scraper_service._save_to_output_file = no_output
+    scraper_service.request_delay = 0.0
+    await chroma_service.initialize()
+    traffic = {'requests': 0, 'bytes': 0}
+    runner = await serve(args.site, args.latency_ms / 1000, traffic)
+    base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    urls = [f"{base}/page{i}.html" for i in range(args.pages)]
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    params = {'extract_text': True, 'extract_tables': True}
+    started = time.perf_counter()
+
+    if args.mode == "collect":
+        documents = []
+
+        async def collect(url, depth, content_type, body):
+            result = await scraper_service.extract_fetched(url, content_type, body, params)
+            if result['status'] == 'success':
+                documents.append({'url': url, 'content': result['content']['text'], 'format': 'json'})
+
+        await scraper_service.crawler().fetch_urls(urls, collect)
+        chunks = len(await chroma_service.add_documents(documents))
+        pages = len(documents)
+    else:
+        pipeline = IngestPipeline(params, {'format': 'json'})
+        job = asyncio.create_task(pipeline.run_urls(urls))
+        while not job.done():
+            await asyncio.sleep(args.report_every)
+            depths = "  ".join(f"{s['stage']} {s['queue_depth']}/{s['queue_capacity']}"
+                               for s in pipeline.snapshot()['stages'][1:])
+            print(f"    t={time.perf_counter() - started:5.1f}s  {depths}", flush=True)
+        chunks = pipeline.counts['chunks_stored']
+        pages = pipeline.counts['pages_scraped']
+        for stage in pipeline.snapshot()['stages']:
+            print(f"    {stage['stage']:>8}: {stage['items_per_sec']:8.1f} items/s", flush=True)
+
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"RESULT {args.mode} {pages} {chunks} {elapsed:.2f} {(peak - baseline) / 1024:.1f}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=1500)
+    parser.add_argument("--paragraphs", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between queue depth lines")
+    parser.add_argument("--mode", choices=["collect", "pipeline"])
+    parser.add_argument("--site")
+    args = parser.parse_args()
+
+    if args.mode:
+        asyncio.run(run_mode(args))
+        return
+
+    site = tempfile.mkdtemp(prefix="bench_ingest_site_")
+    write_site(site, args.pages, args.paragraphs)
+    size = sum(os.path.getsize(os.path.join(site, name)) for name in os.listdir(site))
+    print(f"{args.pages} pages ({size / 2**20:.1f} MB of HTML), {args.latency_ms:.0f} ms per response")
+    for mode in ("collect", "pipeline"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--site", site, "--pages", str(args.pages),
+             "--latency-ms", str(args.latency_ms), "--report-every", str(args.report_every)],
+            capture_output=True, text=True
+        ).stdout
+        for line in output.splitlines():
+            if line.startswith("    "):
+                print(line)
+            elif line.startswith("RESULT"):
+                _, _, pages, chunks, elapsed, rss = line.split()
+                print(f"  {mode:>8}: {pages} pages, {chunks} chunks, {elapsed} s, peak RSS +{rss} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Load test for concurrent searches with and without micro-batching.
+
+Usage: python benchmarks/bench_search_concurrency.py [--clients 100] [--requests 10] [--docs 2000]
+
+Runs against a throwaway ChromaDB directory with a stub embedding provider
+that costs a fixed round trip per call plus a small per-text cost, which is
+the shape of a remote embedding API. Every client issues its searches back
+to back; a fraction of the queries repeat so single-flight sharing shows up
+as well. The same workload runs with SEARCH_BATCH_WINDOW_MS at 0 (batching
+off) and at the configured window, and reports QPS, latency percentiles and
+the average batch sizes.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_workdir = tempfile.mkdtemp(prefix="bench_search_")
+os.environ.update(
+    CHROMA_PERSIST_DIRECTORY=os.path.join(_workdir, "chroma"),
+    EMBEDDING_CACHE_PATH=os.path.join(_workdir, "embedding_cache.db"),
+    EMBEDDING_PROVIDER="local"
+)
+
+from app.services.ai_service import ai_service  # noqa: E402
+from app.services.chroma_service import chroma_service  # noqa: E402
+from app.services.micro_batcher import MicroBatcher, SingleFlight  # noqa: E402
+
+WORDS = ("policy invoice refund shipping account password security billing contract renewal "
+         "warranty support onboarding export region storage latency backup audit").split()
+
+
+def stub_embedder(round_trip_ms: float, per_text_ms: float):
+    async def embed_texts(texts):
+        await asyncio.sleep((round_trip_ms + per_text_ms * len(texts)) / 1000)
+        return ai_service.local_embedder.provider, ai_service.local_embedder.model, ai_service.local_embedder.embed(texts)
+    return embed_texts
+
+
+async def seed(docs: int):
+    rng = random.Random(7)
+    await chroma_service.initialize()
+    documents = [{
+        'content': " ".join(rng.choice(WORDS) for _ in range(80)),
+        'url': f"https://bench.local/doc/{i}",
+        'source': 'benchmark'
+    } for i in range(docs)]
+    for start in range(0, docs, 500):
+        await chroma_service.ingest_documents(documents[start:start + 500])
+
+
+async def run(label: str, window_ms: float, clients: int, requests: int, repeat_ratio: float):
+    chroma_service._embed_batcher = MicroBatcher(chroma_service._embed_batch, window_ms, 64)
+    chroma_service._query_batcher = MicroBatcher(chroma_service._query_batch, window_ms, 64)
+    chroma_service._search_flight = SingleFlight()
+    rng = random.Random(11)
+    popular = [" ".join(rng.choice(WORDS) for _ in range(4)) for _ in range(5)]
+    latencies = []
+
+    async def client(client_id: int):
+        local_rng = random.Random(client_id)
+        for _ in range(requests):
+            if local_rng.random() < repeat_ratio:
+                query = local_rng.choice(popular)
+            else:
+                query = " ".join(local_rng.choice(WORDS) for _ in range(4)) + f" q{local_rng.random()}"
+            started = time.perf_counter()
+            await chroma_service.search_documents(query, n_results=5)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    stats = chroma_service.batching_stats()
+    return (f"{label:>14}: {len(latencies) / elapsed:7.1f} QPS  "
+            f"p50 {statistics.median(latencies):6.1f} ms  p95 {latencies[int(len(latencies) * 0.95)]:6.1f} ms  "
+            f"embed batch {stats['embedding']['avg_batch_size']:5.2f}  "
+            f"query batch {stats['vector_query']['avg_batch_size']:5.2f}  shared {stats['shared_searches']}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=10, help="searches per client")
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--round-trip-ms", type=float, default=20, help="stub provider latency per call")
+    parser.add_argument("--per-text-ms", type=float, default=0.2, help="stub provider latency per text")
+    parser.add_argument("--repeat-ratio", type=float, default=0.2, help="share of queries drawn from a few popular ones")
+    args = parser.parse_args()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        await seed(args.docs)
+    ai_service.embed_texts = stub_embedder(args.round_trip_ms, args.per_text_ms)
+    print(f"{args.clients} clients x {args.requests} searches over {args.docs} documents, "
+          f"stub provider {args.round_trip_ms:g}ms + {args.per_text_ms:g}ms/text")
+
+    for label, window in (("unbatched", 0), (f"batched {args.window_ms:g}ms", args.window_ms)):
+        # the services log every search; keep only the summary lines
+        with contextlib.redirect_stdout(io.StringIO()):
+            summary = await run(label, window, args.clients, args.requests, args.repeat_ratio)
+        print(summary)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,118 @@
+"""Benchmark every VectorStore backend on the same workload.
+
+Usage: python benchmarks/bench_vector_store.py [--chunks 50000] [--dim 384] [--queries 200]
+
+For each backend (Chroma, NumPy exact, NumPy IVF) in a throwaway directory:
+time to open the store, upsert throughput, single-query latency p50/p99
+unfiltered, with a broad filter (half the records) and with a selective one
+(1%), recall@10 against brute force, delete throughput and size on disk.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.numpy_vector_store import NumpyVectorStore  # noqa: E402
+from app.services.vector_store import ChromaVectorStore  # noqa: E402
+
+BACKENDS = {
+    'chroma': lambda path: ChromaVectorStore(path),
+    'numpy-exact': lambda path: NumpyVectorStore(path, "exact"),
+    'numpy-ivf': lambda path: NumpyVectorStore(path, "ivf", nprobe=16),
+}
+BATCH = 1000
+
+
+def dataset(chunks: int, dim: int, queries: int):
+    rng = np.random.default_rng(0)
+    centroids = rng.standard_normal((max(chunks // 500, 16), dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, len(centroids), chunks)]
+    vectors += 0.6 * rng.standard_normal(vectors.shape).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    picks = rng.integers(0, chunks, queries)
+    probes = vectors[picks] + 0.05 * rng.standard_normal((queries, dim)).astype(np.float32)
+    return vectors, probes
+
+
+def percentiles(latencies):
+    latencies = sorted(latencies)
+    return latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def disk_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total / 2**20
+
+
+def bench(backend: str, vectors: np.ndarray, probes: np.ndarray, truth, k: int):
+    path = tempfile.mkdtemp(prefix=f"bench_store_{backend}_")
+    try:
+        started = time.perf_counter()
+        store = BACKENDS[backend](path)
+        open_ms = (time.perf_counter() - started) * 1000
+        collection = store.get_or_create_collection("benchmark")
+
+        started = time.perf_counter()
+        for start in range(0, len(vectors), BATCH):
+            end = min(start + BATCH, len(vectors))
+            collection.upsert(
+                ids=[f"c{i}" for i in range(start, end)],
+                embeddings=vectors[start:end].tolist(),
+                documents=[f"chunk {i}" for i in range(start, end)],
+                metadatas=[{'parity': i % 2, 'bucket': i % 100} for i in range(start, end)]
+            )
+        upsert_rate = len(vectors) / (time.perf_counter() - started)
+
+        lines = [f"{backend:>12}: open {open_ms:6.0f} ms  upsert {upsert_rate:8,.0f}/s  disk {disk_mb(path):6.0f} MB"]
+        for label, where in (("unfiltered", None), ("half filter", {'parity': 1}), ("1% filter", {'bucket': 7})):
+            latencies, hits = [], []
+            for probe in probes:
+                started = time.perf_counter()
+                result = collection.query([probe.tolist()], n_results=k, where=where, include=['distances'])
+                latencies.append((time.perf_counter() - started) * 1000)
+                hits.append(result['ids'][0])
+            p50, p99 = percentiles(latencies)
+            line = f"{'':>14}{label:>12}: p50 {p50:7.2f} ms  p99 {p99:7.2f} ms"
+            if where is None:
+                recall = np.mean([len(set(h) & {f"c{i}" for i in t}) / k for h, t in zip(hits, truth)])
+                line += f"  recall@{k} {recall:.3f}"
+            lines.append(line)
+
+        doomed = [f"c{i}" for i in range(0, len(vectors), 100)]
+        started = time.perf_counter()
+        for start in range(0, len(doomed), BATCH):
+            collection.delete(ids=doomed[start:start + BATCH])
+        lines.append(f"{'':>14}{'delete':>12}: {len(doomed) / (time.perf_counter() - started):8,.0f}/s "
+                     f"(count now {collection.count()})")
+        return "\n".join(lines)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    args = parser.parse_args()
+
+    vectors, probes = dataset(args.chunks, args.dim, args.queries)
+    norms = np.einsum('ij,ij->i', vectors, vectors)
+    truth = [np.argsort(norms - 2 * vectors @ probe)[:args.k] for probe in probes]
+    print(f"{args.chunks} x {args.dim} vectors, {args.queries} queries, k={args.k}")
+    for backend in args.backends.split(","):
+        print(bench(backend, vectors, probes, truth, args.k), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Footprint and latency of the quantized vector tier at a million chunks.
+
+Usage: python benchmarks/bench_vector_tier.py [--chunks 1000000] [--dim 384] [--queries 200]
+
+Writes clustered synthetic embeddings to a float32 memmap (standing in for
+the full-precision vectors Chroma keeps), builds int8 and float16
+QuantizedIndex tiers from it, and compares per-query latency (p50/p99) and
+recall@k of the two-stage search against an exact float32 scan. Reports the
+on-disk size of each tier and the process's peak resident memory.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.quantized_index import QuantizedIndex  # noqa: E402
+
+BLOCK = 50_000
+
+
+def peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def generate(path: str, chunks: int, dim: int, seed: int = 0):
+    """Clustered unit vectors, so nearest neighbours are meaningful"""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((max(chunks // 1000, 16), dim)).astype(np.float32)
+    full = np.memmap(path, dtype=np.float32, mode='w+', shape=(chunks, dim))
+    norms = np.empty(chunks, dtype=np.float32)
+    for start in range(0, chunks, BLOCK):
+        end = min(start + BLOCK, chunks)
+        block = centroids[rng.integers(0, len(centroids), end - start)]
+        block += 0.6 * rng.standard_normal(block.shape).astype(np.float32)
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+        full[start:end] = block
+        norms[start:end] = np.einsum('ij,ij->i', block, block)
+    full.flush()
+    return full, norms
+
+
+def exact_search(full, norms, query, k: int):
+    distances = np.empty(len(full), dtype=np.float32)
+    query_norm = float(query @ query)
+    for start in range(0, len(full), 65536):
+        block = full[start:start + 65536]
+        distances[start:start + len(block)] = norms[start:start + len(block)] - 2 * (block @ query) + query_norm
+    top = np.argpartition(distances, k)[:k]
+    return top[np.argsort(distances[top])]
+
+
+def timed(fn, queries):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append(fn(query))
+        latencies.append((time.perf_counter() - started) * 1000)
+    latencies.sort()
+    return results, latencies[len(latencies) // 2], latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--float16-queries", type=int, default=50, help="float16 decoding is slow in NumPy")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--oversample", type=int, default=4)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_vector_tier_")
+    try:
+        started = time.perf_counter()
+        full, norms = generate(os.path.join(workdir, "full.f32"), args.chunks, args.dim)
+        print(f"generated {args.chunks} x {args.dim} float32 vectors in {time.perf_counter() - started:.1f}s "
+              f"({full.nbytes / 2**20:.0f} MB)")
+
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, args.chunks, args.queries)
+        queries = full[picks] + 0.05 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+        def fetch_full(ids):
+            rows = np.array([int(doc_id) for doc_id in ids], dtype=np.int64)
+            return dict(zip(ids, full[rows]))
+
+        truth, p50, p99 = timed(lambda q: exact_search(full, norms, q, args.k), queries)
+        print(f"{'float32 exact':>16}: {full.nbytes / 2**20:7.0f} MB  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  recall 1.000")
+
+        for dtype, count in (("int8", args.queries), ("float16", args.float16_queries)):
+            started = time.perf_counter()
+            index = QuantizedIndex.create(os.path.join(workdir, dtype), args.dim, dtype)
+            for start in range(0, args.chunks, BLOCK):
+                end = min(start + BLOCK, args.chunks)
+                index.upsert([str(row) for row in range(start, end)], full[start:end])
+            index._rows = None  # searches do not need the id map; drop it as a restarted process would
+            build_seconds = time.perf_counter() - started
+
+            results, p50, p99 = timed(
+                lambda q: index.search(q, args.k, args.oversample, fetch_full)[0], queries[:count]
+            )
+            recall = np.mean([
+                len({int(doc_id) for doc_id, _, _ in hits} & set(expected.tolist())) / args.k
+                for hits, expected in zip(results, truth[:count])
+            ])
+            print(f"{dtype + ' two-stage':>16}: {index.nbytes() / 2**20:7.0f} MB  p50 {p50:7.1f} ms  "
+                  f"p99 {p99:7.1f} ms  recall {recall:.3f}  (built in {build_seconds:.1f}s)")
+            del index
+            shutil.rmtree(os.path.join(workdir, dtype))
+
+        print(f"peak RSS {peak_rss_mb():.0f} MB")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import os
+import tempfile
+
+# the app opens its stores at import time; point them at a scratch directory, never the working tree
+_ROOT = tempfile.mkdtemp(prefix="ragbot-tests-")
+os.environ.update(
+    CHROMA_PERSIST_DIRECTORY=os.path.join(_ROOT, "chroma_db"),
+    VECTOR_STORE_DIRECTORY=os.path.join(_ROOT, "vector_store"),
+    VECTOR_TIER_DIRECTORY=os.path.join(_ROOT, "vector_tier"),
+    EMBEDDING_CACHE_PATH=os.path.join(_ROOT, "embedding_cache", "embeddings.db"),
+    REEMBED_CHECKPOINT_PATH=os.path.join(_ROOT, "embedding_cache", "reembed_job.json"),
+    BACKUP_DIRECTORY=os.path.join(_ROOT, "backups"),
+    JOB_QUEUE_PATH=os.path.join(_ROOT, "jobs", "jobs.db"),
+    EMBEDDING_PROVIDER="local",
+    OLLAMA_BASE_URL="http://127.0.0.1:9"
+)
+for key in ("OPENROUTER_API_KEY", "VOYAGE_API_KEY"):
+    os.environ.pop(key, None)
@@ -0,0 +1,75 @@
+import asyncio
+import time
+from types import SimpleNamespace
+import pytest
+from app.services.ai_service import ai_service
+
+DELAY = 0.2
+QUERIES = 20
+
+
+class StubOllama:
+    """ollama.AsyncClient stand-in whose calls take a fixed time without blocking the loop"""
+
+    async def chat(self, model, messages, **kwargs):
+        await asyncio.sleep(DELAY)
+        return {'message': {'content': f"**answer** to {messages[-1]['content'][-12:]}"}, 'prompt_eval_count': 1}
+
+
+class StubOpenAI:
+    """openai.AsyncOpenAI stand-in with the chat and embeddings endpoints"""
+
+    def __init__(self):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+        self.embeddings = SimpleNamespace(create=self._embed)
+
+    async def _complete(self, model, messages, **kwargs):
+        await asyncio.sleep(DELAY)
+        message = SimpleNamespace(content="*answer*")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    async def _embed(self, input, model):
+        await asyncio.sleep(DELAY)
+        return SimpleNamespace(data=[SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)])
+
+
+async def timed_gather(make_call):
+    started = time.perf_counter()
+    results = await asyncio.gather(*(make_call(i) for i in range(QUERIES)))
+    return results, time.perf_counter() - started
+
+
+@pytest.fixture
+def stub_clients(monkeypatch):
+    monkeypatch.setattr(ai_service, 'ollama_client', None)
+    monkeypatch.setattr(ai_service, 'openrouter_client', None)
+    monkeypatch.setattr(ai_service, 'voyage_client', None)
+    return monkeypatch
+
+
+def test_ollama_generations_overlap(stub_clients):
+    stub_clients.setattr(ai_service, 'ollama_client', StubOllama())
+    results, elapsed = asyncio.run(timed_gather(
+        lambda i: ai_service.generate_response(f"question {i}", [f"context {i}"])
+    ))
+    assert all(result.startswith("answer to") for result in results)
+    # serial calls would take QUERIES * DELAY
+    assert elapsed < DELAY * 3
+
+
+def test_openrouter_generations_overlap(stub_clients):
+    stub_clients.setattr(ai_service, 'openrouter_client', StubOpenAI())
+    results, elapsed = asyncio.run(timed_gather(
+        lambda i: ai_service.generate_response(f"question {i}", [f"context {i}"])
+    ))
+    assert results == ["answer"] * QUERIES
+    assert elapsed < DELAY * 3
+
+
+def test_openrouter_embeddings_overlap(stub_clients):
+    stub_clients.setattr(ai_service, 'openrouter_client', StubOpenAI())
+    results, elapsed = asyncio.run(timed_gather(
+        lambda i: ai_service._embed_with_openrouter(["x" * (i + 1)], "text-embedding-ada-002")
+    ))
+    assert results == [[[float(i + 1)]] for i in range(QUERIES)]
+    assert elapsed < DELAY * 3
@@ -0,0 +1,43 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.ai_service import ai_service
+
+CONTEXT = ["weak match about shipping", "best match about invoices", "other match about refunds"]
+SCORES = [0.2, 0.9, 0.5]
+
+
+@pytest.fixture
+def no_providers(monkeypatch):
+    monkeypatch.setattr(ai_service, 'ollama_client', None)
+    monkeypatch.setattr(ai_service, 'openrouter_client', None)
+    return monkeypatch
+
+
+async def collect(stream):
+    return "".join([part async for part in stream])
+
+
+def test_fallback_quotes_the_best_chunks_first(no_providers):
+    usage = {}
+    answer = asyncio.run(ai_service.generate_response("invoices?", CONTEXT, SCORES, usage))
+    quoted = answer.split("\n\n", 1)[1]
+    assert quoted.startswith("best match about invoices")
+    assert quoted.index("refunds") < quoted.index("shipping")
+    assert usage['provider'] == "none"
+
+
+def test_fallback_stays_within_the_prompt_budget(no_providers):
+    overhead = ai_service._pack("invoices?", [], None, 10 ** 6)[1]['prompt_tokens']
+    no_providers.setattr(settings, 'OPENROUTER_PROMPT_TOKEN_BUDGET', overhead + 6)
+    usage = {}
+    answer = asyncio.run(ai_service.generate_response("invoices?", CONTEXT, SCORES, usage))
+    assert "best match about invoices" in answer
+    assert "shipping" not in answer and "refunds" not in answer
+    assert usage['prompt_tokens'] <= usage['prompt_budget']
+
+
+def test_streamed_fallback_matches_the_generated_one(no_providers):
+    generated = asyncio.run(ai_service.generate_response("invoices?", CONTEXT, SCORES))
+    streamed = asyncio.run(collect(ai_service.stream_response("invoices?", CONTEXT, SCORES)))
+    assert streamed == generated
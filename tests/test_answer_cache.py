@@ -0,0 +1,53 @@
+import asyncio
+import numpy as np
+from app.api.routes import rag
+from app.api.routes.rag import QueryRequest, query_rag
+from app.core.config import settings
+from app.services.answer_cache import AnswerCache
+
+DIMENSION = 8
+
+
+def unit(seed):
+    vector = np.random.default_rng(seed).standard_normal(DIMENSION)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+def test_lookups_stay_correct_across_growth_and_eviction():
+    cache = AnswerCache(max_entries=50, max_bytes=10 ** 9, threshold=0.999)
+    for seed in range(200):
+        cache.store('scope', unit(seed), 1, {'answer': seed})
+    assert len(cache.entries) == 50
+    assert len(cache.scopes['scope'].keys) == 50
+    # the 150 oldest were evicted; the 50 newest are still found by their own vectors
+    assert cache.lookup('scope', unit(10), 1) is None
+    for seed in range(150, 200):
+        assert cache.lookup('scope', unit(seed), 1)['answer'] == seed
+
+
+def test_generation_change_drops_the_cache():
+    cache = AnswerCache(max_entries=10, max_bytes=10 ** 9, threshold=0.99)
+    cache.store('scope', unit(1), 1, {'answer': 1})
+    assert cache.lookup('scope', unit(1), 2) is None
+    assert cache.stats()['invalidations'] == 1
+
+
+def test_query_is_embedded_once_for_cache_and_retrieval(monkeypatch):
+    calls, searched = [], []
+
+    async def embed_texts(texts):
+        calls.append(texts)
+        return 'local', 'm', [unit(7) for _ in texts]
+
+    async def search_with_timings(query, n_results, mode, filters, rerank, fetch_k, embedded=None):
+        searched.append(embedded)
+        return [], {}
+
+    monkeypatch.setattr(settings, 'ANSWER_CACHE_ENABLED', True)
+    monkeypatch.setattr(rag.ai_service, 'embed_texts', embed_texts)
+    monkeypatch.setattr(rag.chroma_service, 'search_with_timings', search_with_timings)
+
+    response = asyncio.run(query_rag(QueryRequest(query="where is the invoice?", use_cache=True)))
+    assert response['cache_hit'] is False
+    assert len(calls) == 1
+    assert searched == [('local', 'm', unit(7))]
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from app.services.chroma_service import ChromaService
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.vector_store import ChromaVectorStore
+
+BACKENDS = {
+    'chroma': ChromaVectorStore,
+    'numpy': lambda path: NumpyVectorStore(path, "exact"),
+}
+
+DOCUMENTS = [
+    {'url': 'https://docs.example.com/install', 'title': 'Install', 'source': 'web_scraping',
+     'content': 'Install the agent with pip and start it with the systemd unit file.'},
+    {'url': 'https://docs.example.com/billing', 'title': 'Billing', 'source': 'web_scraping',
+     'content': 'Invoices are issued monthly and can be paid by card or bank transfer.'},
+    {'url': 'https://blog.example.com/launch', 'title': 'Launch', 'source': 'upload',
+     'content': 'We launched the new dashboard with saved searches and alerts.'},
+]
+
+
+@pytest.fixture(params=list(BACKENDS))
+def service(request, tmp_path):
+    service = ChromaService()
+    service.store = BACKENDS[request.param](str(tmp_path))
+    service.load_namespaces()
+    return service
+
+
+def test_ingest_search_delete(service):
+    async def scenario():
+        result = await service.ingest_documents(DOCUMENTS)
+        assert result['upserted'] == len(result['ids']) == 3
+        again = await service.ingest_documents(DOCUMENTS)
+        assert (again['upserted'], again['unchanged']) == (0, 3)
+
+        stats = await service.get_collection_stats()
+        assert stats['document_count'] == 3 and len(stats['namespaces']) == 1
+
+        for mode in ("vector", "lexical", "hybrid"):
+            hits = await service.search_documents("invoices paid by bank transfer", n_results=3, mode=mode)
+            assert hits and all(hit['metadata']['url'] for hit in hits)
+        hits = await service.search_documents("invoices paid by card", n_results=1, mode="lexical")
+        assert hits[0]['metadata']['url'] == 'https://docs.example.com/billing'
+
+        deleted = await service.delete_documents(url_prefix='https://docs.example.com/')
+        assert deleted['deleted'] == 2
+        deleted = await service.delete_documents(source='upload')
+        assert deleted['deleted'] == 1
+        assert (await service.get_collection_stats())['document_count'] == 0
+
+    asyncio.run(scenario())
+
+
+def test_store_embedded_reports_the_backend_neutrally(service, capsys):
+    service.store_embedded("local", "hashing", ["x"], ["text"], [{'url': 'u'}], [[0.5, 0.5]])
+    assert "Created vector store namespace" in capsys.readouterr().out
+    assert service.namespaces[next(iter(service.namespaces))]['dimension'] == 2
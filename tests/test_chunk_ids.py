@@ -0,0 +1,28 @@
+from app.services.chroma_service import chroma_service
+
+
+def records(doc):
+    return list(chroma_service.chunk_records(doc))
+
+
+def test_url_less_documents_sharing_text_get_distinct_ids():
+    shared = "The same paragraph pasted into two different uploads."
+    first = records({'content': shared, 'source': 'manual_upload'})
+    second = records({'content': shared, 'source': 'ticket_import'})
+    assert first[0][0] != second[0][0]
+    # the content hash still matches, so change detection can skip re-embedding
+    assert first[0][2]['content_hash'] == second[0][2]['content_hash']
+
+
+def test_url_ids_follow_position_not_content():
+    before = records({'content': "old text", 'url': 'https://example.com/a'})
+    after = records({'content': "new text", 'url': 'https://example.com/a'})
+    assert before[0][0] == after[0][0]
+    assert before[0][2]['content_hash'] != after[0][2]['content_hash']
+    assert before[0][0] != records({'content': "old text", 'url': 'https://example.com/b'})[0][0]
+
+
+def test_uploads_are_keyed_by_file_url():
+    doc = {'content': "report body", 'url': 'file://report.txt', 'source': 'file_upload'}
+    assert records(doc)[0][0] == chroma_service.make_chunk_id('file://report.txt', 0)
+    assert records(dict(doc))[0][0] == records(doc)[0][0]
@@ -0,0 +1,63 @@
+import asyncio
+from app.services.chroma_service import ChromaService
+from app.services.chunker import iter_chunks
+from app.services.context_packer import estimate_tokens
+from app.services.numpy_vector_store import NumpyVectorStore
+
+
+def paragraphs(count):
+    return [f"Paragraph {i} describes step {i} of the rollout. It lists the checks to run before step {i + 1}."
+            for i in range(count)]
+
+
+def test_long_documents_are_chunked_in_full_on_word_boundaries():
+    text = "\n\n".join(paragraphs(400))
+    assert len(text) > 8000
+    chunks = list(iter_chunks(text, target_tokens=120, overlap_tokens=20, max_tokens=160))
+    assert len(chunks) > 10
+    assert all(estimate_tokens(chunk) <= 160 + 5 for chunk in chunks)
+    joined = "\n\n".join(chunks)
+    assert all(paragraph in joined for paragraph in paragraphs(400))
+    words = set(text.split())
+    assert all(word in words for chunk in chunks for word in chunk.split())
+
+
+def test_headings_start_a_chunk_without_the_previous_tail():
+    text = "# Install\n\n" + "\n\n".join(paragraphs(3)) + "\n\n# Upgrade\n\nRun the upgrade script."
+    chunks = list(iter_chunks(text, target_tokens=1000, overlap_tokens=40))
+    assert [chunk.split("\n\n")[0] for chunk in chunks] == ["# Install", "# Upgrade"]
+    assert chunks[1] == "# Upgrade\n\nRun the upgrade script."
+
+
+def test_pieces_are_consumed_lazily():
+    consumed = []
+
+    def pieces():
+        for i, paragraph in enumerate(paragraphs(200)):
+            consumed.append(i)
+            yield paragraph + "\n\n"
+
+    chunks = iter_chunks(pieces(), target_tokens=60, overlap_tokens=0)
+    next(chunks)
+    assert len(consumed) < 20
+
+
+def test_reingesting_embeds_only_changed_chunks_and_drops_stale_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr('app.core.config.settings.CHUNK_TARGET_TOKENS', 60)
+    service = ChromaService()
+    service.store = NumpyVectorStore(str(tmp_path), "exact")
+    service.load_namespaces()
+    doc = {'url': 'https://docs.example.com/rollout', 'title': 'Rollout', 'content': "\n\n".join(paragraphs(12))}
+
+    first = asyncio.run(service.ingest_documents([doc]))
+    assert first['upserted'] == len(first['ids']) > 3
+
+    edited = paragraphs(12)
+    edited[-1] = "The final step was rewritten."
+    second = asyncio.run(service.ingest_documents([dict(doc, content="\n\n".join(edited))]))
+    assert second['upserted'] == 1 and second['unchanged'] == len(second['ids']) - 1
+
+    shorter = asyncio.run(service.ingest_documents([dict(doc, content="\n\n".join(paragraphs(3)))]))
+    assert shorter['stale_removed'] == len(second['ids']) - len(shorter['ids'])
+    (collection,) = service.collections.values()
+    assert collection.count() == len(shorter['ids'])
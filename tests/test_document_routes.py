@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.api.routes import rag
+from app.services.chroma_service import chroma_service
+from app.services.numpy_vector_store import NumpyVectorStore
+
+DOCUMENTS = [
+    {'url': 'https://docs.example.com/a', 'source': 'widget_bulk_scrape', 'content': 'Alpha page about agents.'},
+    {'url': 'https://docs.example.com/b', 'source': 'widget_bulk_scrape', 'content': 'Beta page about billing.'},
+    {'url': 'https://blog.example.com/c', 'source': 'widget_bulk_scrape', 'content': 'Gamma post about launches.'},
+    {'url': 'https://blog.example.com/d', 'source': 'manual_upload', 'content': 'Delta post about pricing.'},
+    {'url': 'file://notes.txt', 'source': 'widget_upload', 'content': 'Uploaded notes on onboarding.'},
+]
+
+
+@pytest.fixture
+def stored(monkeypatch, tmp_path):
+    monkeypatch.setattr(chroma_service, 'store', NumpyVectorStore(str(tmp_path), "exact"))
+    chroma_service.load_namespaces()
+    asyncio.run(chroma_service.ingest_documents(DOCUMENTS))
+    return chroma_service
+
+
+def stored_urls(service):
+    (collection,) = service.collections.values()
+    return sorted({metadata['url'] for metadata in collection.get(include=['metadatas'])['metadatas']})
+
+
+@pytest.mark.parametrize("criteria, remaining", [
+    ({'url': 'https://docs.example.com/a'},
+     ['file://notes.txt', 'https://blog.example.com/c', 'https://blog.example.com/d', 'https://docs.example.com/b']),
+    ({'url_prefix': 'https://blog.example.com/'},
+     ['file://notes.txt', 'https://docs.example.com/a', 'https://docs.example.com/b']),
+    ({'source': 'widget_bulk_scrape'}, ['file://notes.txt', 'https://blog.example.com/d']),
+    ({'url_prefix': 'https://blog.example.com/', 'source': 'manual_upload'},
+     ['file://notes.txt', 'https://blog.example.com/c', 'https://docs.example.com/a', 'https://docs.example.com/b']),
+    ({'filename': 'notes.txt'},
+     ['https://blog.example.com/c', 'https://blog.example.com/d', 'https://docs.example.com/a', 'https://docs.example.com/b']),
+])
+def test_delete_by_criteria_leaves_everything_else(stored, criteria, remaining):
+    result = asyncio.run(rag.delete_documents(**criteria))
+    assert result['deleted'] == len(DOCUMENTS) - len(remaining)
+    assert stored_urls(stored) == remaining
+
+
+def test_delete_needs_a_criterion(stored):
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(rag.delete_documents())
+    assert refused.value.status_code == 400
+
+
+def test_replace_embeds_only_the_changed_page(stored):
+    (collection,) = stored.collections.values()
+    before = collection.get(include=['embeddings'])
+    untouched = dict(zip(before['ids'], map(list, before['embeddings'])))
+
+    upload = rag.DocumentUpload(content='Beta page about invoices.', metadata={'url': 'https://docs.example.com/b'})
+    result = asyncio.run(rag.replace_document(upload))
+    assert (result['chunk_count'], result['upserted'], result['unchanged']) == (1, 1, 0)
+    assert collection.count() == len(DOCUMENTS)
+
+    after = collection.get(include=['documents', 'metadatas', 'embeddings'])
+    changed = [doc_id for doc_id, embedding in zip(after['ids'], after['embeddings'])
+               if list(embedding) != untouched[doc_id]]
+    assert len(changed) == 1
+    assert 'Beta page about invoices.' in after['documents']
+
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(rag.replace_document(rag.DocumentUpload(content='x', metadata={})))
+    assert refused.value.status_code == 400
@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.services.embedding_cache import EmbeddingCache
+
+THREADS = 8
+ROUNDS = 200
+
+
+def test_hit_and_miss_counts_survive_concurrent_lookups(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), 10 * 1024 * 1024)
+    cache.put_many("local", "m", ["stored"], [[1.0, 2.0]])
+
+    def lookups(_):
+        for _ in range(ROUNDS):
+            cache.get_many("local", "m", ["stored", "missing"])
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        list(pool.map(lookups, range(THREADS)))
+
+    stats = cache.stats()
+    assert stats['hits'] == THREADS * ROUNDS
+    assert stats['misses'] == THREADS * ROUNDS
+    assert stats['hit_rate'] == 0.5
+
+
+def test_normalized_text_shares_an_entry(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.db"), 10 * 1024 * 1024)
+    cache.put_many("local", "m", ["a  b\n"], [[0.5]])
+    assert cache.get_many("local", "m", ["a b", "a b c"]) == [[0.5], None]
@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from app.services.chroma_service import ChromaService
+from app.services.lexical_index import LexicalIndex
+from app.services.numpy_vector_store import NumpyVectorStore
+
+DOCUMENTS = [
+    {'url': 'https://docs.example.com/errors', 'title': 'Errors', 'source': 'web_scraping',
+     'content': 'If the agent logs E1042 the license server could not be reached.'},
+    {'url': 'https://docs.example.com/network', 'title': 'Network', 'source': 'web_scraping',
+     'content': 'The agent needs outbound network access to reach the license server.'},
+    {'url': 'https://docs.example.com/billing', 'title': 'Billing', 'source': 'web_scraping',
+     'content': 'Invoices are issued monthly and can be paid by card or bank transfer.'},
+]
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ChromaService()
+    service.store = NumpyVectorStore(str(tmp_path), "exact")
+    service.load_namespaces()
+    asyncio.run(service.ingest_documents(DOCUMENTS))
+    return service
+
+
+def test_bm25_is_maintained_incrementally():
+    index = LexicalIndex()
+    index.add_many(['a', 'b'], ['error E1042 on start', 'network settings'])
+    assert [doc_id for doc_id, _ in index.search('e1042')] == ['a']
+    index.add('a', 'network timeout')
+    assert index.search('e1042') == []
+    assert {doc_id for doc_id, _ in index.search('network')} == {'a', 'b'}
+    index.remove(['b'])
+    assert [doc_id for doc_id, _ in index.search('network')] == ['a']
+    assert index.search('network', allowed_ids={'b'}) == []
+
+
+def test_reciprocal_rank_fusion_favours_chunks_both_lists_rank():
+    fused = ChromaService._reciprocal_rank_fusion(
+        [[{'id': 'a', 'distance': 0.1}, {'id': 'b', 'distance': 0.2}], [{'id': 'c'}, {'id': 'b'}]], 2
+    )
+    assert [result['id'] for result in fused] == ['b', 'a']
+    # a chunk keeps the fields of the first list it appeared in
+    assert fused[0]['distance'] == 0.2 and fused[0]['rrf_score'] > fused[1]['rrf_score']
+
+
+def test_exact_codes_are_found_by_lexical_and_hybrid_search(service):
+    async def scenario():
+        for mode in ("lexical", "hybrid"):
+            results, timings = await service.search_with_timings("E1042", n_results=1, mode=mode)
+            assert results[0]['metadata']['url'] == 'https://docs.example.com/errors'
+            assert 'lexical_ms' in timings and 'total_ms' in timings
+        _, timings = await service.search_with_timings("license server", n_results=2, mode="hybrid")
+        assert {'vector_ms', 'lexical_ms', 'fusion_ms'} <= set(timings)
+
+    asyncio.run(scenario())
+
+
+def test_ingest_and_delete_update_a_built_index(service):
+    async def scenario():
+        await service.search_documents("E1042", mode="lexical")
+        await service.ingest_documents([{'url': 'https://docs.example.com/faq', 'title': 'FAQ', 'source': 'web_scraping',
+                                         'content': 'Error E2077 means the disk is full.'}])
+        hits = await service.search_documents("E2077", n_results=1, mode="lexical")
+        assert hits[0]['metadata']['url'] == 'https://docs.example.com/faq'
+        await service.delete_documents(url='https://docs.example.com/faq')
+        return await service.search_documents("E2077", n_results=1, mode="lexical")
+
+    assert asyncio.run(scenario()) == []
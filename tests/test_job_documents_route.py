@@ -0,0 +1,39 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.api.routes import scraper
+from app.services.job_queue import SqliteJobQueue
+from app.services.job_worker import job_worker
+
+
+@pytest.fixture
+def claimed(monkeypatch, tmp_path):
+    queue = SqliteJobQueue(str(tmp_path / "jobs.db"))
+    monkeypatch.setattr(job_worker, '_queue', queue)
+    queue.enqueue('urls', 'job', {}, [('https://example.com/a', 0)])
+    return queue.claim_job('worker-1', 30)
+
+
+def post(job_id, token):
+    request = scraper.JobDocumentsRequest(lease_token=token, documents=[{'url': 'https://example.com/a', 'content': 'x'}])
+    return asyncio.run(scraper.store_job_documents(job_id, request))
+
+
+def test_documents_are_stored_for_the_lease_holder(monkeypatch, claimed):
+    async def ingest(documents):
+        return {'ids': ['a#0'], 'unchanged': 0, 'upserted': 1, 'stale_removed': 0}
+
+    monkeypatch.setattr(scraper.chroma_service, 'ingest_documents', ingest)
+    assert post(claimed['job_id'], claimed['lease_token'])['chunks_stored'] == 1
+
+
+def test_the_public_worker_id_is_not_enough(claimed):
+    listed = asyncio.run(job_worker.status(claimed['job_id']))
+    assert 'lease_token' not in listed
+    with pytest.raises(HTTPException) as refused:
+        post(claimed['job_id'], listed['worker'])
+    assert refused.value.status_code == 409
+
+    with pytest.raises(HTTPException) as unknown:
+        post('missing', claimed['lease_token'])
+    assert unknown.value.status_code == 404
@@ -0,0 +1,49 @@
+import time
+from app.services.job_queue import SqliteJobQueue
+
+
+def test_running_jobs_are_those_with_a_live_lease(tmp_path):
+    queue = SqliteJobQueue(str(tmp_path / "jobs.db"))
+    first = queue.enqueue('urls', 'first', {}, [('https://example.com/a', 0)])
+    queue.enqueue('urls', 'second', {}, [('https://example.com/b', 0)])
+    assert queue.running_jobs() == []
+
+    claimed = queue.claim_job('worker-1', 30)
+    assert claimed['job_id'] == first['job_id']
+    assert queue.running_jobs() == [first['job_id']]
+
+    # a worker that died stops counting once its lease runs out
+    queue.conn.execute("UPDATE jobs SET lease_until = ? WHERE job_id = ?", (time.time() - 1, first['job_id']))
+    assert queue.running_jobs() == []
+
+
+def test_lease_token_is_only_returned_by_claim(tmp_path):
+    queue = SqliteJobQueue(str(tmp_path / "jobs.db"))
+    job = queue.enqueue('urls', 'job', {}, [('https://example.com/a', 0)])
+    claimed = queue.claim_job('worker-1', 30)
+    token = claimed['lease_token']
+    assert token
+    assert 'lease_token' not in queue.get(job['job_id'])
+    assert all('lease_token' not in listed for listed in queue.list())
+
+    assert queue.holds_lease(job['job_id'], token)
+    assert not queue.holds_lease(job['job_id'], 'guessed')
+    queue.requeue(job['job_id'], 'worker-1', {})
+    assert not queue.holds_lease(job['job_id'], token)
+
+    # the next run gets a fresh token; the old one stays invalid
+    reclaimed = queue.claim_job('worker-2', 30)
+    assert reclaimed['lease_token'] != token and queue.holds_lease(job['job_id'], reclaimed['lease_token'])
+    queue.finish_job(job['job_id'], 'worker-2', 'completed', {}, [])
+    assert not queue.holds_lease(job['job_id'], reclaimed['lease_token'])
+
+
+def test_queue_files_from_before_lease_tokens_are_migrated(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    queue = SqliteJobQueue(path)
+    queue.conn.execute("ALTER TABLE jobs DROP COLUMN lease_token")
+    queue.conn.close()
+
+    queue = SqliteJobQueue(path)
+    queue.enqueue('urls', 'job', {}, [('https://example.com/a', 0)])
+    assert queue.claim_job('worker-1', 30)['lease_token']
@@ -0,0 +1,43 @@
+import asyncio
+import numpy as np
+from app.services.ai_service import ai_service
+from app.services.chroma_service import ChromaService
+from app.services.local_embedder import HashingEmbedder
+
+TEXTS = [
+    "Reset your password from the account settings page.",
+    "Error E1042 means the license server could not be reached.",
+    "Invoices are issued monthly and can be paid by card.",
+    "",
+]
+
+
+def test_embeddings_are_deterministic_normalized_and_batch_independent():
+    embedder = HashingEmbedder(384)
+    batch = embedder.embed_array(TEXTS)
+    assert batch.shape == (len(TEXTS), 384)
+    assert np.array_equal(batch, HashingEmbedder(384).embed_array(TEXTS))
+    # each row is the same whether the text is embedded alone or in a batch
+    for text, row in zip(TEXTS, batch):
+        assert np.allclose(embedder.embed_array([text])[0], row)
+    assert np.allclose(np.linalg.norm(batch[:3], axis=1), 1.0)
+    assert embedder.embed_array([]).shape == (0, 384)
+
+
+def test_similar_texts_are_nearest():
+    embedder = HashingEmbedder(384)
+    docs = embedder.embed_array(TEXTS[:3])
+    query = embedder.embed_array(["what does error E1042 mean"])[0]
+    assert int(np.argmax(docs @ query)) == 1
+
+
+def test_remote_failures_fall_back_to_the_local_namespace(monkeypatch):
+    async def failing(texts, model):
+        raise ConnectionError("provider down")
+
+    monkeypatch.setattr(ai_service, '_embedding_providers', lambda include_all=False: [('voyage', 'voyage-2', failing)])
+    provider, model, embeddings = asyncio.run(ai_service.embed_texts(TEXTS[:2]))
+    assert (provider, model) == ('local', 'hashing-v1')
+    assert all(any(value != 0.0 for value in embedding) for embedding in embeddings)
+    # local vectors never share a collection with a remote provider's
+    assert ChromaService.namespace_name(provider, model, 384) != ChromaService.namespace_name('voyage', 'voyage-2', 384)
@@ -0,0 +1,37 @@
+import random
+import pytest
+from app.services.ai_service import ai_service
+from app.services.markdown_stream import MarkdownStreamStripper
+
+PIECES = ["**", "*", "#", "##", "-", "+", " ", "  ", "\t", "\n", "\n\n", "bold", "x", "y", ".", "a b"]
+
+
+def stream(deltas):
+    stripper = MarkdownStreamStripper()
+    return "".join(stripper.feed(delta) for delta in deltas) + stripper.flush()
+
+
+def random_splits(text, rng):
+    cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(0, 8)))) if len(text) > 1 else []
+    return [text[start:end] for start, end in zip([0] + cuts, cuts + [len(text)])]
+
+
+@pytest.mark.parametrize("text", [
+    "**bold** x*y . **bold** ",
+    "# Heading\n\n- item one\n* item *two*\n+ **three**\n",
+    "#\n\n   - x",
+    "-\n- a\n\n-x",
+    "  \n**a\nb** *c*\n## \n\n",
+    "plain answer without markup",
+])
+def test_streamed_output_matches_strip_markdown(text):
+    expected = ai_service.strip_markdown(text)
+    assert stream([text]) == expected
+    assert stream(list(text)) == expected
+
+
+def test_random_token_streams_match_strip_markdown():
+    rng = random.Random(7)
+    for _ in range(3000):
+        text = "".join(rng.choice(PIECES) for _ in range(rng.randint(0, 14)))
+        assert stream(random_splits(text, rng)) == ai_service.strip_markdown(text), repr(text)
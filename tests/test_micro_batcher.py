@@ -0,0 +1,111 @@
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.ai_service import ai_service
+from app.services.chroma_service import ChromaService
+from app.services.micro_batcher import MicroBatcher, SingleFlight
+from app.services.numpy_vector_store import NumpyVectorStore
+
+
+def recording_batcher(window_ms, max_batch):
+    calls = []
+
+    async def handler(group, items):
+        calls.append((group, list(items)))
+        return [f"{group}:{item}" for item in items]
+
+    return MicroBatcher(handler, window_ms, max_batch), calls
+
+
+def test_items_within_the_window_share_one_call_per_group():
+    batcher, calls = recording_batcher(20, 100)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(i % 2, i) for i in range(6)))
+
+    assert asyncio.run(scenario()) == [f"{i % 2}:{i}" for i in range(6)]
+    assert sorted(calls) == [(0, [0, 2, 4]), (1, [1, 3, 5])]
+    assert batcher.stats() == {'batches': 2, 'items': 6, 'avg_batch_size': 3.0}
+
+
+def test_a_full_batch_and_a_zero_window_do_not_wait():
+    batcher, calls = recording_batcher(10_000, 3)
+
+    async def full():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit('g', i) for i in range(3))), 1)
+
+    assert asyncio.run(full()) == ['g:0', 'g:1', 'g:2'] and len(calls) == 1
+
+    unbatched, calls = recording_batcher(0, 100)
+
+    async def each():
+        return await asyncio.gather(*(unbatched.submit('g', i) for i in range(3)))
+
+    asyncio.run(each())
+    assert len(calls) == 3
+
+
+def test_a_failed_batch_fails_every_caller():
+    async def handler(group, items):
+        raise ConnectionError("provider down")
+
+    batcher = MicroBatcher(handler, 10, 100)
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit('g', i) for i in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(scenario()))
+
+
+def test_single_flight_shares_one_computation():
+    flight, runs = SingleFlight(), []
+
+    async def compute():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return 42
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do('key', compute) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert results.count((42, False)) == 1 and results.count((42, True)) == 4
+    assert runs == [1] and flight.shared == 4 and flight.inflight == {}
+
+
+def test_concurrent_searches_share_embedding_and_query_calls(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'SEARCH_BATCH_WINDOW_MS', 20)
+    service = ChromaService()
+    service.store = NumpyVectorStore(str(tmp_path), "exact")
+    service.load_namespaces()
+    asyncio.run(service.ingest_documents([
+        {'url': f'https://docs.example.com/{i}', 'content': f'Topic {i} covers feature number {i}.'} for i in range(8)
+    ]))
+
+    embedded = []
+    embed_texts = ai_service.embed_texts
+
+    async def counting_embed(texts):
+        embedded.append(list(texts))
+        return await embed_texts(texts)
+
+    monkeypatch.setattr(ai_service, 'embed_texts', counting_embed)
+    (collection,) = service.collections.values()
+    queried = []
+    query = collection.query
+
+    def counting_query(query_embeddings, **kwargs):
+        queried.append(len(query_embeddings))
+        return query(query_embeddings, **kwargs)
+
+    collection.query = counting_query
+    queries = [f"feature number {i}" for i in range(8)] + ["feature number 0"] * 4
+
+    async def scenario():
+        return await asyncio.gather(*(service.search_with_timings(q, n_results=1) for q in queries))
+
+    results = asyncio.run(scenario())
+    assert [r[0][0]['metadata']['url'] for r in results[:8]] == [f'https://docs.example.com/{i}' for i in range(8)]
+    assert sum(1 for _, timings in results if timings.get('shared')) == 4
+    assert embedded == [[f"feature number {i}" for i in range(8)]]
+    assert queried == [8]
@@ -0,0 +1,81 @@
+import asyncio
+import numpy as np
+import pytest
+from app.core.config import settings
+from app.services.ai_service import ai_service
+from app.services.chroma_service import ChromaService
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.quantized_index import QuantizedIndex
+
+
+def clustered(count, dimension=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((20, dimension)).astype(np.float32)
+    return centroids[rng.integers(0, 20, count)] + 0.3 * rng.standard_normal((count, dimension)).astype(np.float32)
+
+
+@pytest.mark.parametrize("dtype", ["int8", "float16"])
+def test_two_stage_search_matches_exact_search(tmp_path, dtype):
+    vectors = clustered(3000)
+    ids = [f"v{i}" for i in range(len(vectors))]
+    index = QuantizedIndex.create(str(tmp_path / "tier"), 32, dtype, capacity=16)
+    for start in range(0, len(ids), 700):
+        index.upsert(ids[start:start + 700], vectors[start:start + 700])
+    assert len(index) == 3000
+    assert np.asarray(index.codes).itemsize < vectors.itemsize
+
+    queries = clustered(20, seed=1)
+    full = dict(zip(ids, vectors))
+    results = index.search(queries, 10, 4, lambda wanted: {doc_id: full[doc_id] for doc_id in wanted})
+    for query, hits in zip(queries, results):
+        exact = np.argsort(((vectors - query) ** 2).sum(axis=1))[:10]
+        assert [doc_id for doc_id, _, _ in hits] == [f"v{i}" for i in exact]
+        assert np.allclose([d for _, d, _ in hits], ((vectors[exact] - query) ** 2).sum(axis=1), rtol=1e-4)
+
+
+def test_upserts_replace_removes_tombstone_and_files_reopen(tmp_path):
+    path = str(tmp_path / "tier")
+    index = QuantizedIndex.create(path, 2, "int8", source_id="collection-1")
+    index.upsert(["a", "b", "c"], [[1.0, 0.0], [0.0, 1.0], [5.0, 5.0]])
+    index.upsert(["c"], [[1.0, 0.1]])
+    assert index.remove(["a", "missing"]) == 1
+    assert len(index) == 2
+
+    reopened = QuantizedIndex.open(path)
+    assert (reopened.source_id, len(reopened)) == ("collection-1", 2)
+    full = {"b": [0.0, 1.0], "c": [1.0, 0.1]}
+    hits = reopened.search([[1.0, 0.0]], 3, 2, lambda wanted: {doc_id: full[doc_id] for doc_id in wanted})
+    assert [doc_id for doc_id, _, _ in hits[0]] == ["c", "b"]
+    QuantizedIndex.destroy(path)
+    assert QuantizedIndex.open(path) is None
+
+
+def test_service_serves_the_tier_in_step_with_the_collection(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'VECTOR_TIER', 'int8')
+    monkeypatch.setattr(settings, 'VECTOR_TIER_DIRECTORY', str(tmp_path / "tiers"))
+    service = ChromaService()
+    service.store = NumpyVectorStore(str(tmp_path / "store"), "exact")
+    service.load_namespaces()
+    documents = [{'url': f'https://docs.example.com/{i}', 'content': f'Topic {i} covers feature number {i}.'}
+                 for i in range(12)]
+
+    async def scenario():
+        await service.ingest_documents(documents)
+        first = await service.search_documents("feature number 3", n_results=3)
+        (name,) = service.quantized_indexes
+        await service.ingest_documents([{'url': 'https://docs.example.com/new', 'content': 'Feature number 99 is new.'}])
+        await service.delete_documents(url='https://docs.example.com/3')
+        stats = await service.get_collection_stats()
+        after = await service.search_documents("feature number 3", n_results=3)
+        return first, name, stats, after
+
+    first, name, stats, after = asyncio.run(scenario())
+    assert first[0]['metadata']['url'] == 'https://docs.example.com/3'
+    # the two-stage path returns what an exact query of the collection returns
+    (collection,) = service.collections.values()
+    exact = collection.query(ai_service.local_embedder.embed(["feature number 3"]), n_results=3, include=[])
+    assert [r['id'] for r in after] == exact['ids'][0]
+    assert len(service.quantized_indexes[name]) == collection.count()
+    (entry,) = stats['namespaces']
+    assert entry['vector_tier'] == {'dtype': 'int8', 'chunks': 12, 'bytes': entry['vector_tier']['bytes'],
+                                    'consistent': True}
@@ -0,0 +1,64 @@
+import asyncio
+import json
+import pytest
+from fastapi import HTTPException
+from app.api.routes import rag
+from app.services.answer_cache import answer_cache
+from app.services.chroma_service import chroma_service
+
+QUERIES = [f"question {i}" for i in range(6)]
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    calls = {'search_batch': [], 'active': 0, 'peak': 0}
+
+    async def search_batch(queries, n_results, mode, filters, rerank, fetch_k, embedded=None):
+        calls['search_batch'].append(list(queries))
+        return [([{'id': query, 'content': query}], {'total_ms': 1.0}) for query in queries]
+
+    async def answer_from_results(query, search_results, timings, mode, include_context):
+        calls['active'] += 1
+        calls['peak'] = max(calls['peak'], calls['active'])
+        # later questions finish first, so lines arrive out of request order
+        await asyncio.sleep(0.002 * (len(QUERIES) - QUERIES.index(query)))
+        calls['active'] -= 1
+        return {'query': query, 'answer': f"answer to {query}", 'sources': []}
+
+    monkeypatch.setattr(chroma_service, 'search_batch', search_batch)
+    monkeypatch.setattr(rag, 'answer_from_results', answer_from_results)
+    answer_cache.clear()
+    return calls
+
+
+def run_batch(**fields):
+    async def collect():
+        response = await rag.query_rag_batch(rag.BatchQueryRequest(**fields))
+        return [json.loads(line) async for line in response.body_iterator]
+
+    return asyncio.run(collect())
+
+
+def test_lines_carry_their_index_and_end_with_a_summary(backend):
+    lines = run_batch(queries=QUERIES, concurrency=2, use_cache=False)
+    *answers, summary = lines
+    assert summary['done'] and summary['queries'] == len(QUERIES) and summary['errors'] == 0
+    assert sorted(line['index'] for line in answers) == list(range(len(QUERIES)))
+    assert all(line['query'] == QUERIES[line['index']] for line in answers)
+    assert [line['index'] for line in answers] != list(range(len(QUERIES)))
+    assert backend['search_batch'] == [QUERIES]
+    assert backend['peak'] == 2
+
+
+def test_cached_answers_are_streamed_without_retrieval(backend):
+    run_batch(queries=QUERIES[:3])
+    *answers, summary = run_batch(queries=QUERIES[:3] + QUERIES[4:5])
+    assert summary['cache_hits'] == 3
+    assert {line['index'] for line in answers if line.get('cache_hit')} == {0, 1, 2}
+    assert backend['search_batch'][-1] == [QUERIES[4]]
+
+
+def test_empty_batches_are_rejected(backend):
+    with pytest.raises(HTTPException) as refused:
+        run_batch(queries=[])
+    assert refused.value.status_code == 400
@@ -0,0 +1,59 @@
+import asyncio
+import numpy as np
+import pytest
+from app.services import reranker
+from app.services.chroma_service import ChromaService
+from app.services.numpy_vector_store import NumpyVectorStore
+
+DUPLICATE = 'To reset your password open account settings and choose reset password.'
+DOCUMENTS = [
+    {'url': f'https://docs.example.com/mirror{i}', 'title': 'Reset', 'source': 'web_scraping', 'content': DUPLICATE}
+    for i in range(3)
+] + [
+    {'url': 'https://docs.example.com/sso', 'title': 'SSO', 'source': 'web_scraping',
+     'content': 'Accounts using single sign-on reset the password with their identity provider.'},
+]
+
+
+def test_mmr_skips_near_duplicates():
+    embeddings = [[1.0, 0.0], [0.99, 0.01], [0.6, 0.8]]
+    relevance = np.array([0.9, 0.89, 0.5], dtype=np.float32)
+    assert reranker.mmr_select(embeddings, relevance, 2) == [0, 2]
+    assert reranker.rerank_order(relevance, 2) == [0, 1]
+    assert reranker.mmr_select(embeddings, relevance, 10) == [0, 2, 1]
+
+
+def test_lexical_blend_scales_bm25_by_the_best_candidate():
+    blended = reranker.blend_lexical(np.array([0.5, 0.5]), [4.0, 2.0], 0.5)
+    assert np.allclose(blended, [0.75, 0.5])
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = ChromaService()
+    service.store = NumpyVectorStore(str(tmp_path), "exact")
+    service.load_namespaces()
+    asyncio.run(service.ingest_documents(DOCUMENTS))
+    return service
+
+
+def test_mmr_search_diversifies_and_hydrates_only_the_final_results(service):
+    (collection,) = service.collections.values()
+    hydrated = []
+    get = collection.get
+
+    def recording_get(ids=None, include=('documents', 'metadatas'), **kwargs):
+        if 'documents' in include:
+            hydrated.append(list(ids or []))
+        return get(ids=ids, include=include, **kwargs)
+
+    collection.get = recording_get
+    query = "how do I reset my password"
+    plain = asyncio.run(service.search_documents(query, n_results=2))
+    assert [r['content'] for r in plain] == [DUPLICATE, DUPLICATE]
+
+    hydrated.clear()
+    diverse = asyncio.run(service.search_documents(query, n_results=2, rerank="mmr", fetch_k=4))
+    assert {r['metadata']['url'] for r in diverse} >= {'https://docs.example.com/sso'}
+    assert all('rerank_score' in r and 'embedding' not in r for r in diverse)
+    assert hydrated == [[r['id'] for r in diverse]]
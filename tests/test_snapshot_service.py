@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import pytest
+from fastapi import HTTPException
+from app.api.routes import admin
+from app.services.chroma_service import chroma_service
+from app.services.job_worker import job_worker
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.reembed_service import reembed_service
+from app.services.snapshot_service import SnapshotService
+
+DOCUMENTS = [
+    {'url': f'https://docs.example.com/page{i}', 'title': f'Page {i}', 'source': 'web_scraping',
+     'content': f'Page {i} explains how widgets number {i} are configured and deployed.'}
+    for i in range(7)
+]
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setattr(chroma_service, 'store', NumpyVectorStore(str(tmp_path / "store"), "exact"))
+    chroma_service.load_namespaces()
+    return chroma_service
+
+
+@pytest.fixture
+def snapshots(tmp_path):
+    # pages of 3 rows, so every collection is written as several blocks
+    return SnapshotService(str(tmp_path / "backups"), 3)
+
+
+def test_export_and_restore_round_trip(store, snapshots):
+    async def scenario():
+        await store.ingest_documents(DOCUMENTS)
+        exported = await snapshots.export_snapshot()
+        await store.delete_documents(url_prefix='https://docs.example.com/')
+        await store.search_documents("widgets configured", mode="lexical")
+        return exported
+
+    exported = asyncio.run(scenario())
+    (entry,) = exported['collections']
+    assert entry['count'] == 7
+
+    generation = store.generation
+    restored = snapshots.restore_snapshot(exported['snapshot'])
+    assert restored['collections'][0]['count'] == 7
+    assert store.generation > generation
+    assert store.lexical_indexes == {} and store.url_indexes == {}
+
+    hits = asyncio.run(store.search_documents("widgets number 3", n_results=1, mode="lexical"))
+    assert hits[0]['metadata']['url'] == 'https://docs.example.com/page3'
+
+
+def test_restore_waits_for_the_write_lock(store, snapshots):
+    asyncio.run(store.ingest_documents(DOCUMENTS[:2]))
+    name = asyncio.run(snapshots.export_snapshot())['snapshot']
+
+    store._write_lock.acquire()
+    restore = threading.Thread(target=snapshots.restore_snapshot, args=(name,))
+    restore.start()
+    restore.join(0.3)
+    assert restore.is_alive()
+    store._write_lock.release()
+    restore.join(5)
+    assert not restore.is_alive()
+
+
+def test_restore_is_refused_while_jobs_run(monkeypatch):
+    async def running():
+        return ['job-1']
+
+    monkeypatch.setattr(job_worker, 'running_jobs', running)
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(admin.restore_backup(admin.RestoreRequest(snapshot="snapshot_1")))
+    assert refused.value.status_code == 409 and 'job-1' in refused.value.detail
+
+    monkeypatch.setattr(reembed_service, 'status', lambda: {'status': 'running'})
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(admin.restore_backup(admin.RestoreRequest(snapshot="snapshot_1")))
+    assert refused.value.status_code == 409 and 're-embedding' in refused.value.detail
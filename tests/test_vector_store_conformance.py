@@ -0,0 +1,156 @@
+"""Behaviour every VectorStore backend must share; each test runs against all of them."""
+import numpy as np
+import pytest
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.vector_store import ChromaVectorStore
+
+BACKENDS = {
+    'chroma': lambda path: ChromaVectorStore(path),
+    'numpy-exact': lambda path: NumpyVectorStore(path, "exact"),
+    'numpy-ivf': lambda path: NumpyVectorStore(path, "ivf", nprobe=16),
+}
+# HNSW and IVF are approximate; the exact backend must be perfect
+MIN_RECALL = {'chroma': 0.9, 'numpy-exact': 1.0, 'numpy-ivf': 0.9}
+
+
+@pytest.fixture(params=list(BACKENDS))
+def backend(request):
+    return request.param
+
+
+@pytest.fixture
+def store(backend, tmp_path):
+    return BACKENDS[backend](str(tmp_path))
+
+
+@pytest.fixture
+def col(store):
+    """a, b, c at unit positions; b was replaced once"""
+    col = store.get_or_create_collection("conformance", metadata={"purpose": "test"})
+    col.upsert(
+        ids=["a", "b", "c"],
+        embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+        documents=["alpha", "beta", "gamma"],
+        metadatas=[{"k": 1, "s": "p"}, {"k": 2, "s": "q"}, {"k": 3, "s": "p"}]
+    )
+    col.upsert(ids=["b"], embeddings=[[0.0, 2.0]], documents=["beta 2"], metadatas=[{"k": 20, "s": "q"}])
+    return col
+
+
+def test_new_collection_is_empty(store):
+    col = store.get_or_create_collection("conformance")
+    assert col.count() == 0
+    assert col.query([[1.0, 0.0]], n_results=3)['ids'] == [[]]
+
+
+def test_get(col):
+    assert col.count() == 3
+    got = col.get()
+    assert got['ids'] == ["a", "b", "c"]
+    assert got['documents'] == ["alpha", "beta 2", "gamma"]
+    assert got['metadatas'][1] == {"k": 20, "s": "q"}
+    assert got['embeddings'] is None
+
+    got = col.get(ids=["c", "a", "missing"], include=["embeddings"])
+    assert sorted(got['ids']) == ["a", "c"]
+    assert np.allclose(dict(zip(got['ids'], got['embeddings']))["c"], [1.0, 1.0])
+    assert col.get(limit=1, offset=1, include=[])['ids'] == ["b"]
+
+
+def test_upsert_replaces_a_record(col):
+    got = col.get(ids=["b"], include=["documents", "metadatas", "embeddings"])
+    assert got['documents'] == ["beta 2"]
+    assert got['metadatas'] == [{"k": 20, "s": "q"}]
+    assert np.allclose(got['embeddings'][0], [0.0, 2.0])
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"s": "p"}, ["a", "c"]),
+    ({"k": {"$gte": 3}}, ["b", "c"]),
+    ({"k": {"$lt": 3}}, ["a"]),
+    ({"k": {"$in": [1, 20]}}, ["a", "b"]),
+    ({"s": {"$nin": ["p"]}}, ["b"]),
+    ({"s": {"$ne": "q"}}, ["a", "c"]),
+    ({"$and": [{"s": "p"}, {"k": {"$gt": 1}}]}, ["c"]),
+    ({"$or": [{"k": 1}, {"k": 20}]}, ["a", "b"]),
+])
+def test_metadata_filters(col, where, expected):
+    assert sorted(col.get(where=where, include=[])['ids']) == expected
+
+
+def test_query(col):
+    result = col.query([[1.0, 0.0]], n_results=2, include=["distances", "documents", "metadatas"])
+    assert result['ids'] == [["a", "c"]]
+    # squared L2
+    assert np.allclose(result['distances'][0], [0.0, 1.0])
+    assert result['documents'] == [["alpha", "gamma"]]
+    assert result['metadatas'][0][0] == {"k": 1, "s": "p"}
+
+    assert sorted(col.query([[1.0, 0.0]], n_results=10)['ids'][0]) == ["a", "b", "c"]
+    assert col.query([[0.0, 1.0]], n_results=3, where={"s": "p"})['ids'] == [["c", "a"]]
+    assert col.query([[0.0, 1.0]], n_results=3, where={"s": "none"})['ids'] == [[]]
+
+    result = col.query([[1.0, 0.0], [0.0, 1.0]], n_results=1, include=["distances", "embeddings"])
+    assert result['ids'] == [["a"], ["b"]]
+    assert np.allclose(result['embeddings'][1][0], [0.0, 2.0])
+
+
+def test_upsert_of_another_dimension_fails(col):
+    with pytest.raises(Exception):
+        col.upsert(ids=["d"], embeddings=[[1.0, 2.0, 3.0]], documents=["delta"], metadatas=[{"k": 4}])
+
+
+def test_delete(col):
+    col.delete(ids=["a", "missing"])
+    assert col.count() == 2
+    assert "a" not in col.get(include=[])['ids']
+    col.delete(where={"k": 20})
+    assert col.get(include=[])['ids'] == ["c"]
+    assert col.query([[0.0, 1.0]], n_results=5)['ids'] == [["c"]]
+    with pytest.raises(ValueError):
+        col.delete()
+
+
+def test_collection_lifecycle(store, col):
+    col.modify(name="conformance-renamed", metadata={"purpose": "renamed"})
+    renamed = store.get_collection("conformance-renamed")
+    assert renamed.count() == 3 and renamed.metadata == {"purpose": "renamed"}
+    with pytest.raises(ValueError):
+        store.get_collection("conformance")
+    assert [c.name for c in store.list_collections()] == ["conformance-renamed"]
+
+    again = store.get_or_create_collection("conformance-renamed", metadata={"purpose": "again"})
+    assert again.count() == 3 and again.metadata == {"purpose": "again"}
+
+    store.delete_collection("conformance-renamed")
+    with pytest.raises(ValueError):
+        store.get_collection("conformance-renamed")
+    with pytest.raises(ValueError):
+        store.delete_collection("conformance-renamed")
+
+
+def test_recall_filters_and_persistence(backend, store, tmp_path):
+    rng = np.random.default_rng(0)
+    centroids = rng.standard_normal((40, 32)).astype(np.float32)
+    vectors = centroids[rng.integers(0, 40, 6000)] + 0.3 * rng.standard_normal((6000, 32)).astype(np.float32)
+    big = store.get_or_create_collection("conformance-recall")
+    for start in range(0, len(vectors), 1000):
+        big.upsert(
+            ids=[f"v{i}" for i in range(start, start + 1000)],
+            embeddings=vectors[start:start + 1000].tolist(),
+            metadatas=[{"parity": i % 2} for i in range(start, start + 1000)]
+        )
+
+    queries = vectors[rng.integers(0, len(vectors), 50)] + 0.1 * rng.standard_normal((50, 32)).astype(np.float32)
+    result = big.query(queries.tolist(), n_results=10, include=["distances"])
+    recall = []
+    for query, ids in zip(queries, result['ids']):
+        truth = np.argsort(((vectors - query) ** 2).sum(axis=1))[:10]
+        recall.append(len({f"v{i}" for i in truth} & set(ids)) / 10)
+    assert np.mean(recall) >= MIN_RECALL[backend]
+
+    result = big.query(queries[:5].tolist(), n_results=10, where={"parity": 1})
+    assert all(len(ids) == 10 and all(int(i[1:]) % 2 for i in ids) for ids in result['ids'])
+
+    reopened = BACKENDS[backend](str(tmp_path))
+    assert reopened.get_collection("conformance-recall").count() == 6000